@@ -1,21 +1,14 @@
+import os
 import streamlit as st
-import sqlite3
-import pandas as pd
 from datetime import date
-import os
-import copy
-import streamlit_authenticator as stauth
+
+import bootstrap
 
 # --- USER AUTHENTICATION ---
-# This is the main page and will handle the login for the entire app.
-credentials = st.secrets['credentials'].to_dict()
-cookie_config = st.secrets['cookie']
-authenticator = stauth.Authenticate(
-    credentials,
-    cookie_config['name'],
-    cookie_config['key'],
-    cookie_config['expiry_days'],
-)
+# This is the main page and will handle the login for the entire app. Auth
+# config, schema checks and the connection pool are set up once per process
+# (see bootstrap.py); the authenticator is built once per session.
+authenticator = bootstrap.authenticator(st)
 
 authenticator.login()
 
@@ -24,154 +17,24 @@ if st.session_state["authentication_status"]:
     authenticator.logout("Logout", "sidebar")
     st.sidebar.title(f"Welcome {st.session_state['name']}")
 
-    # --- DATABASE SETUP (remains inside the authenticated block) ---
-    BASE_DIR = os.path.dirname(__file__)
-    DATA_DIR = os.path.join(BASE_DIR, "data")
-    os.makedirs(DATA_DIR, exist_ok=True)
-    import payment_plan # Ensure this module can be found
-    DB_PATH = os.path.join(DATA_DIR, "dance.db")
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    c = conn.cursor()
-
-    # --- SCHEMA CREATION ---
-    for stmt in [
-        """
-    CREATE TABLE IF NOT EXISTS students (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        first_name TEXT NOT NULL,
-        last_name TEXT NOT NULL,
-        dob TEXT NOT NULL
-    );
-    """,
-        """
-    CREATE TABLE IF NOT EXISTS dances (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        type TEXT NOT NULL
-    );
-    """,
-        """
-    CREATE TABLE IF NOT EXISTS dance_students (
-        dance_id INTEGER,
-        student_id INTEGER,
-        PRIMARY KEY (dance_id, student_id)
-    );
-    """,
-        """
-    CREATE TABLE IF NOT EXISTS competitions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        has_convention INTEGER NOT NULL CHECK (has_convention IN (0,1))
-    );
-    """,
-        """
-    CREATE TABLE IF NOT EXISTS competition_students (
-        competition_id INTEGER,
-        student_id INTEGER,
-        PRIMARY KEY (competition_id, student_id)
-    );
-    """
-    ]:
-        c.execute(stmt)
-    conn.commit()
-
     # --- DATABASE FUNCTIONS ---
-    def add_student(first, last, dob):
-        c.execute("INSERT INTO students (first_name, last_name, dob) VALUES (?, ?, ?)",
-                  (first, last, dob))
-        conn.commit()
-
-    def update_student(sid, first, last, dob):
-        c.execute("UPDATE students SET first_name=?, last_name=?, dob=? WHERE id=?",
-                  (first, last, dob, sid))
-        conn.commit()
-
-    def delete_student(sid):
-        c.execute("DELETE FROM dance_students WHERE student_id=?", (sid,))
-        c.execute("DELETE FROM competition_students WHERE student_id=?", (sid,))
-        c.execute("DELETE FROM students WHERE id=?", (sid,))
-        conn.commit()
-
-    def get_all_students():
-        return pd.read_sql("SELECT * FROM students ORDER BY last_name, first_name", conn)
-
-    # Dance functions
-    def add_dance(name, dtype, student_ids):
-        c.execute("INSERT INTO dances (name, type) VALUES (?, ?)", (name, dtype))
-        did = c.lastrowid
-        for sid in student_ids:
-            c.execute("INSERT OR IGNORE INTO dance_students (dance_id, student_id) VALUES (?, ?)",
-                      (did, sid))
-        conn.commit()
-
-    def update_dance(did, name, student_ids):
-        c.execute("UPDATE dances SET name=? WHERE id=?", (name, did))
-        c.execute("DELETE FROM dance_students WHERE dance_id=?", (did,))
-        for sid in student_ids:
-            c.execute("INSERT INTO dance_students (dance_id, student_id) VALUES (?, ?)",
-                      (did, sid))
-        conn.commit()
-
-    def delete_dance(did):
-        c.execute("DELETE FROM dance_students WHERE dance_id=?", (did,))
-        c.execute("DELETE FROM dances WHERE id=?", (did,))
-        conn.commit()
-
-    def get_all_dances():
-        return pd.read_sql("SELECT * FROM dances ORDER BY type, name", conn)
-
-    def get_students_for_dance(did):
-        return pd.read_sql(
-            "SELECT s.first_name || ' ' || s.last_name AS name FROM students s"
-            " JOIN dance_students ds ON s.id=ds.student_id"
-            " WHERE ds.dance_id=?", conn, params=(did,)
-        )
-
-    def get_dances_for_student(sid):
-        return pd.read_sql(
-            "SELECT d.name AS name, d.type AS type FROM dances d"
-            " JOIN dance_students ds ON d.id=ds.dance_id"
-            " WHERE ds.student_id=?", conn, params=(sid,)
-        )
-
-    # Competition functions
-    def add_competition(name, has_conv, student_ids):
-        c.execute("INSERT INTO competitions (name, has_convention) VALUES (?, ?)",
-                  (name, has_conv))
-        cid = c.lastrowid
-        for sid in student_ids:
-            c.execute("INSERT OR IGNORE INTO competition_students (competition_id, student_id) VALUES (?, ?)",
-                      (cid, sid))
-        conn.commit()
-
-    def update_competition(cid, name, has_conv, student_ids):
-        c.execute(
-            "UPDATE competitions SET name=?, has_convention=? WHERE id=?",
-            (name, has_conv, cid),
-        )
-        c.execute("DELETE FROM competition_students WHERE competition_id=?", (cid,))
-        for sid in student_ids:
-            c.execute(
-                "INSERT INTO competition_students (competition_id, student_id) VALUES (?, ?)",
-                (cid, sid),
-            )
-        conn.commit()
-
-    # Fetch students for a competition
-    def get_students_for_competition(comp_id):
-        return pd.read_sql(
-            "SELECT s.first_name || ' ' || s.last_name AS name FROM students s"
-            " JOIN competition_students cs ON s.id = cs.student_id"
-            " WHERE cs.competition_id = ?",
-            conn, params=(comp_id,)
-        )
-
-    def get_competitions_for_student(sid):
-        return pd.read_sql(
-            "SELECT c.name AS name FROM competitions c"
-            " JOIN competition_students cs ON c.id = cs.competition_id"
-            " WHERE cs.student_id = ?", conn, params=(sid,)
-        )
+    # All reads and writes go through the shared connection pool in db.py.
+    # pandas and the data modules load here, after login.
+    import pandas as pd
+    import instrument
+    instrument.start_run("app")
+    import backup
+    import jobs
+    import payment_plan # Ensure this module can be found
+    import seasons
+    from studio import (
+        add_student, update_student, delete_student, get_student,
+        add_dance, update_dance, delete_dance,
+        get_dance_rosters,
+        add_competition, update_competition, delete_competition, get_all_competitions,
+        get_students_for_competition, get_student_summary, get_roster_report, get_roster_report_csv,
+    )
+    from widgets import student_select, student_multiselect, job_status
 
     # UI Setup
     st.set_page_config(page_title="EDOT Company Manager", layout="wide")
@@ -180,7 +43,7 @@ if st.session_state["authentication_status"]:
     # Sidebar navigation
     menu = st.sidebar.radio(
         "Navigate",
-        ["📋 Students", "🕺 Dances", "🏆 Competitions"],
+        ["📋 Students", "🕺 Dances", "🏆 Competitions", "🗓 Seasons", "💾 Backups"],
         index=0,
     )
     # The message below is now somewhat redundant since the page menu only appears after login,
@@ -189,23 +52,35 @@ if st.session_state["authentication_status"]:
 
     # --- Students Page ---
     if menu == "📋 Students":
-        students_df = get_all_students()
-        student_map = {f"{r['last_name']}, {r['first_name']}": r['id'] for _, r in students_df.iterrows()}
-
         with st.expander("Import & Create/Edit Students", expanded=False):
             # Import Students from CSV
             st.subheader("Import Students from CSV")
             csv_file = st.file_uploader("Upload Students CSV", type=["csv"], key="students_csv")
             if csv_file:
-                df_import = pd.read_csv(csv_file)
-                st.dataframe(df_import)
+                st.dataframe(pd.read_csv(csv_file, nrows=100))
+                csv_file.seek(0)
+                update_dups = st.checkbox("Update matching students instead of skipping them", key="students_csv_update")
                 if st.button("Import Students", key="btn_import_students"):
-                    for _, row in df_import.iterrows():
-                        try:
-                            add_student(row['first'], row['last'], row['dob'])
-                        except Exception as e:
-                            st.error(f"Failed to import row {row.to_dict()}: {e}")
-                    st.success("Students imported from CSV.")
+                    # Runs on the job pool; the status below polls until it finishes.
+                    st.session_state["students_import_job"] = jobs.submit(
+                        "import_students", created_by=st.session_state.get("username"),
+                        path=jobs.save_upload(csv_file), on_duplicate="update" if update_dups else "skip",
+                    )
+            job = job_status("students_import_job")
+            if job is not None and job['status'] == jobs.DONE:
+                counts = job['result']['counts']
+                report = pd.DataFrame(job['result']['report'])
+                st.success(
+                    f"Students imported from CSV: {counts.get('added', 0)} added, "
+                    f"{counts.get('updated', 0)} updated, {counts.get('duplicate', 0)} duplicates skipped, "
+                    f"{counts.get('rejected', 0)} rejected."
+                )
+                rejected = report[report.status == 'rejected']
+                if not rejected.empty:
+                    st.error("Some rows were rejected:")
+                    st.dataframe(rejected)
+                with st.expander("Full import report", expanded=False):
+                    st.dataframe(report)
             # Add New Student
             st.subheader("Add New Student")
             fn = st.text_input("First Name", key="add_fn")
@@ -222,10 +97,9 @@ if st.session_state["authentication_status"]:
 
         # Edit or Delete Student
         st.subheader("Edit / Delete Student")
-        sel = st.selectbox("Select Student", ["--"] + list(student_map.keys()), key="edit_sel")
-        if sel and sel != "--":
-            sid = student_map[sel]
-            stu = students_df[students_df.id == sid].iloc[0]
+        sid = student_select("Select Student", key="edit_sel")
+        if sid is not None:
+            stu = get_student(sid)
             with st.form("edit_student_form"):
                 fn2 = st.text_input("First Name", value=stu['first_name'], key="edit_fn")
                 ln2 = st.text_input("Last Name", value=stu['last_name'], key="edit_ln")
@@ -238,68 +112,81 @@ if st.session_state["authentication_status"]:
                         st.error("Please enter both first and last name.")
                 if st.form_submit_button("Delete Student", key="btn_delete_student"):
                     delete_student(sid)
-                    st.success(f"Deleted {sel}")
+                    st.success(f"Deleted {stu['first_name']} {stu['last_name']}")
+
+        st.markdown("---")
+
+        # Studio-wide roster report from the student_summary view. Expanders
+        # run their body even when collapsed, so it is built only on request
+        # (and then cached until a table it reads changes).
+        with st.expander("Roster Report", expanded=False):
+            if st.toggle("Build roster report", key="roster_report_on"):
+                st.dataframe(get_roster_report(), hide_index=True)
+                st.download_button("Download Roster Report (CSV)", data=get_roster_report_csv(),
+                                   file_name="roster_report.csv", key="btn_roster_report")
 
         st.markdown("---")
 
         # View Student Profile
         st.subheader("View Student Profile")
-        sel_v = st.selectbox("Select Student to View", ["--"] + list(student_map.keys()), key="view_sel")
-        if sel_v and sel_v != "--":
-            sid = student_map[sel_v]
-            stu = students_df[students_df.id == sid].iloc[0]
+        sid = student_select("Select Student to View", key="view_sel")
+        if sid is not None:
+            # One read of the student_summary view covers the whole profile.
+            stu = get_student_summary(sid)
             st.markdown(f"### {stu['first_name']} {stu['last_name']}")
             st.write(f"**DOB:** {stu['dob']}")
             # Dances
             st.write("**Dances:**")
-            df_d = get_dances_for_student(sid)
-            if df_d.empty:
+            if not stu['dances']:
                 st.write("No dances.")
             else:
-                for name in df_d['name']:
-                    st.write(f"- {name}")
+                for dance in stu['dances']:
+                    st.write(f"- {dance['name']} ({dance['type']})")
             # Competitions
             st.write("**Competitions:**")
-            df_c = get_competitions_for_student(sid)
-            if df_c.empty:
+            if not stu['competitions']:
                 st.write("No competitions.")
             else:
-                for name in df_c['name']:
-                    st.write(f"- {name}")
+                for comp in stu['competitions']:
+                    st.write(f"- {comp['name']}{' (with convention)' if comp['has_convention'] else ''}")
+            # Payment plans
+            if stu['plans']:
+                st.write(f"**Payment Plans:** {stu['plans']} · charged ${stu['charged_cents'] / 100:,.2f}"
+                         f" · received ${stu['received_cents'] / 100:,.2f}"
+                         f" · balance ${stu['balance_cents'] / 100:,.2f}"
+                         + (f" · next due {stu['next_due_date']}" if stu['next_due_date'] else ""))
+            else:
+                st.write("**Payment Plans:** none")
 
     # --- Dances Page ---
     elif menu == "🕺 Dances":
         st.header("Dances")
+        # One roster query feeds the editor and the lists below on every rerun.
+        rosters = get_dance_rosters()
         with st.expander("Import & Create/Edit Dances", expanded=False):
             # Import Dances from CSV
             st.subheader("Import Dances from CSV")
             dances_file = st.file_uploader("Upload Dances CSV", type=["csv"], key="dances_csv")
             if dances_file:
-                df_import = pd.read_csv(dances_file)
-                st.dataframe(df_import)
+                st.dataframe(pd.read_csv(dances_file, nrows=100))
+                dances_file.seek(0)
                 if st.button("Import Dances", key="btn_import_dances"):
-                    students_df = get_all_students()
-                    student_map = {f"{r['last_name']}, {r['first_name']}": r['id'] for _, r in students_df.iterrows()}
-                    for _, row in df_import.iterrows():
-                        dtype = row.get('dancetype') or row.get('type')
-                        name = row.get('dancename') or row.get('name')
-                        ids = []
-                        for col in df_import.columns:
-                            if col not in ['dancetype','dancename','type','name'] and pd.notna(row[col]):
-                                label = row[col]
-                                if label in student_map:
-                                    ids.append(student_map[label])
-                                else:
-                                    st.warning(f"Unknown student: {label}")
-                        try:
-                            add_dance(name, dtype, ids)
-                        except Exception as e:
-                            st.error(f"Error importing dance '{name}': {e}")
-                    st.success("Dances imported from CSV.")
+                    st.session_state["dances_import_job"] = jobs.submit(
+                        "import_dances", created_by=st.session_state.get("username"),
+                        path=jobs.save_upload(dances_file),
+                    )
+            job = job_status("dances_import_job")
+            if job is not None and job['status'] == jobs.DONE:
+                unknown = job['result']['unknown']
+                report = pd.DataFrame(job['result']['report'])
+                if unknown:
+                    st.warning(f"Unknown students ({len(unknown)}): " + "; ".join(unknown))
+                rejected = report[report.status == 'rejected']
+                if not rejected.empty:
+                    st.error("Some rows were rejected:")
+                    st.dataframe(rejected)
+                st.success(f"Dances imported from CSV: {(report.status == 'added').sum()} added.")
             # Create/Edit Dances
-            dance_df = get_all_dances()
-            students_df = get_all_students()
-            student_map = {f"{r['last_name']}, {r['first_name']}": r['id'] for _, r in students_df.iterrows()}
             dance_types = ["Solo","Duet","Trio","Group"]
             cols = st.columns(2)
             # Create Dance
@@ -307,11 +194,10 @@ if st.session_state["authentication_status"]:
                 st.subheader("Create Dance")
                 name = st.text_input("Name", key="dance_new_name")
                 dtype = st.selectbox("Type", dance_types, key="dance_new_type")
-                sel = st.multiselect("Students", list(student_map.keys()), key="dance_new_students")
+                ids = student_multiselect("Students", key="dance_new_students")
                 limits = {"Solo":1, "Duet":2, "Trio":3, "Group":None}
                 max_sel = limits.get(dtype)
                 if st.button("Add Dance", key="btn_add_dance"):
-                    ids = [student_map[s] for s in sel]
                     if max_sel and len(ids) != max_sel:
                         st.error(f"{dtype} requires exactly {max_sel} student(s).")
                     else:
@@ -320,46 +206,36 @@ if st.session_state["authentication_status"]:
             # Edit/Delete Dance
             with cols[1]:
                 st.subheader("Edit / Delete Dance")
-                options = {f"{r['type']}: {r['name']}": r['id'] for _, r in dance_df.iterrows()}
-                choice = st.selectbox("Select Dance to Edit", ["--"] + list(options.keys()), key="dance_edit_sel")
-                if choice and choice != "--":
-                    did = options[choice]
-                    current = dance_df[dance_df.id == did].iloc[0]
+                dance_labels = dict(zip(rosters['id'], rosters['type'] + ": " + rosters['name']))
+                did = st.selectbox("Select Dance to Edit", [None] + list(dance_labels), key="dance_edit_sel",
+                                   format_func=lambda d: "--" if d is None else dance_labels[d])
+                if did is not None:
+                    current = rosters[rosters.id == did].iloc[0]
                     dtype = current['type']
                     new_name = st.text_input("Dance Name", value=current['name'], key="edit_dance_name")
-                    df_members = get_students_for_dance(did)
-                    labels = []
-                    for nm in df_members['name']:
-                        parts = nm.split(' ', 1)
-                        if len(parts) == 2:
-                            labels.append(f"{parts[1]}, {parts[0]}")
-                    selm = st.multiselect("Members", list(student_map.keys()), default=labels, key="dance_edit_members")
+                    ids = student_multiselect("Members", key="dance_edit_members", default_ids=current['member_ids'])
                     limits = {"Solo":1, "Duet":2, "Trio":3, "Group":None}
                     max_sel = limits.get(dtype)
                     if st.button("Update Dance", key="btn_edit_dance"):
-                        ids = [student_map[s] for s in selm]
                         if max_sel and len(ids) != max_sel:
                             st.error(f"{dtype} requires exactly {max_sel} student(s).")
                         else:
-                            update_dance(did, new_name, ids)
-                            st.success("Dance updated.")
+                            added, removed = update_dance(did, new_name, ids)
+                            st.success(f"Dance updated ({added} added, {removed} removed).")
                     if st.button("Delete Dance", key="btn_delete_dance"):
                         delete_dance(did)
                         st.success(f"Deleted dance '{current['name']}'")
 
         # Show lists in order
-        all_d = get_all_dances()
         for dtype in ["Solo","Duet","Trio","Group"]:
             with st.expander(f"{dtype} List", expanded=False):
-                subset = all_d[all_d.type == dtype].sort_values('name')
+                subset = rosters[rosters.type == dtype]
                 if subset.empty:
                     st.write("No dances.")
                 else:
                     for _, d in subset.iterrows():
-                        did = d['id']
                         if dtype == 'Solo':
-                            members = get_students_for_dance(did)
-                            mem = members['name'].iloc[0] if not members.empty else 'Unassigned'
+                            mem = d['member_names'][0] if d['member_names'] else 'Unassigned'
                             st.write(f"- {d['name']} – {mem}")
                         else:
                             st.write(f"- {d['name']}") # Simplified view for groups in main list
@@ -368,51 +244,130 @@ if st.session_state["authentication_status"]:
     elif menu == "🏆 Competitions":
         st.header("Competitions")
         with st.expander("Create/Edit Competitions", expanded=False):
-            compet_df = pd.read_sql("SELECT * FROM competitions ORDER BY name", conn)
-            students_df = get_all_students()
-            student_map = {f"{r['last_name']}, {r['first_name']}":r['id'] for _,r in students_df.iterrows()}
+            compet_df = get_all_competitions()
             cols = st.columns(2)
             # Create Competition
             with cols[0]:
                 name = st.text_input("Name", key="new_comp")
                 has_conv = st.checkbox("Includes Convention", key="new_conv")
-                sel = st.multiselect("Students", list(student_map.keys()), key="new_comp_sel")
+                sel = student_multiselect("Students", key="new_comp_sel")
                 if st.button("Add Competition", key="btn_new_comp"):
-                    add_competition(name,int(has_conv),[student_map[s] for s in sel])
+                    add_competition(name,int(has_conv),sel)
                     st.success(f"Competition '{name}' created.")
             # Edit/Delete Competition
             with cols[1]:
                 compet_df_local = compet_df.copy()
-                options = {r['name']:r['id'] for _,r in compet_df_local.iterrows()}
-                choice = st.selectbox("Select Competition to Edit", ["--"]+list(options.keys()), key="edit_comp_sel")
-                if choice and choice!="--":
-                    cid = options[choice]
+                comp_labels = dict(zip(compet_df_local['id'], compet_df_local['name']))
+                cid = st.selectbox("Select Competition to Edit", [None] + list(comp_labels), key="edit_comp_sel",
+                                   format_func=lambda c: "--" if c is None else comp_labels[c])
+                if cid is not None:
                     current = compet_df_local[compet_df_local.id==cid].iloc[0]
-                    df_m = get_students_for_competition(cid)
-                    labels = []
-                    for nm in df_m['name']:
-                        parts = nm.split(' ',1)
-                        if len(parts)==2:
-                            labels.append(f"{parts[1]}, {parts[0]}")
-                    selc = st.multiselect("Members", list(student_map.keys()), default=labels, key="edit_comp_members")
+                    members = get_students_for_competition(cid)
+                    new_name = st.text_input("Competition Name", value=current['name'], key="edit_comp_name")
+                    # Fee rules charge 'convention' fees only where this is set.
+                    has_conv = st.checkbox("Includes Convention", value=bool(current['has_convention']),
+                                           key="edit_comp_conv")
+                    selc = student_multiselect("Members", key="edit_comp_members", default_ids=[m.id for m in members])
                     if st.button("Update Competition", key="btn_edit_comp"):
-                        # This line was missing the update of the name and has_conv
-                        # I've left it as is from your script, but you may want to update it
-                        update_competition(cid, current['name'], 0, [student_map[s] for s in selc])
-                        st.success("Competition updated.")
+                        added, removed = update_competition(cid, new_name, int(has_conv), selc)
+                        st.success(f"Competition updated ({added} added, {removed} removed).")
                     if st.button("Delete Competition", key="btn_delete_comp"):
-                        c.execute("DELETE FROM competition_students WHERE competition_id=?",(cid,))
-                        c.execute("DELETE FROM competitions WHERE id=?",(cid,))
-                        conn.commit()
+                        delete_competition(cid)
                         st.success(f"Deleted competition '{current['name']}'")
         with st.expander("Competitions List", expanded=False):
-            compet_df_list = pd.read_sql("SELECT * FROM competitions ORDER BY name", conn)
+            compet_df_list = get_all_competitions()
             if compet_df_list.empty:
                 st.write("No competitions.")
             else:
-                for _, c in compet_df_list.sort_values('name').iterrows():
-                    st.write(f"- {c['name']}")
+                for name in compet_df_list['name'].sort_values():
+                    st.write(f"- {name}")
+
 
+    # --- Seasons Page ---
+    elif menu == "🗓 Seasons":
+        st.header("Seasons")
+        season_df = seasons.get_seasons()
+        with st.expander("Create Season", expanded=season_df.empty):
+            season_name = st.text_input("Season Name", key="season_name", placeholder="2025-26")
+            season_start = st.date_input("Starts On", key="season_start")
+            season_end = st.date_input("Ends On", key="season_end")
+            season_claim = st.checkbox("Move dances, competitions and plans without a season into it",
+                                       value=season_df.empty, key="season_claim")
+            if st.button("Create Season", key="btn_add_season"):
+                if season_name:
+                    seasons.add_season(season_name, season_start.isoformat(), season_end.isoformat(), season_claim)
+                    st.success(f"Season '{season_name}' created.")
+                else:
+                    st.error("Please enter a season name.")
+        if season_df.empty:
+            st.info("No seasons yet.")
+        else:
+            st.dataframe(season_df[['name', 'starts_on', 'ends_on', 'status', 'archived_at']], hide_index=True)
+            season_labels = dict(zip(season_df['id'], season_df['name'] + " (" + season_df['status'] + ")"))
+            season_id = st.selectbox("Season", list(season_labels), key="season_sel",
+                                     format_func=season_labels.get)
+            season = seasons.get_season(season_id)
+            blockers = seasons.archive_blockers(season_id) if season['status'] == seasons.OPEN else []
+            if blockers:
+                st.caption("This season can't be archived yet: " + "; ".join(blockers) + ".")
+            elif season['status'] == seasons.OPEN:
+                # Archived seasons move to their own file and leave the hot tables.
+                st.caption("Archiving moves this season's dances, competitions and plans into their own file; "
+                           "they stay viewable here.")
+                vacuum = st.checkbox("Compact the database afterwards", key="season_vacuum")
+                if st.button("Archive Season", key="btn_archive_season"):
+                    st.session_state["archive_job"] = jobs.submit(
+                        "archive_season", created_by=st.session_state.get("username"),
+                        season_id=int(season_id), vacuum=vacuum,
+                    )
+            job = job_status("archive_job")
+            if job is not None and job['status'] == jobs.DONE:
+                st.success("Season archived: " + ", ".join(f"{n} {t}" for t, n in job['result']['rows'].items()))
+            season_rosters = get_dance_rosters(season_id)
+            season_comps = get_all_competitions(season_id)
+            st.subheader(f"{season['name']}: {len(season_rosters)} dances, {len(season_comps)} competitions")
+            for _, d in season_rosters.iterrows():
+                st.write(f"- {d['type']}: {d['name']} ({len(d['member_ids'])} dancers)")
+            for name in season_comps['name']:
+                st.write(f"- Competition: {name}")
+
+    # --- Backups Page ---
+    elif menu == "💾 Backups":
+        st.header("Backups")
+        # Snapshots are copied online (see backup.py), so sessions keep working.
+        if backup.SCHEDULE_HOURS > 0:
+            st.caption(f"A backup is taken automatically every {backup.SCHEDULE_HOURS:g} hours; "
+                       f"the newest {backup.BACKUP_KEEP} are kept.")
+        else:
+            st.caption(f"Automatic backups are off (set DANCE_BACKUP_HOURS); the newest {backup.BACKUP_KEEP} are kept.")
+        if st.button("Back Up Now", key="btn_backup"):
+            st.session_state["backup_job"] = jobs.submit("backup", created_by=st.session_state.get("username"))
+        job = job_status("backup_job")
+        if job is not None and job['status'] == jobs.DONE:
+            st.success(f"Backed up to {job['result']['name']} ({job['result']['bytes'] / 1e6:.1f} MB).")
+
+        snapshots = backup.list_snapshots()
+        if not snapshots:
+            st.info("No backups yet.")
+        else:
+            st.dataframe(pd.DataFrame([
+                {"backup": s['name'], "taken": s['created'], "MB": round(s['bytes'] / 1e6, 2)} for s in snapshots
+            ]), hide_index=True)
+            snap = st.selectbox("Backup", snapshots, key="backup_sel", format_func=lambda s: s['name'])
+            snap_name = snap['name']
+            with open(snap['path'], "rb") as f:
+                st.download_button("Download Backup", data=f, file_name=snap_name, key="btn_backup_download")
+            if snap['archives']:
+                st.caption(f"The download is the main database; this backup's {len(snap['archives'])} season "
+                           f"archive file(s) stay in {os.path.basename(backup.archive_folder(snap['path']))} "
+                           "on the server and are restored with it.")
+            st.subheader("Restore")
+            st.warning("Restoring replaces all current data with this backup. "
+                       "The current data is backed up first, so a restore can be undone.")
+            confirm = st.checkbox(f"Replace all data with {snap_name}", key="backup_restore_confirm")
+            if st.button("Restore Backup", key="btn_backup_restore", disabled=not confirm):
+                before = backup.restore(snap_name)
+                st.success(f"Restored {snap_name}. The data it replaced is in {os.path.basename(before)}.")
 
     # --- Payment Plans Page ---
     # This section is removed as it's now a separate page.
@@ -420,6 +375,9 @@ if st.session_state["authentication_status"]:
     else:
         st.info("Select a module from the sidebar.")
 
+    # Query timings for this rerun (only when DANCE_INSTRUMENT is set)
+    instrument.sidebar_panel(st, instrument.end_run())
+
 
 elif st.session_state["authentication_status"] is False:
     st.error("Username/password is incorrect")
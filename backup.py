@@ -0,0 +1,231 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+import warnings
+from datetime import datetime
+
+import db
+import instrument
+import migrations
+
+# --- ONLINE BACKUP ---
+# Snapshots are taken with SQLite's backup API from a pooled connection
+# while sessions keep working. The copy runs BACKUP_STEP_PAGES pages at a
+# time with a short pause between steps, so writers get the write lock in
+# between. The source connection holds one read transaction for the whole
+# copy: in WAL mode that does not block writers, and it pins the snapshot
+# to the moment the backup started (without it, every commit by another
+# connection would restart the copy from the first page). Snapshots are
+# plain SQLite files under backups/ beside the database, each with a
+# <name>.archive/ folder holding copies of the archive files of the seasons
+# it lists as archived (see seasons.py); the newest BACKUP_KEEP are kept. Set DANCE_BACKUP_HOURS to take one automatically
+# from a timer thread in the server process.
+BACKUP_STEP_PAGES = int(os.environ.get("DANCE_BACKUP_STEP_PAGES", "256"))
+BACKUP_PAUSE_S = 0.005
+BACKUP_KEEP = int(os.environ.get("DANCE_BACKUP_KEEP", "14"))
+SCHEDULE_HOURS = float(os.environ.get("DANCE_BACKUP_HOURS", "0"))  # 0 = no automatic backups
+
+_schedule = None
+_schedule_lock = threading.Lock()
+
+
+def backup_dir():
+    folder = os.path.join(os.path.dirname(os.path.abspath(db.DB_PATH)), "backups")
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def archive_folder(path):
+    """Where the season archive files of snapshot ``path`` are kept."""
+    return os.path.splitext(path)[0] + ".archive"
+
+
+def list_snapshots():
+    """Snapshots on disk, newest first, as dicts of name, path, archives (file names), bytes and created."""
+    folder = backup_dir()
+    snapshots = []
+    for name in os.listdir(folder):
+        if name.endswith(".db"):
+            path = os.path.join(folder, name)
+            stat = os.stat(path)
+            archives = archive_folder(path)
+            files = sorted(os.listdir(archives)) if os.path.isdir(archives) else []
+            size = stat.st_size + sum(os.path.getsize(os.path.join(archives, f)) for f in files)
+            snapshots.append({"name": name, "path": path, "archives": files, "bytes": size,
+                              "created": datetime.fromtimestamp(stat.st_mtime)})
+    return sorted(snapshots, key=lambda s: (s["created"], s["name"]), reverse=True)
+
+
+def _remove(path):
+    shutil.rmtree(archive_folder(path), ignore_errors=True)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _rotate(exclude=()):
+    # Snapshots named in ``exclude`` are neither deleted nor counted.
+    rotating = [s for s in list_snapshots() if s["name"] not in exclude]
+    for old in rotating[BACKUP_KEEP:]:
+        _remove(old["path"])
+
+
+def _archive_files(conn):
+    # The archived seasons' files, as of the transaction open on ``conn``.
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'seasons'").fetchone():
+        return []
+    return [r[0] for r in conn.execute("SELECT archive_file FROM seasons WHERE status = 'archived'")]
+
+
+def _copy_archives(names, source_dir, target_dir):
+    # Archive files are written once, when their season is archived, so a
+    # plain copy is consistent. Each lands under a temporary name first.
+    os.makedirs(target_dir, exist_ok=True)
+    for name in names:
+        tmp = os.path.join(target_dir, f"{name}.{os.getpid()}.tmp")
+        shutil.copyfile(os.path.join(source_dir, name), tmp)
+        os.replace(tmp, os.path.join(target_dir, name))
+
+
+def snapshot(label=None, progress=None, exclude=()):
+    """Copy the live database to a new snapshot file without blocking writers; returns its path.
+
+    ``progress(done, total)`` is called with page counts after each step
+    and may raise to abandon the copy (no partial file is left behind).
+    The archive files of the seasons archived at that moment are copied
+    alongside. Older snapshots beyond BACKUP_KEEP are then deleted, except
+    those whose names are in ``exclude``.
+    """
+    import seasons
+
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    name = f"dance-{stamp}-{uuid.uuid4().hex[:6]}{'-' + label if label else ''}.db"
+    path = os.path.join(backup_dir(), name)
+    tmp = f"{path}.{os.getpid()}.tmp"
+
+    def step(_status, remaining, total):
+        if progress is not None:
+            progress(total - remaining, total)
+        time.sleep(BACKUP_PAUSE_S)
+
+    target = sqlite3.connect(tmp)
+    try:
+        with db.connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                archives = _archive_files(conn)  # also starts the read snapshot
+                conn.backup(target, pages=BACKUP_STEP_PAGES, progress=step)
+            finally:
+                conn.execute("ROLLBACK")
+        # The copy is a standalone file: no WAL to ship alongside it.
+        target.execute("PRAGMA journal_mode=DELETE")
+        target.close()
+        # A missing archive is already lost; back up the rest (restore()
+        # refuses snapshots that lack one).
+        missing = [f for f in archives if not os.path.exists(os.path.join(seasons.archive_dir(), f))]
+        if missing:
+            warnings.warn(f"Season archive(s) missing, not in the snapshot: {', '.join(missing)}")
+        _copy_archives([f for f in archives if f not in missing], seasons.archive_dir(), archive_folder(path))
+        os.replace(tmp, path)
+    except BaseException:
+        target.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        shutil.rmtree(archive_folder(path), ignore_errors=True)
+        raise
+    _rotate(exclude)
+    return path
+
+
+def restore(name):
+    """Replace the live database's contents with snapshot ``name``; returns the path of a snapshot of what was replaced.
+
+    The current data is snapshotted first, so a restore can itself be
+    undone. Writers wait (up to the busy timeout) while the pages are
+    copied in; the snapshot's season archive files then replace the live
+    ones. Afterwards the schema is brought up to date, every cached read
+    is dropped, and jobs that were running when the snapshot was taken
+    are marked failed.
+    """
+    import cache
+    import seasons
+
+    source_path = os.path.join(backup_dir(), os.path.basename(name))
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(f"No snapshot named {name!r}")
+    source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+    try:
+        check = source.execute("PRAGMA quick_check").fetchone()[0]
+        if check != "ok":
+            raise ValueError(f"Snapshot {name!r} failed its integrity check: {check}")
+        archives = _archive_files(source)
+        missing = [f for f in archives if not os.path.exists(os.path.join(archive_folder(source_path), f))]
+        if missing:
+            raise ValueError(f"Snapshot {name!r} is missing season archive(s): {', '.join(missing)}")
+        # Keep the snapshot being restored even if it is the oldest.
+        before = snapshot(label="pre-restore", exclude={os.path.basename(source_path)})
+        with db.connection() as conn:
+            source.backup(conn)  # one step: the restore is all or nothing
+    finally:
+        source.close()
+    _copy_archives(archives, archive_folder(source_path), seasons.archive_dir())
+    seasons.reload_archives()
+
+    migrations.migrate(force=True)
+    with db.transaction() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = 'interrupted by a restore', finished_at = ?"
+            " WHERE status IN ('queued', 'running')", (datetime.now().isoformat(timespec="seconds"),)
+        )
+        tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    cache.bump(*tables)
+    cache.clear()
+    return before
+
+
+# --- SCHEDULE ---
+def _due(hours):
+    # Several server processes (or a restart) share the folder: skip the
+    # run if someone took a snapshot recently enough.
+    latest = next(iter(list_snapshots()), None)
+    return latest is None or (datetime.now() - latest["created"]).total_seconds() >= hours * 3600 * 0.9
+
+
+def _schedule_loop(stop, hours):
+    while True:
+        try:
+            if _due(hours):
+                snapshot(label="auto")
+        except Exception:
+            traceback.print_exc()
+        if stop.wait(hours * 3600):
+            return
+
+
+def start_schedule(hours=SCHEDULE_HOURS):
+    """Take a snapshot every ``hours`` from a daemon timer thread; once per process. Returns the thread or None."""
+    global _schedule
+    if hours <= 0:
+        return None
+    with _schedule_lock:
+        if _schedule is None:
+            stop = threading.Event()
+            thread = threading.Thread(target=_schedule_loop, args=(stop, hours), name="dance-backup", daemon=True)
+            thread.start()
+            _schedule = (thread, stop)
+    return _schedule[0]
+
+
+def stop_schedule():
+    global _schedule
+    with _schedule_lock:
+        if _schedule is not None:
+            _schedule[1].set()
+            _schedule = None
+
+
+# --- INSTRUMENTATION (no-op unless DANCE_INSTRUMENT is set) ---
+instrument.instrument_module(globals())
@@ -0,0 +1,71 @@
+"""Command line entry point: ``python -m bench run|startup|compare``.
+
+Run from the repository root so the app modules are importable::
+
+    python -m bench run --scale large --out bench-2026.json
+    python -m bench startup --out startup-2026.json
+    python -m bench compare bench-2025.json bench-2026.json
+"""
+import argparse
+import json
+import sys
+
+from bench import datagen, run as runner, startup
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="generate a database and time every function and page")
+    p_run.add_argument("--scale", choices=sorted(datagen.SCALES), default="small")
+    p_run.add_argument("--students", type=int)
+    p_run.add_argument("--dance-memberships", type=int)
+    p_run.add_argument("--competitions", type=int)
+    p_run.add_argument("--plan-items", type=int)
+    p_run.add_argument("--repeat", type=int, default=5)
+    p_run.add_argument("--db", help="where to create the database (default: a temp dir)")
+    p_run.add_argument("--out", help="write the JSON report here instead of stdout")
+
+    p_start = sub.add_parser("startup", help="time cold process starts and reruns of each page")
+    p_start.add_argument("--scale", choices=sorted(datagen.SCALES), default="small")
+    p_start.add_argument("--repeat", type=int, default=5, help="fresh processes per page")
+    p_start.add_argument("--reruns", type=int, default=5, help="reruns per process after the first run")
+    p_start.add_argument("--db", help="where to create the database (default: a temp dir)")
+    p_start.add_argument("--out", help="write the JSON report here instead of stdout")
+
+    p_cmp = sub.add_parser("compare", help="compare two JSON reports")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("current")
+    p_cmp.add_argument("--threshold", type=float, default=1.2,
+                       help="flag timings whose median changed by more than this factor")
+
+    args = parser.parse_args(argv)
+
+    if args.command in ("run", "startup"):
+        scale = dict(datagen.SCALES[args.scale])
+        for key in scale:
+            if getattr(args, key, None) is not None:
+                scale[key] = getattr(args, key)
+        if args.command == "run":
+            report = runner.run(scale, repeat=args.repeat, db_path=args.db)
+        else:
+            report = startup.run(scale, repeat=args.repeat, reruns=args.reruns, db_path=args.db)
+        text = json.dumps(report, indent=2)
+        if args.out:
+            with open(args.out, "w") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+        return 0
+
+    rows = runner.compare(runner.load(args.baseline), runner.load(args.current), args.threshold)
+    width = max((len(r[0]) for r in rows), default=10)
+    print(f"{'name':<{width}}  {'base':>10}  {'now':>10}  {'ratio':>6}")
+    for name, base, cur, ratio, flag in rows:
+        print(f"{name:<{width}}  {base:>10.3f}  {cur:>10.3f}  {ratio:>6.2f}  {flag}")
+    return 1 if any(r[4] in ("slower", "more memory") for r in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
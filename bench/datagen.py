@@ -0,0 +1,149 @@
+"""Generate a realistic studio database at a configurable scale."""
+import random
+from datetime import date, datetime, timedelta
+
+import db
+import migrations
+
+FIRST_NAMES = [
+    "Ava", "Mia", "Emma", "Olivia", "Sophia", "Isabella", "Charlotte", "Amelia", "Harper", "Evelyn",
+    "Abigail", "Emily", "Ella", "Madison", "Scarlett", "Grace", "Chloe", "Lily", "Aria", "Zoe",
+    "Noah", "Liam", "Mason", "Lucas", "Ethan", "Mary Ann", "Anna Grace", "Jo", "Maya", "Nora",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez",
+    "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore",
+    "Jackson", "Martin", "Lee", "Perez", "Thompson", "White", "Harris", "Van Dyke", "De La Cruz",
+    "O'Neil", "St. James", "Nguyen",
+]
+CATALOG = {
+    "Tuition": [("Monthly Tuition", 185.0), ("Annual Tuition", 1950.0), ("Sibling Tuition", 150.0)],
+    "Solo/Duo/Trio": [("Solo Fee", 120.0), ("Duet Fee", 90.0), ("Trio Fee", 75.0)],
+    "Groups": [("Small Group", 60.0), ("Large Group", 55.0), ("Line", 50.0)],
+    "Competitions & Conventions": [("Regional Entry", 95.0), ("Nationals Entry", 140.0),
+                                   ("Convention Pass", 310.0)],
+    "Choreography": [("Solo Choreography", 400.0), ("Group Choreography", 150.0)],
+    "Costume Fees": [("Solo Costume", 250.0), ("Group Costume", 140.0)],
+    "Administrative Fees": [("Registration", 45.0), ("Late Fee", 25.0)],
+    "Miscellaneous Fees": [("Team Jacket", 80.0), ("Photo Package", 35.0)],
+}
+# (type, share of dances, min members, max members)
+DANCE_SHAPES = [("Solo", 0.45, 1, 1), ("Duet", 0.15, 2, 2), ("Trio", 0.1, 3, 3), ("Group", 0.3, 6, 24)]
+
+SCALES = {
+    "small": {"students": 500, "dance_memberships": 2500, "competitions": 6, "plan_items": 5000},
+    "medium": {"students": 2500, "dance_memberships": 12500, "competitions": 12, "plan_items": 25000},
+    "large": {"students": 10000, "dance_memberships": 50000, "competitions": 20, "plan_items": 100000},
+}
+
+
+def generate(path, students, dance_memberships, competitions, plan_items, seed=1):
+    """Create a database at ``path``, which should not exist yet, and fill it.
+
+    Returns a dict of row counts per table.
+    """
+    rng = random.Random(seed)
+    db.configure(path)
+    migrations.migrate()
+
+    student_rows = []
+    for _ in range(students):
+        born = date(2006, 1, 1) + timedelta(days=rng.randrange(14 * 365))
+        student_rows.append((rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), born.isoformat()))
+
+    dance_rows, memberships = [], []
+    counts = {shape[0]: 0 for shape in DANCE_SHAPES}
+    weights = [shape[1] for shape in DANCE_SHAPES]
+    while len(memberships) < dance_memberships:
+        dtype, _, lo, hi = rng.choices(DANCE_SHAPES, weights)[0]
+        counts[dtype] += 1
+        dance_rows.append((f"{dtype} {counts[dtype]}", dtype))
+        did = len(dance_rows)
+        for sid in rng.sample(range(1, students + 1), min(students, rng.randint(lo, hi))):
+            memberships.append((did, sid))
+
+    comp_rows, comp_members = [], []
+    for i in range(competitions):
+        comp_rows.append((f"Competition {i + 1}", rng.randint(0, 1)))
+        share = rng.uniform(0.1, 0.5)
+        for sid in rng.sample(range(1, students + 1), int(students * share)):
+            comp_members.append((i + 1, sid))
+
+    catalog_rows = [(cat, name, price) for cat, items in CATALOG.items() for name, price in items]
+    all_items = [(name, price, cat) for cat, name, price in catalog_rows]
+
+    plan_rows, item_rows = [], []
+    created = datetime(2025, 8, 1)
+    while len(item_rows) < plan_items:
+        plan_rows.append((rng.randint(1, students), None, created.isoformat(), rng.randint(6, 10)))
+        pid = len(plan_rows)
+        for name, price, cat in rng.sample(all_items, rng.randint(4, 14)):
+            item_rows.append((pid, name, price, cat))
+        item_rows.append((pid, "Down Payment 1", 100.0, "Down Payment"))
+
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO students (first_name, last_name, dob) VALUES (?, ?, ?)", student_rows)
+        conn.executemany("INSERT INTO dances (name, type) VALUES (?, ?)", dance_rows)
+        conn.executemany("INSERT INTO dance_students (dance_id, student_id) VALUES (?, ?)", memberships)
+        conn.executemany("INSERT INTO competitions (name, has_convention) VALUES (?, ?)", comp_rows)
+        conn.executemany("INSERT INTO competition_students (competition_id, student_id) VALUES (?, ?)",
+                         comp_members)
+        conn.executemany("INSERT INTO catalog_items (category, name, price) VALUES (?, ?, ?)", catalog_rows)
+        conn.executemany("INSERT INTO payment_templates (name) VALUES (?)",
+                         [("Standard Season",), ("Competition Team",)])
+        conn.executemany("INSERT INTO template_items (template_id, name, price, item_type) VALUES (?, ?, ?, ?)",
+                         [(1, name, price, cat) for name, price, cat in all_items[:6]]
+                         + [(2, name, price, cat) for name, price, cat in all_items])
+        conn.executemany(
+            "INSERT INTO fee_rules (kind, dance_type, catalog_item_id)"
+            " SELECT ?, ?, id FROM catalog_items WHERE name = ?",
+            [("competition", None, "Regional Entry"), ("convention", None, "Convention Pass"),
+             ("entry", "Solo", "Solo Fee"), ("entry", "Duet", "Duet Fee"), ("entry", "Trio", "Trio Fee"),
+             ("entry", None, "Small Group")],
+        )
+        conn.executemany("INSERT INTO student_plans (student_id, template_id, created_at, months)"
+                         " VALUES (?, ?, ?, ?)", plan_rows)
+        conn.executemany("INSERT INTO plan_items (plan_id, name, price, item_type) VALUES (?, ?, ?, ?)",
+                         item_rows)
+    import payment_plan
+    payment_plan.recompute_schedules()
+    with db.connection() as conn:
+        conn.execute("ANALYZE")
+
+    return {
+        "students": len(student_rows), "dances": len(dance_rows), "dance_students": len(memberships),
+        "competitions": len(comp_rows), "competition_students": len(comp_members),
+        "catalog_items": len(catalog_rows), "student_plans": len(plan_rows), "plan_items": len(item_rows),
+        "plan_schedule": db.query("SELECT COUNT(*) FROM plan_schedule")[0][0],
+    }
+
+
+def students_csv(path, rows, seed=2):
+    """Write a students import CSV with a sprinkling of duplicates and bad rows."""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        f.write("first,last,dob\n")
+        line = ""
+        for i in range(rows):
+            if i % 50 == 49:
+                f.write(line)  # repeat the previous row
+                continue
+            born = date(2006, 1, 1) + timedelta(days=rng.randrange(14 * 365))
+            first = "" if i % 97 == 0 else rng.choice(FIRST_NAMES)
+            line = f"{first},{rng.choice(LAST_NAMES)}-{i},{born.isoformat()}\n"
+            f.write(line)
+
+
+def dances_csv(path, dances, labels, seed=3):
+    """Write a dances import CSV whose member columns use the given "Last, First" labels."""
+    rng = random.Random(seed)
+    width = 24
+    with open(path, "w") as f:
+        f.write("dancetype,dancename," + ",".join(f"student{i + 1}" for i in range(width)) + "\n")
+        for i in range(dances):
+            dtype, _, lo, hi = rng.choices(DANCE_SHAPES, [s[1] for s in DANCE_SHAPES])[0]
+            members = rng.sample(labels, min(len(labels), rng.randint(lo, hi)))
+            if i % 50 == 0:
+                members.append("Unknown, Student")
+            cells = [f'"{m}"' for m in members[:width]] + [""] * (width - len(members[:width]))
+            f.write(f"{dtype},Imported {dtype} {i + 1}," + ",".join(cells) + "\n")
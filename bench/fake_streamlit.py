@@ -0,0 +1,172 @@
+"""A stand-in for the ``streamlit`` module so pages can be rendered headless.
+
+Widgets answer from a ``choices`` dict keyed by widget key (or label when a
+widget has no key). A choice may be a value or a function of the widget's
+options; unlisted widgets return their default. Everything that only draws
+(write, markdown, dataframe, ...) is a no-op.
+"""
+import sys
+import types
+from contextlib import contextmanager
+from datetime import date
+
+
+class _Null:
+    """Absorbs any attribute access, call or ``with`` block."""
+
+    def __getattr__(self, name):
+        return self
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __bool__(self):
+        return False
+
+
+class SessionState(dict):
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+class _Secrets(dict):
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        return _Secrets(value) if isinstance(value, dict) else value
+
+    def to_dict(self):
+        return dict(self)
+
+
+class FakeStreamlit(_Null):
+    def __init__(self, choices=None, secrets=None):
+        self.choices = choices or {}
+        self.session_state = SessionState()
+        self.secrets = _Secrets(secrets or {})
+        self.sidebar = self
+        self.widget_calls = 0
+
+    def _choose(self, key, label, options, default):
+        self.widget_calls += 1
+        choice = self.choices.get(key, self.choices.get(label, default))
+        if callable(choice):
+            choice = choice(list(options) if options is not None else None)
+        if key is not None:
+            self.session_state[key] = choice
+        return choice
+
+    def selectbox(self, label, options, index=0, key=None, **kwargs):
+        options = list(options)
+        return self._choose(key, label, options, options[index] if options else None)
+
+    def radio(self, label, options, index=0, key=None, **kwargs):
+        return self.selectbox(label, options, index=index, key=key)
+
+    def multiselect(self, label, options, default=None, key=None, **kwargs):
+        return self._choose(key, label, options, list(default or []))
+
+    def text_input(self, label, value="", key=None, **kwargs):
+        return self._choose(key, label, None, value)
+
+    def number_input(self, label, min_value=None, value=None, key=None, **kwargs):
+        return self._choose(key, label, None, value if value is not None else (min_value or 0.0))
+
+    def slider(self, label, min_value=None, max_value=None, value=None, key=None, **kwargs):
+        return self._choose(key, label, None, value if value is not None else min_value)
+
+    def date_input(self, label, value=None, key=None, **kwargs):
+        return self._choose(key, label, None, value if value is not None else date.today())
+
+    def checkbox(self, label, value=False, key=None, **kwargs):
+        return self._choose(key, label, None, value)
+
+    def toggle(self, label, value=False, key=None, **kwargs):
+        return self._choose(key, label, None, value)
+
+    def button(self, label, key=None, **kwargs):
+        return self._choose(key, label, None, False)
+
+    def form_submit_button(self, label, key=None, **kwargs):
+        return self._choose(key, label, None, False)
+
+    def download_button(self, label, data=None, key=None, **kwargs):
+        return self._choose(key, label, None, False)
+
+    def file_uploader(self, label, key=None, **kwargs):
+        return self._choose(key, label, None, None)
+
+    def columns(self, spec, **kwargs):
+        n = spec if isinstance(spec, int) else len(spec)
+        return [_Null() for _ in range(n)]
+
+    def tabs(self, labels):
+        return [_Null() for _ in labels]
+
+    def cache_resource(self, func=None, **kwargs):
+        return func if func is not None else (lambda f: f)
+
+    cache_data = cache_resource
+
+    def stop(self):
+        raise _StopPage()
+
+    def rerun(self):
+        raise _StopPage()
+
+
+class _StopPage(Exception):
+    pass
+
+
+class FakeAuthenticate:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def login(self, *args, **kwargs):
+        return None
+
+    def logout(self, *args, **kwargs):
+        return None
+
+
+# App modules (not page scripts) that do ``import streamlit as st`` at import time.
+STREAMLIT_IMPORTERS = ("widgets",)
+
+
+@contextmanager
+def installed(fake):
+    """Make ``import streamlit`` (and the authenticator) resolve to ``fake``."""
+    stauth = types.ModuleType("streamlit_authenticator")
+    stauth.Authenticate = FakeAuthenticate
+    saved = {name: sys.modules.get(name) for name in ("streamlit", "streamlit_authenticator")}
+    sys.modules["streamlit"] = fake
+    sys.modules["streamlit_authenticator"] = stauth
+    # Modules imported by an earlier render still hold the fake they were
+    # imported under; point them at this one.
+    bound = {name: sys.modules[name].st for name in STREAMLIT_IMPORTERS if name in sys.modules}
+    for name in bound:
+        sys.modules[name].st = fake
+    try:
+        yield fake
+    except _StopPage:
+        pass
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+        for name, st in bound.items():
+            sys.modules[name].st = st
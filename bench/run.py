@@ -0,0 +1,330 @@
+"""Time every data-access function and page render against a generated database."""
+import functools
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+import db
+from bench import datagen
+from bench.fake_streamlit import FakeStreamlit, installed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _summary(samples):
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "n": len(ms),
+        "min_ms": round(ms[0], 3),
+        "median_ms": round(statistics.median(ms), 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        "max_ms": round(ms[-1], 3),
+    }
+
+
+def _time(func, repeat, setup=None):
+    samples = []
+    for i in range(repeat):
+        args = setup(i) if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - start)
+    return _summary(samples)
+
+
+def _uncached(func):
+    return getattr(func, "uncached", func)
+
+
+def _peak_kib(func, *args):
+    """Peak memory allocated while ``func`` runs, in KiB."""
+    tracemalloc.start()
+    try:
+        func(*args)
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def _concurrent(func, threads, calls):
+    """Call ``func(thread, i)`` ``calls`` times on each of ``threads`` threads and wait for all."""
+    def work(t):
+        for i in range(calls):
+            func(t, i)
+    pool = [threading.Thread(target=work, args=(t,)) for t in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+
+def function_cases(workdir, scale):
+    """(name, callable, setup) for every function in studio and payment_plan."""
+    import backup
+    import cache
+    import export
+    import ledger
+    import payment_plan
+    import statements
+    import studio
+
+    rng = random.Random(7)
+    student_ids = [r[0] for r in db.query("SELECT id FROM students")]
+    dance_ids = [r[0] for r in db.query("SELECT id FROM dances WHERE type = 'Group'")]
+    comp_ids = [r[0] for r in db.query("SELECT id FROM competitions")]
+    plan_ids = [r[0] for r in db.query("SELECT id FROM student_plans")]
+    template_ids = [r[0] for r in db.query("SELECT id FROM payment_templates")]
+    categories = [r[0] for r in db.query("SELECT DISTINCT category FROM catalog_items")]
+    labels = list(studio.get_student_label_index())
+
+    students_csv = os.path.join(workdir, "students.csv")
+    datagen.students_csv(students_csv, max(100, scale["students"] // 2))
+    dances_csv = os.path.join(workdir, "dances.csv")
+    datagen.dances_csv(dances_csv, max(20, scale["dance_memberships"] // 100), labels)
+
+    plan_items = [(f"Item {i}", 50.0 + i, "Tuition") for i in range(12)]
+    pick = rng.choice
+
+    def new_student(i):
+        return (studio.add_student("Bench", f"Delete-{i}-{rng.random()}", "2012-01-01"),)
+
+    def stale_directory(i):
+        cache.bump("students")
+        return ()
+
+    def new_dance(i):
+        return (studio.add_dance(f"Bench Delete {i}", "Group", rng.sample(student_ids, 8)),)
+
+    catalog_sql = "SELECT id, name, price FROM catalog_items WHERE category = ? ORDER BY name"
+    students_sql = "SELECT id, first_name, last_name, dob FROM students ORDER BY last_name, first_name"
+
+    return [
+        # db: DataFrame vs row tuples for the same lookup
+        ("db.read_sql (catalog items)", db.read_sql, lambda i: (catalog_sql, (pick(categories),))),
+        ("db.rows (catalog items)", db.rows, lambda i: (catalog_sql, (pick(categories),))),
+        ("db.columns (catalog items)", db.columns, lambda i: (catalog_sql, (pick(categories),))),
+        ("db.read_sql (all students)", db.read_sql, lambda i: (students_sql,)),
+        ("db.rows (all students)", db.rows, lambda i: (students_sql,)),
+        # studio: students
+        ("studio.get_all_students", _uncached(studio.get_all_students), None),
+        ("studio.get_all_students [cached]", studio.get_all_students, None),
+        ("studio.add_student", studio.add_student, lambda i: ("Bench", f"Student {i}", "2012-05-06")),
+        ("studio.update_student", studio.update_student,
+         lambda i: (pick(student_ids), "Bench", f"Updated {i}", "2012-05-06")),
+        ("studio.delete_student", studio.delete_student, new_student),
+        ("studio.add_student (16 sessions x 20)", lambda: _concurrent(
+            lambda t, i: studio.add_student("Bench", f"Session {t}-{i}", "2012-05-06"), 16, 20), None),
+        ("studio.import_students", lambda path: studio.import_students(path), lambda i: (students_csv,)),
+        # studio: dances
+        ("studio.get_all_dances", _uncached(studio.get_all_dances), None),
+        ("studio.get_dance_rosters", _uncached(studio.get_dance_rosters), None),
+        ("studio.get_dance_rosters [cached]", studio.get_dance_rosters, None),
+        ("studio.get_students_for_dance", _uncached(studio.get_students_for_dance), lambda i: (pick(dance_ids),)),
+        ("studio.get_dances_for_student", _uncached(studio.get_dances_for_student),
+         lambda i: (pick(student_ids),)),
+        ("studio.get_student_summary", _uncached(studio.get_student_summary), lambda i: (pick(student_ids),)),
+        ("studio.get_student_summaries", _uncached(studio.get_student_summaries), None),
+        ("studio.student_directory (rebuild)", studio.student_directory, stale_directory),
+        ("studio.student_directory", studio.student_directory, None),
+        ("studio.get_student_labels", studio.get_student_labels, None),
+        ("studio.add_dance", studio.add_dance, lambda i: (f"Bench Group {i}", "Group", rng.sample(student_ids, 16))),
+        ("studio.update_dance", studio.update_dance,
+         lambda i: (pick(dance_ids), f"Bench Update {i}", rng.sample(student_ids, 16))),
+        ("studio.update_dance (one member changed)", studio.update_dance,
+         lambda i: (dance_ids[0], "Bench Steady", student_ids[:39] + [student_ids[39 + i % 2]])),
+        ("studio.update_dances (50 dances)", studio.update_dances,
+         lambda i: ([(did, None, rng.sample(student_ids, 16)) for did in rng.sample(dance_ids, min(50, len(dance_ids)))],)),
+        ("studio.delete_dance", studio.delete_dance, new_dance),
+        ("studio.import_dances", lambda path: studio.import_dances(path), lambda i: (dances_csv,)),
+        # studio: competitions
+        ("studio.get_all_competitions", _uncached(studio.get_all_competitions), None),
+        ("studio.get_students_for_competition", _uncached(studio.get_students_for_competition),
+         lambda i: (pick(comp_ids),)),
+        ("studio.get_competitions_for_student", _uncached(studio.get_competitions_for_student),
+         lambda i: (pick(student_ids),)),
+        ("studio.add_competition", studio.add_competition,
+         lambda i: (f"Bench Comp {i}", 1, rng.sample(student_ids, min(200, len(student_ids))))),
+        ("studio.update_competition", studio.update_competition,
+         lambda i: (pick(comp_ids), f"Bench Comp {i}", 0, rng.sample(student_ids, min(200, len(student_ids))))),
+        # payment_plan: catalog
+        ("payment_plan.get_catalog_categories", _uncached(payment_plan.get_catalog_categories), None),
+        ("payment_plan.get_catalog_items", _uncached(payment_plan.get_catalog_items), lambda i: (pick(categories),)),
+        ("payment_plan.get_catalog_items [cached]", payment_plan.get_catalog_items,
+         lambda i: (categories[0],)),
+        ("payment_plan.add_catalog_item", payment_plan.add_catalog_item,
+         lambda i: ("Miscellaneous Fees", f"Bench Fee {i}", 10.0)),
+        # payment_plan: competition fees
+        ("payment_plan.get_fee_lines", _uncached(payment_plan.get_fee_lines), None),
+        ("payment_plan.get_fee_totals", _uncached(payment_plan.get_fee_totals), None),
+        ("payment_plan.get_student_fees", payment_plan.get_student_fees, lambda i: (pick(student_ids),)),
+        # payment_plan: templates
+        ("payment_plan.get_templates", _uncached(payment_plan.get_templates), None),
+        ("payment_plan.get_template_items", _uncached(payment_plan.get_template_items),
+         lambda i: (pick(template_ids),)),
+        ("payment_plan.add_template", payment_plan.add_template, lambda i: (f"Bench Template {i}",)),
+        ("payment_plan.add_template_item", payment_plan.add_template_item,
+         lambda i: (pick(template_ids), f"Bench Item {i}", 25.0, "Tuition")),
+        # payment_plan: plans
+        ("payment_plan.get_student_plans", _uncached(payment_plan.get_student_plans),
+         lambda i: (pick(student_ids),)),
+        ("payment_plan.get_plan_items", _uncached(payment_plan.get_plan_items), lambda i: (pick(plan_ids),)),
+        ("payment_plan.add_student_plan", payment_plan.add_student_plan, lambda i: (pick(student_ids), None)),
+        ("payment_plan.add_plan_item", payment_plan.add_plan_item,
+         lambda i: (pick(plan_ids), f"Bench Item {i}", 40.0, "Tuition")),
+        ("payment_plan.save_plan", payment_plan.save_plan,
+         lambda i: (pick(student_ids), plan_items, [100.0, 50.0], 8)),
+        ("payment_plan.get_schedule", _uncached(payment_plan.get_schedule), lambda i: (pick(plan_ids),)),
+        ("payment_plan.recompute_schedules (all plans)", payment_plan.recompute_schedules, None),
+        ("payment_plan.requote_plans (all plans)", payment_plan.requote_plans, None),
+        ("payment_plan.update_plan_months (100 plans)", payment_plan.update_plan_months,
+         lambda i: (rng.sample(plan_ids, min(100, len(plan_ids))), 8)),
+        ("export.export plans csv", lambda: export.export("plans", "csv", os.path.join(workdir, "plans.csv")), None),
+        ("export.export rosters csv", lambda: export.export("rosters", "csv", os.path.join(workdir, "rosters.csv")),
+         None),
+        ("statements.render_pdf", lambda s: statements.render_pdf(s),
+         lambda i: (statements._load([pick(plan_ids)]).popitem()[1],)),
+        ("statements.render_statements (all plans, cached)", statements.render_statements, None),
+        ("backup.snapshot", lambda: backup.snapshot("bench"), None),
+        # Writes while a snapshot is copying: compare with the plain add_student case.
+        ("studio.add_student (16 sessions x 20) during backup.snapshot", lambda: _concurrent(
+            lambda t, i: backup.snapshot("bench") if (t, i) == (0, 0) else
+            studio.add_student("Bench", f"Backup {t}-{i}", "2012-05-06"), 16, 20), None),
+        ("ledger.record_payment", ledger.record_payment, lambda i: (pick(plan_ids), 75.0)),
+        ("ledger.get_student_balances", _uncached(ledger.get_student_balances), lambda i: (pick(student_ids),)),
+        ("ledger.get_outstanding_cents", _uncached(ledger.get_outstanding_cents), lambda i: (pick(student_ids),)),
+        ("ledger.get_overdue", ledger._get_overdue.uncached, lambda i: ("2026-03-15",)),
+        ("ledger.rebuild_balances", ledger.rebuild_balances, None),
+        ("payment_plan.preview_template_plans (dance)",
+         lambda t, d: payment_plan.preview_template_plans(t, 8, [100.0], dance_id=d),
+         lambda i: (pick(template_ids), pick(dance_ids))),
+        ("payment_plan.apply_template_plans (competition)",
+         lambda t, c: payment_plan.apply_template_plans(t, 8, [100.0], competition_id=c),
+         lambda i: (payment_plan.save_template(f"Bench Bulk {i}", plan_items), pick(comp_ids))),
+        ("payment_plan.save_plans (50 plans)", payment_plan.save_plans,
+         lambda i: ([{"student_id": pick(student_ids), "items": plan_items, "down_payments": [100.0],
+                      "months": 6} for _ in range(50)],)),
+    ]
+
+
+def _second_option(options):
+    return options[1] if len(options) > 1 else options[0]
+
+
+PAGE_CASES = [
+    ("page:students", "app.py", {"Navigate": "📋 Students", "edit_sel": _second_option,
+                                  "view_sel": _second_option}),
+    ("page:dances", "app.py", {"Navigate": "🕺 Dances", "dance_edit_sel": _second_option}),
+    ("page:competitions", "app.py", {"Navigate": "🏆 Competitions", "edit_comp_sel": _second_option}),
+    ("page:seasons", "app.py", {"Navigate": "🗓 Seasons"}),
+    ("page:backups", "app.py", {"Navigate": "💾 Backups"}),
+    ("page:payment_plans", os.path.join("pages", "Payment_Plans.py"),
+     {"select_student": _second_option, "edit_item": _second_option}),
+    ("page:payment_plans finalize", os.path.join("pages", "Payment_Plans.py"),
+     {"select_student": _second_option, "Finalize Plan": True,
+      **{f"sel_{cat}": (lambda options: options[:2]) for cat in datagen.CATALOG}}),
+]
+
+
+@functools.lru_cache(maxsize=None)
+def _compiled(script):
+    # Streamlit compiles a page once and re-executes the code object on each
+    # rerun, so compiling is kept out of the measured render too.
+    path = os.path.join(ROOT, script)
+    with open(path, encoding="utf-8") as f:
+        return compile(f.read(), path, "exec")
+
+
+def render_page(script, choices):
+    fake = FakeStreamlit(choices, secrets={
+        "credentials": {"usernames": {}},
+        "cookie": {"name": "bench", "key": "bench", "expiry_days": 1},
+    })
+    fake.session_state.update({"authentication_status": True, "name": "bench", "username": "bench"})
+    with installed(fake):
+        exec(_compiled(script), {"__name__": "__main__", "__file__": os.path.join(ROOT, script)})
+    return fake
+
+
+def run(scale, repeat=5, db_path=None, workdir=None):
+    """Generate a database, time everything and return the report dict."""
+    import cache
+
+    workdir = workdir or tempfile.mkdtemp(prefix="dance-bench-")
+    db_path = db_path or os.path.join(workdir, "dance.db")
+    start = time.perf_counter()
+    counts = datagen.generate(db_path, **scale)
+    generate_s = time.perf_counter() - start
+
+    timings, allocations = {}, {}
+    for name, func, setup in function_cases(workdir, scale):
+        cache.clear()
+        if name.endswith("[cached]"):
+            func(*(setup(0) if setup else ()))  # warm the entry being measured
+        timings[name] = _time(func, repeat, setup)
+        if name.startswith("db."):
+            allocations[name] = {"peak_kib": _peak_kib(func, *(setup(0) if setup else ()))}
+
+    for name, script, choices in PAGE_CASES:
+        def cold():
+            cache.clear()
+            render_page(script, choices)
+        timings[f"{name} (cold cache)"] = _time(cold, repeat)
+        timings[f"{name} (warm cache)"] = _time(lambda: render_page(script, choices), repeat)
+        # Allocation per warm rerun: what a widget change costs once data is cached.
+        allocations[f"{name} (warm cache)"] = {"peak_kib": _peak_kib(render_page, script, choices)}
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "scale": scale,
+            "generate_s": round(generate_s, 3),
+        },
+        "dataset": counts,
+        "timings": timings,
+        "allocations": allocations,
+    }
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current, threshold=1.2):
+    """Rows of (name, baseline, current, ratio, flag) for timings (median ms) and allocations (peak KiB) in both reports."""
+    rows = []
+    for section, metric, worse, better in (("timings", "median_ms", "slower", "faster"),
+                                           ("allocations", "peak_kib", "more memory", "less memory")):
+        for name, cur in current.get(section, {}).items():
+            base = baseline.get(section, {}).get(name)
+            if base is None:
+                continue
+            ratio = cur[metric] / base[metric] if base[metric] else float("inf")
+            flag = worse if ratio > threshold else (better if ratio < 1 / threshold else "")
+            label = name if section == "timings" else f"{name} [KiB]"
+            rows.append((label, base[metric], cur[metric], ratio, flag))
+    return rows
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,106 @@
+"""Time process startup and page reruns: ``python -m bench startup``.
+
+Each startup case runs in a fresh Python process (so module imports, the
+bootstrap and the first connection are all paid again) and renders one page
+once, then reruns it in the same session the way Streamlit does after a
+widget changes. The report has the same shape as ``bench run`` so the two
+can be compared with ``bench compare``.
+"""
+import json
+import os
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SECRETS = {
+    "credentials": {"usernames": {}},
+    "cookie": {"name": "bench", "key": "bench", "expiry_days": 1},
+}
+
+# (name, script, logged in, widget choices)
+CASES = [
+    ("login screen", "app.py", False, {}),
+    ("app.py", "app.py", True, {"Navigate": "📋 Students"}),
+    ("Payment_Plans.py", os.path.join("pages", "Payment_Plans.py"), True, {}),
+]
+
+
+def _child(script, logged_in, choices, reruns):
+    # Runs in the measured process: everything after interpreter start-up.
+    from bench.fake_streamlit import FakeStreamlit, installed
+
+    fake = FakeStreamlit(choices, secrets=SECRETS)
+    fake.session_state["authentication_status"] = True if logged_in else None
+    if logged_in:
+        fake.session_state.update({"name": "bench", "username": "bench"})
+    samples = []
+    for _ in range(reruns + 1):
+        start = time.perf_counter()
+        with installed(fake):
+            runpy.run_path(os.path.join(ROOT, script), run_name="__main__")
+        samples.append(time.perf_counter() - start)
+
+    import bootstrap
+
+    return {
+        "first_s": samples[0],
+        "rerun_s": samples[1:],
+        "bootstrap_s": bootstrap.timings,
+        "pandas_loaded": "pandas" in sys.modules,
+    }
+
+
+def _spawn(db_path, script, logged_in, choices, reruns):
+    env = dict(os.environ, DANCE_DB_PATH=db_path, PYTHONPATH=ROOT)
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-m", "bench.startup", json.dumps([script, logged_in, choices, reruns])],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    wall = time.perf_counter() - start
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["process_s"] = wall
+    return result
+
+
+def run(scale, repeat=5, reruns=5, db_path=None):
+    """Generate a database, time cold starts and reruns of each page, and return the report dict."""
+    from bench import datagen
+    from bench.run import _git_commit, _summary
+
+    db_path = db_path or os.path.join(tempfile.mkdtemp(prefix="dance-startup-"), "dance.db")
+    counts = datagen.generate(db_path, **scale)
+
+    timings, notes = {}, {}
+    for name, script, logged_in, choices in CASES:
+        results = [_spawn(db_path, script, logged_in, choices, reruns) for _ in range(repeat)]
+        timings[f"startup:{name} (process)"] = _summary([r["process_s"] for r in results])
+        timings[f"startup:{name} (first run)"] = _summary([r["first_s"] for r in results])
+        timings[f"startup:{name} (rerun)"] = _summary([s for r in results for s in r["rerun_s"]])
+        for step in results[0]["bootstrap_s"]:
+            timings[f"startup:{name} bootstrap {step}"] = _summary([r["bootstrap_s"][step] for r in results])
+        notes[name] = {"pandas_loaded": results[0]["pandas_loaded"]}
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "repeat": repeat,
+            "reruns": reruns,
+            "scale": scale,
+        },
+        "dataset": counts,
+        "pages": notes,
+        "timings": timings,
+    }
+
+
+if __name__ == "__main__":
+    script, logged_in, choices, reruns = json.loads(sys.argv[1])
+    print(json.dumps(_child(script, logged_in, choices, reruns)))
@@ -0,0 +1,70 @@
+import copy
+import threading
+import time
+
+import backup
+import db
+import migrations
+
+# --- PROCESS BOOTSTRAP ---
+# Streamlit re-executes a page script on every rerun but keeps imported
+# modules, so work that only has to happen once per process lives here:
+# reading the auth config out of st.secrets, bringing the schema up to
+# date, opening the first pooled connection, picking up background jobs
+# left behind by a previous process and starting the backup timer.
+# Page scripts call init() (through authenticator()) before anything else;
+# later calls return at once. This module imports neither pandas nor the
+# data modules, so the login screen renders without loading them; pages
+# import those after login.
+_lock = threading.Lock()
+_config = None
+timings = {}  # seconds per bootstrap step, for the startup benchmark
+
+
+def _timed(step, func):
+    start = time.perf_counter()
+    result = func()
+    timings[step] = time.perf_counter() - start
+    return result
+
+
+def init(secrets):
+    """Run the once-per-process setup; returns the auth config read from ``secrets``."""
+    global _config
+    if _config is not None:
+        return _config
+    with _lock:
+        if _config is None:
+            config = _timed("secrets", lambda: {
+                "credentials": secrets["credentials"].to_dict(),
+                "cookie": dict(secrets["cookie"]),
+            })
+            _timed("migrate", migrations.migrate)
+            _timed("connect", lambda: db.query("SELECT 1"))
+            import jobs  # here, after migrate(), so importing it finds the schema current
+            _timed("recover jobs", jobs.recover)
+            backup.start_schedule()  # no-op unless DANCE_BACKUP_HOURS is set
+            _config = config
+    return _config
+
+
+def authenticator(st):
+    """This session's ``stauth.Authenticate``, built on its first run and reused on reruns.
+
+    Each session gets its own copy of the credentials, since the
+    authenticator hashes and annotates them in place.
+    """
+    auth = st.session_state.get("_authenticator")
+    if auth is None:
+        import streamlit_authenticator as stauth
+
+        config = init(st.secrets)
+        cookie = config["cookie"]
+        auth = stauth.Authenticate(
+            copy.deepcopy(config["credentials"]),
+            cookie["name"],
+            cookie["key"],
+            cookie["expiry_days"],
+        )
+        st.session_state["_authenticator"] = auth
+    return auth
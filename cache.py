@@ -0,0 +1,97 @@
+import functools
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+import db
+
+# --- QUERY CACHE ---
+# Read functions are cached under the generation counters of the tables they
+# read. Write functions bump those counters once their transaction commits,
+# so a cached result is served until something it depends on actually
+# changes. Counters are per process, which matches how Streamlit serves every
+# session from one server process.
+MAX_ENTRIES = 512
+
+_lock = threading.Lock()
+_generations = {}
+_entries = OrderedDict()
+stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def generation(table):
+    return _generations.get(table, 0)
+
+
+def bump(*tables):
+    with _lock:
+        for table in tables:
+            _generations[table] = _generations.get(table, 0) + 1
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def _copy(value):
+    # Callers are free to filter or add columns to what they get back.
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, (list, dict)):
+        return value.copy()
+    return value
+
+
+def cached(*tables):
+    """Cache a read function until one of ``tables`` is written."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Read the generations before querying: a write that lands while
+            # the query runs bumps past this key, so it is never served stale.
+            key = (func.__module__, func.__qualname__, _freeze(args), _freeze(kwargs),
+                   tuple(generation(t) for t in tables))
+            with _lock:
+                if key in _entries:
+                    _entries.move_to_end(key)
+                    stats["hits"] += 1
+                    return _copy(_entries[key])
+                stats["misses"] += 1
+            result = func(*args, **kwargs)
+            with _lock:
+                _entries[key] = result
+                _entries.move_to_end(key)
+                while len(_entries) > MAX_ENTRIES:
+                    _entries.popitem(last=False)
+                    stats["evictions"] += 1
+            return _copy(result)
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+def invalidates(*tables):
+    """Bump ``tables`` after a write function's transaction commits.
+
+    Also when it raises: a function that commits in chunks (an import, an
+    archive) may have committed some before failing or being cancelled.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                db.on_commit(lambda: bump(*tables))
+        return wrapper
+    return decorator
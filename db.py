@@ -0,0 +1,373 @@
+import collections
+import functools
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import instrument
+
+# --- DATABASE LOCATION ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+DB_PATH = os.environ.get("DANCE_DB_PATH", os.path.join(DATA_DIR, "dance.db"))
+
+# --- CONNECTION SETTINGS ---
+POOL_SIZE = 8
+BUSY_TIMEOUT_MS = 5000
+PRAGMAS = [
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),      # negative = KiB, so ~16 MB page cache per connection
+    ("mmap_size", 128 * 1024 * 1024),
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", BUSY_TIMEOUT_MS),
+]
+
+
+def _connect(path):
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # isolation_level=None puts the driver in autocommit mode so that
+    # transactions are opened explicitly by transaction() below.
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,
+        check_same_thread=False,
+    )
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
+    instrument.attach(conn)
+    return conn
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections.
+
+    A thread checks out one connection for the duration of its outermost
+    ``connection()`` block; nested blocks on the same thread reuse it, so a
+    transaction and the reads inside it always share a connection. At most
+    ``size`` connections exist at once; further threads wait for one to be
+    returned.
+    """
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all = []
+
+    def _checkout(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            conn = _connect(self.path)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def _checkin(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self._checkout()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._checkin(conn)
+
+    def close(self):
+        with self._lock:
+            conns, self._all = self._all, []
+        for conn in conns:
+            conn.close()
+        self._idle = queue.LifoQueue()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+
+def configure(path=None, size=None):
+    """Point the shared pool at another database file (used by tools and scripts)."""
+    global _pool, DB_PATH
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        if path is not None:
+            DB_PATH = path
+        _pool = ConnectionPool(DB_PATH, size or POOL_SIZE)
+    return _pool
+
+
+# --- CONNECTION / TRANSACTION HELPERS ---
+@contextmanager
+def connection():
+    with get_pool().connection() as conn:
+        yield conn
+
+
+def connect():
+    """A new autocommit connection to the configured database, outside the pool; the caller closes it."""
+    return _connect(DB_PATH)
+
+
+_local = threading.local()
+
+
+@contextmanager
+def transaction():
+    """Run the block as one write transaction, committing on success.
+
+    ``BEGIN IMMEDIATE`` takes the write lock up front so two sessions cannot
+    both read and then fail to upgrade; waiting writers back off through the
+    busy timeout instead of raising "database is locked". Nested calls join
+    the outer transaction.
+    """
+    with connection() as conn:
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        _local.on_commit = []
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            callbacks, _local.on_commit = _local.on_commit, None
+        for callback in callbacks:
+            callback()
+
+
+def on_commit(callback):
+    """Call ``callback`` once the current thread's transaction commits (now if none is open)."""
+    pending = getattr(_local, "on_commit", None)
+    if pending is None:
+        callback()
+    else:
+        pending.append(callback)
+
+
+def in_transaction():
+    return getattr(_local, "on_commit", None) is not None
+
+
+# --- GROUP COMMIT ---
+# Small interactive writes from every session go through one writer thread
+# per process. Each batch is every write that queued up while the previous
+# batch was committing (at most GROUP_COMMIT_MAX), optionally waiting up to
+# GROUP_COMMIT_WINDOW_MS for more. Each write runs in its own SAVEPOINT and
+# the batch commits as one transaction, so concurrent sessions share one
+# write lock and one WAL sync instead of queueing on the busy timeout. A
+# fixed window adds its full length to every lone write, so it is off by
+# default. A write that raises is rolled back to its savepoint alone and its
+# caller gets the exception; the others still commit. Set
+# DANCE_GROUP_COMMIT=0 to run writes on the calling thread instead.
+GROUP_COMMIT = os.environ.get("DANCE_GROUP_COMMIT", "1") != "0"
+GROUP_COMMIT_WINDOW_MS = float(os.environ.get("DANCE_GROUP_COMMIT_MS", "0"))
+GROUP_COMMIT_MAX = 64
+
+
+class GroupWriter:
+    """One daemon thread that commits queued write calls in batches."""
+
+    def __init__(self, window_ms=GROUP_COMMIT_WINDOW_MS, max_batch=GROUP_COMMIT_MAX):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.batches = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._loop, name="dance-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue ``func(*args, **kwargs)``; returns a Future for its result."""
+        future = Future()
+        self._queue.put((future, func, args, kwargs))
+        return future
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.perf_counter())))
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch):
+        outcomes = []
+        try:
+            with transaction() as conn:
+                for _future, func, args, kwargs in batch:
+                    conn.execute("SAVEPOINT group_write")
+                    try:
+                        outcomes.append((func(*args, **kwargs), None))
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO group_write")
+                        outcomes.append((None, e))
+                    conn.execute("RELEASE group_write")
+        except Exception as e:
+            # The commit itself failed, so nothing in the batch was written.
+            for future, *_ in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        for (future, *_), (result, error) in zip(batch, outcomes):
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+_writer = None
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _pool_lock:
+            if _writer is None:
+                _writer = GroupWriter()
+    return _writer
+
+
+def group_commit(func):
+    """Run a small write function on the group-commit writer and wait for its result.
+
+    Calls made inside an open transaction (including from the writer thread
+    itself) run inline so they join that transaction.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not GROUP_COMMIT or in_transaction():
+            return func(*args, **kwargs)
+        return get_writer().submit(func, *args, **kwargs).result()
+    return wrapper
+
+
+def execute(sql, params=()):
+    with transaction() as conn:
+        return conn.execute(sql, params).lastrowid
+
+
+def executemany(sql, rows):
+    with transaction() as conn:
+        return conn.executemany(sql, rows).rowcount
+
+
+def fill_temp_ids(conn, table, ids):
+    """Load ``ids`` into a one-column temp table for ``IN (SELECT id FROM table)`` joins.
+
+    Unlike an ``IN (?, ?, ...)`` list this has no parameter limit, so a
+    statement can be scoped to any number of rows.
+    """
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY)")
+    conn.execute(f"DELETE FROM {table}")
+    conn.executemany(f"INSERT OR IGNORE INTO {table} (id) VALUES (?)", [(int(i),) for i in ids])
+
+
+def fill_temp_names(conn, table, names):
+    """Load ``names`` into a one-column temp table (``name``, case-insensitive) for joins on text keys."""
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {table} (name TEXT PRIMARY KEY COLLATE NOCASE)")
+    conn.execute(f"DELETE FROM {table}")
+    conn.executemany(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", [(n,) for n in names])
+
+
+def query(sql, params=()):
+    with connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    instrument.add_rows(len(rows))
+    return rows
+
+
+def read_sql(sql, params=()):
+    # Imported here so that bootstrap (and the login screen) can use the
+    # pool without loading pandas.
+    import pandas as pd
+
+    with connection() as conn:
+        df = pd.read_sql(sql, conn, params=params)
+    instrument.add_rows(len(df))
+    return df
+
+
+# --- ROW QUERIES ---
+# Widget options and small lookups only iterate rows or pull a column, and
+# for a handful of rows building a DataFrame costs far more than the query.
+# rows() returns named tuples (``__slots__ = ()``, so no per-row dict) made
+# straight from the cursor, and columns() one list per column. Callers that
+# render a table wrap them in pd.DataFrame(), which reads the field names.
+_row_types = {}
+_row_types_lock = threading.Lock()
+
+
+def row_type(fields):
+    """The named tuple class for a result with columns ``fields``, made once per column list."""
+    maker = _row_types.get(fields)
+    if maker is None:
+        with _row_types_lock:
+            maker = _row_types.get(fields)
+            if maker is None:
+                cls = collections.namedtuple("Row", fields, rename=True)
+                # tuple.__new__ builds each row in C, unlike Row._make.
+                maker = _row_types[fields] = functools.partial(tuple.__new__, cls)
+    return maker
+
+
+def rows(sql, params=()):
+    """Result rows as named tuples, e.g. ``[Row(id=1, name='Solo Fee', price=120.0)]``."""
+    with connection() as conn:
+        cur = conn.execute(sql, params)
+        make = row_type(tuple(d[0] for d in cur.description))
+        result = list(map(make, cur.fetchall()))
+    instrument.add_rows(len(result))
+    return result
+
+
+def columns(sql, params=()):
+    """Result columns as ``{name: [values]}``, in select order."""
+    with connection() as conn:
+        cur = conn.execute(sql, params)
+        names = [d[0] for d in cur.description]
+        data = cur.fetchall()
+    instrument.add_rows(len(data))
+    values = list(zip(*data)) if data else [()] * len(names)
+    return {name: list(col) for name, col in zip(names, values)}
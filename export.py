@@ -0,0 +1,134 @@
+import csv
+import os
+import uuid
+from datetime import datetime
+
+import db
+import instrument
+
+# --- STREAMING EXPORTS ---
+# Full-table exports for accounting handoff. Rows are streamed from SQLite
+# with fetchmany() through a generator and written a chunk at a time, as CSV
+# rows or as one Parquet row group per chunk, so memory stays bounded by
+# EXPORT_CHUNK_ROWS however large the database gets. Each export is a query
+# plus its column types; the types fix the Parquet schema up front instead
+# of guessing it from the first chunk.
+EXPORT_CHUNK_ROWS = 5000
+FORMATS = ("csv", "parquet")
+
+EXPORTS = {
+    "plans": (
+        "SELECT p.id AS plan_id, p.student_id, s.last_name, s.first_name, p.template_id, p.created_at,"
+        " p.months, i.id AS item_id, i.name AS item, i.item_type, i.price"
+        " FROM student_plans p"
+        " JOIN plan_items i ON i.plan_id = p.id"
+        " LEFT JOIN students s ON s.id = p.student_id"
+        " ORDER BY p.id, i.id",
+        [("plan_id", "int64"), ("student_id", "int64"), ("last_name", "string"), ("first_name", "string"),
+         ("template_id", "int64"), ("created_at", "string"), ("months", "int64"), ("item_id", "int64"),
+         ("item", "string"), ("item_type", "string"), ("price", "double")],
+    ),
+    "rosters": (
+        "SELECT s.id AS student_id, s.last_name, s.first_name, s.dob, 'dance' AS kind, d.id AS group_id,"
+        " d.name AS group_name, d.type AS detail"
+        " FROM dance_students m JOIN students s ON s.id = m.student_id JOIN dances d ON d.id = m.dance_id"
+        " UNION ALL "
+        "SELECT s.id, s.last_name, s.first_name, s.dob, 'competition', c.id, c.name,"
+        " CASE c.has_convention WHEN 1 THEN 'with convention' ELSE '' END"
+        " FROM competition_students m JOIN students s ON s.id = m.student_id"
+        " JOIN competitions c ON c.id = m.competition_id"
+        " ORDER BY 2, 3, 1, 5, 7",
+        [("student_id", "int64"), ("last_name", "string"), ("first_name", "string"), ("dob", "string"),
+         ("kind", "string"), ("group_id", "int64"), ("group_name", "string"), ("detail", "string")],
+    ),
+    "catalog": (
+        "SELECT id, category, name, price FROM catalog_items ORDER BY category, name",
+        [("id", "int64"), ("category", "string"), ("name", "string"), ("price", "double")],
+    ),
+}
+
+
+def stream_rows(sql, params=(), chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield lists of up to ``chunk_rows`` result rows, holding one pooled connection while iterating."""
+    with db.connection() as conn:
+        cur = conn.execute(sql, params)
+        try:
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    return
+                instrument.add_rows(len(rows))
+                yield rows
+        finally:
+            cur.close()
+
+
+def count_rows(name):
+    sql, _columns = EXPORTS[name]
+    return db.query(f"SELECT COUNT(*) FROM ({sql})")[0][0]
+
+
+def write_csv(name, out, progress=None):
+    """Write export ``name`` as CSV to a path or text file object; returns the row count."""
+    sql, columns = EXPORTS[name]
+    if isinstance(out, str):
+        with open(out, "w", newline="", encoding="utf-8") as f:
+            return write_csv(name, f, progress)
+    writer = csv.writer(out)
+    writer.writerow([col for col, _ in columns])
+    written = 0
+    for rows in stream_rows(sql):
+        writer.writerows(rows)
+        written += len(rows)
+        if progress is not None:
+            progress(written)
+    return written
+
+
+def write_parquet(name, out, progress=None):
+    """Write export ``name`` as Parquet, one row group per chunk; returns the row count.
+
+    Needs pyarrow, which Streamlit already depends on.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sql, columns = EXPORTS[name]
+    schema = pa.schema([(col, pa.type_for_alias(kind)) for col, kind in columns])
+    written = 0
+    with pq.ParquetWriter(out, schema) as writer:
+        for rows in stream_rows(sql):
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            written += len(rows)
+            if progress is not None:
+                progress(written)
+    return written
+
+
+def export_path(name, fmt):
+    """A fresh file name for an export, in an exports folder beside the database."""
+    folder = os.path.join(os.path.dirname(os.path.abspath(db.DB_PATH)), "exports")
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f"{name}-{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}.{fmt}")
+
+
+def export(name, fmt="csv", path=None, progress=None):
+    """Write export ``name`` in ``fmt`` ("csv" or "parquet"); returns ``(path, rows)``."""
+    if name not in EXPORTS:
+        raise ValueError(f"Unknown export {name!r}; expected one of {', '.join(EXPORTS)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected csv or parquet")
+    path = path or export_path(name, fmt)
+    write = write_csv if fmt == "csv" else write_parquet
+    try:
+        return path, write(name, path, progress)
+    except BaseException:
+        # Never leave a truncated file that looks like a finished export.
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+
+# --- INSTRUMENTATION (no-op unless DANCE_INSTRUMENT is set) ---
+instrument.instrument_module(globals())
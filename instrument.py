@@ -0,0 +1,198 @@
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from datetime import datetime
+
+# --- OPT-IN QUERY INSTRUMENTATION ---
+# Set DANCE_INSTRUMENT=1 before starting Streamlit to record, for every page
+# rerun, each SQL statement (via sqlite3's trace and progress callbacks), the
+# rows fetched through db.py, and wall-clock time per data function. Each
+# rerun is shown in a sidebar panel and appended as one JSON line to a
+# rotating log under data/. With the variable unset nothing is hooked.
+ENABLED = os.environ.get("DANCE_INSTRUMENT", "").lower() in ("1", "true", "yes")
+LOG_PATH = os.environ.get(
+    "DANCE_INSTRUMENT_LOG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "instrument.log"),
+)
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+PROGRESS_STEPS = 1000  # VM instructions between progress callbacks
+
+_local = threading.local()
+_logger = None
+_logger_lock = threading.Lock()
+
+
+class Run:
+    """What one page rerun did: statements, rows and data-function timings."""
+
+    def __init__(self, page):
+        self.page = page
+        self.started = time.perf_counter()
+        self.finished = None
+        self.statements = []  # [sql, start, end, vm_steps, rows]
+        self.functions = {}   # name -> [calls, seconds]
+        self._open = None
+
+    def statement(self, sql):
+        now = time.perf_counter()
+        self.close_statement(now)
+        self._open = [sql, now, None, 0, 0]
+        self.statements.append(self._open)
+
+    def close_statement(self, now=None):
+        if self._open is not None:
+            self._open[2] = now or time.perf_counter()
+            self._open = None
+
+    def add_rows(self, n):
+        if self.statements:
+            self.statements[-1][4] += n
+        self.close_statement()
+
+    def summary(self):
+        end = self.finished or time.perf_counter()
+        stmts = [
+            {"sql": " ".join(sql.split()), "ms": round(((stop or end) - start) * 1000, 3),
+             "vm_steps": steps, "rows": rows}
+            for sql, start, stop, steps, rows in self.statements
+        ]
+        return {
+            "ts": datetime.now().isoformat(timespec="seconds"),
+            "page": self.page,
+            "total_ms": round((end - self.started) * 1000, 3),
+            "queries": len(stmts),
+            "rows": sum(s["rows"] for s in stmts),
+            "sql_ms": round(sum(s["ms"] for s in stmts), 3),
+            "statements": stmts,
+            "functions": {name: {"calls": calls, "ms": round(secs * 1000, 3)}
+                          for name, (calls, secs) in self.functions.items()},
+        }
+
+
+def current():
+    return getattr(_local, "run", None)
+
+
+def start_run(page):
+    """Begin recording the current rerun; returns None when instrumentation is off."""
+    if not ENABLED:
+        return None
+    _local.run = Run(page)
+    return _local.run
+
+
+def end_run():
+    """Stop recording, log the rerun and return its summary dict."""
+    run = current()
+    if run is None:
+        return None
+    run.close_statement()
+    run.finished = time.perf_counter()
+    _local.run = None
+    summary = run.summary()
+    _get_logger().info(json.dumps(summary))
+    return summary
+
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
+                logger = logging.getLogger("dance.instrument")
+                logger.propagate = False
+                logger.setLevel(logging.INFO)
+                handler = logging.handlers.RotatingFileHandler(
+                    LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+                _logger = logger
+    return _logger
+
+
+# --- HOOKS ---
+def _on_statement(sql):
+    run = current()
+    if run is not None:
+        run.statement(sql)
+
+
+def _on_progress():
+    run = current()
+    if run is not None and run._open is not None:
+        run._open[3] += PROGRESS_STEPS
+    return 0
+
+
+def attach(conn):
+    """Install the statement hooks on a new connection (called by db.py)."""
+    if ENABLED:
+        conn.set_trace_callback(_on_statement)
+        conn.set_progress_handler(_on_progress, PROGRESS_STEPS)
+
+
+def add_rows(n):
+    run = current()
+    if run is not None:
+        run.add_rows(n)
+
+
+def timed(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        run = current()
+        if run is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            run.close_statement()
+            entry = run.functions.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += time.perf_counter() - start
+    return wrapper
+
+
+def instrument_module(namespace):
+    """Wrap the public functions defined in a module with wall-clock timers.
+
+    Call as ``instrument_module(globals())`` at the end of a data module.
+    """
+    if not ENABLED:
+        return
+    module = namespace["__name__"]
+    for name, value in list(namespace.items()):
+        if (callable(value) and not name.startswith("_") and not isinstance(value, type)
+                and getattr(value, "__module__", None) == module):
+            namespace[name] = timed(f"{module}.{name}", value)
+
+
+# --- SIDEBAR PANEL ---
+def sidebar_panel(st, summary):
+    """Render a rerun summary from end_run() in the sidebar."""
+    if summary is None:
+        return
+    import pandas as pd
+
+    with st.sidebar.expander("⏱ Query timings", expanded=False):
+        st.write(
+            f"**{summary['queries']}** queries, **{summary['rows']}** rows, "
+            f"**{summary['sql_ms']:.1f} ms** in SQL of **{summary['total_ms']:.1f} ms** total"
+        )
+        if summary["functions"]:
+            funcs = pd.DataFrame(
+                [{"function": name, **vals} for name, vals in summary["functions"].items()]
+            ).sort_values("ms", ascending=False)
+            st.dataframe(funcs, hide_index=True)
+        if summary["statements"]:
+            stmts = pd.DataFrame(summary["statements"]).sort_values("ms", ascending=False)
+            st.dataframe(stmts.head(25), hide_index=True)
+        st.caption(f"Logged to {LOG_PATH}")
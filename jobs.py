@@ -0,0 +1,316 @@
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import db
+import instrument
+import migrations
+
+# --- BACKGROUND JOBS ---
+# Long-running work (CSV imports, bulk plan creation, exports) is submitted
+# as a row in the jobs table and run by a small worker thread pool started
+# once per process, so a Streamlit script run only submits and polls. A job
+# is a registered handler plus JSON params; the handler reports progress
+# through the Job it is given, which is also where cancellation surfaces
+# (as JobCancelled, between units of work). The handler's return value is
+# stored as JSON in jobs.result.
+migrations.migrate()
+
+WORKERS = int(os.environ.get("DANCE_JOB_WORKERS", "2"))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+# Identifies this process's claims on jobs. While the pool is up it refreshes
+# heartbeat_at on its running jobs every HEARTBEAT_S; a running job whose
+# heartbeat is older than STALE_S belongs to a process that has died, and
+# recover() marks it failed. Other live processes' jobs are left alone.
+OWNER = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+HEARTBEAT_S = 10
+STALE_S = int(os.environ.get("DANCE_JOB_STALE_S", "60"))
+
+HANDLERS = {}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """What a handler sees of its job: the id, progress reporting and cancellation."""
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self._conn = None
+
+    def progress(self, done, total=None, message=None):
+        """Record progress (``done`` of ``total`` units, or a 0-1 fraction) and check for cancel.
+
+        Raises JobCancelled once cancel() has been called for this job, so
+        call it between units of work. The update goes through the job's own
+        connection, not the thread's pooled one, so it is safe to call while
+        the handler is reading: it neither joins a backup's pinned read
+        transaction nor waits for a write lock behind an export's open cursor.
+        """
+        fraction = min(1.0, done / total) if total else float(done)
+        if self._conn is None:
+            self._conn = db.connect()
+        self._conn.execute(
+            "UPDATE jobs SET progress = ?, message = COALESCE(?, message), heartbeat_at = ? WHERE id = ?",
+            (fraction, message, _now(), self.id),
+        )
+        cancel = self._conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (self.id,)).fetchone()[0]
+        if cancel:
+            raise JobCancelled()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def handler(kind):
+    """Register ``func(job, **params)`` as the handler for jobs of ``kind``."""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+# --- WORKER POOL ---
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="dance-job")
+                threading.Thread(target=_heartbeat_loop, name="dance-job-heartbeat", daemon=True).start()
+    return _executor
+
+
+def _fail_stale(conn):
+    cutoff = (datetime.now() - timedelta(seconds=STALE_S)).isoformat(timespec="seconds")
+    conn.execute(
+        "UPDATE jobs SET status = ?, error = 'interrupted by a restart', finished_at = ?"
+        " WHERE status = ? AND COALESCE(heartbeat_at, started_at) < ?", (FAILED, _now(), RUNNING, cutoff)
+    )
+
+
+def _heartbeat_loop():
+    while True:
+        time.sleep(HEARTBEAT_S)
+        try:
+            with db.transaction() as conn:
+                conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE status = ? AND owner = ?",
+                             (_now(), RUNNING, OWNER))
+                _fail_stale(conn)
+        except Exception:
+            traceback.print_exc()
+
+
+def recover():
+    """Mark jobs whose process died failed and run the ones still queued; called once at startup.
+
+    Queued jobs never started, so they can simply be run here (a job is
+    claimed atomically, so one queued by a live process still runs once).
+    """
+    with db.transaction() as conn:
+        _fail_stale(conn)
+        queued = [r[0] for r in conn.execute("SELECT id FROM jobs WHERE status = ? ORDER BY id", (QUEUED,))]
+    if queued:
+        executor = _get_executor()
+        for job_id in queued:
+            executor.submit(_run, job_id)
+
+
+def _finish(job_id, status, result=None, error=None, message=None):
+    with db.transaction() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, message = COALESCE(?, message),"
+            " progress = CASE WHEN ? = 'done' THEN 1 ELSE progress END, finished_at = ? WHERE id = ?",
+            (status, None if result is None else json.dumps(result, default=str), error, message,
+             status, _now(), job_id),
+        )
+
+
+def _run(job_id):
+    with db.transaction() as conn:
+        # Claim the job; a cancel or another process may have got there first.
+        claimed = conn.execute(
+            "UPDATE jobs SET status = ?, owner = ?, started_at = ?, heartbeat_at = ? WHERE id = ? AND status = ?",
+            (RUNNING, OWNER, _now(), _now(), job_id, QUEUED),
+        ).rowcount
+        row = conn.execute("SELECT kind, params FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if not claimed:
+        return
+    kind, params = row
+    job = Job(job_id)
+    try:
+        func = HANDLERS[kind]
+        result = func(job, **json.loads(params))
+    except JobCancelled:
+        _finish(job_id, CANCELLED, message="Cancelled")
+    except Exception as e:
+        traceback.print_exc()
+        _finish(job_id, FAILED, error=f"{type(e).__name__}: {e}")
+    else:
+        _finish(job_id, DONE, result=result)
+    finally:
+        job.close()
+
+
+# --- SUBMIT / POLL / CANCEL ---
+def submit(kind, created_by=None, **params):
+    """Queue a job of a registered ``kind``; returns the job id immediately."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind {kind!r}")
+    job_id = db.execute(
+        "INSERT INTO jobs (kind, params, status, created_by, created_at) VALUES (?, ?, ?, ?, ?)",
+        (kind, json.dumps(params), QUEUED, created_by, _now()),
+    )
+    _get_executor().submit(_run, job_id)
+    return job_id
+
+
+def cancel(job_id):
+    """Ask a job to stop. A queued job is cancelled at once; a running one at its next progress()."""
+    with db.transaction() as conn:
+        conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+        conn.execute("UPDATE jobs SET status = ?, message = 'Cancelled', finished_at = ? WHERE id = ? AND status = ?",
+                     (CANCELLED, _now(), job_id, QUEUED))
+
+
+_JOB_COLUMNS = ("id", "kind", "status", "progress", "message", "error", "created_by", "created_at",
+                "started_at", "finished_at")
+
+
+def get_job(job_id):
+    """The job's status row as a dict (``result`` decoded from JSON), or None."""
+    rows = db.query(f"SELECT {', '.join(_JOB_COLUMNS)}, result FROM jobs WHERE id = ?", (job_id,))
+    if not rows:
+        return None
+    job = dict(zip(_JOB_COLUMNS + ("result",), rows[0]))
+    job["result"] = None if job["result"] is None else json.loads(job["result"])
+    return job
+
+
+def list_jobs(limit=20, kind=None):
+    """The most recent jobs, newest first, without their results."""
+    sql = f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs"
+    params = ()
+    if kind is not None:
+        sql += " WHERE kind = ?"
+        params = (kind,)
+    return db.read_sql(sql + " ORDER BY id DESC LIMIT ?", params + (limit,))
+
+
+def save_upload(uploaded_file, suffix=".csv"):
+    """Copy an uploaded file to disk so a job can read it after the script run ends; returns the path."""
+    # Kept beside the database, and removed by the job once it has read it.
+    upload_dir = os.path.join(os.path.dirname(os.path.abspath(db.DB_PATH)), "uploads")
+    os.makedirs(upload_dir, exist_ok=True)
+    path = os.path.join(upload_dir, f"{uuid.uuid4().hex}{suffix}")
+    uploaded_file.seek(0)
+    with open(path, "wb") as f:
+        f.write(uploaded_file.read())
+    return path
+
+
+def records(df):
+    """A DataFrame as JSON-ready row dicts, for job results."""
+    return json.loads(df.to_json(orient="records", date_format="iso"))
+
+
+# --- JOB HANDLERS ---
+def _count_lines(path):
+    with open(path, "rb") as f:
+        return max(0, sum(1 for _ in f) - 1)
+
+
+@handler("import_students")
+def _import_students(job, path, on_duplicate="skip"):
+    import studio
+
+    total = _count_lines(path)
+    try:
+        report = studio.import_students(
+            path, on_duplicate=on_duplicate,
+            progress=lambda done: job.progress(done, total, f"{done} of {total} rows"),
+        )
+    finally:
+        os.remove(path)
+    return {"counts": report["status"].value_counts().to_dict(), "report": records(report)}
+
+
+@handler("import_dances")
+def _import_dances(job, path):
+    import studio
+
+    job.progress(0, message="Importing dances")
+    try:
+        report, unknown = studio.import_dances(path)
+    finally:
+        os.remove(path)
+    return {"report": records(report), "unknown": unknown}
+
+
+@handler("apply_template_plans")
+def _apply_template_plans(job, template_id, months, down_payments=(), **roster):
+    import payment_plan
+
+    job.progress(0, message="Creating plans")
+    plan_ids = payment_plan.apply_template_plans(template_id, months, down_payments, **roster)
+    return {"plan_ids": plan_ids}
+
+
+@handler("export")
+def _export(job, name, fmt="csv"):
+    import export
+
+    total = export.count_rows(name)
+    path, rows = export.export(name, fmt, progress=lambda done: job.progress(done, total, f"{done} of {total} rows"))
+    return {"path": path, "rows": rows, "bytes": os.path.getsize(path)}
+
+
+@handler("statements")
+def _statements(job, plan_ids=None):
+    import statements
+
+    job.progress(0, message="Loading plans")
+    paths, rendered = statements.render_statements(
+        plan_ids, progress=lambda done, total: job.progress(done, total, f"Rendered {done} of {total}"),
+    )
+    path = statements.bundle(paths)
+    return {"path": path, "plans": len(paths), "rendered": len(rendered), "bytes": os.path.getsize(path)}
+
+
+@handler("archive_season")
+def _archive_season(job, season_id, vacuum=False):
+    import seasons
+
+    job.progress(0, message="Archiving")
+    return {"rows": seasons.archive_season(season_id, vacuum=vacuum)}
+
+
+@handler("backup")
+def _backup(job, label=None):
+    import backup
+
+    path = backup.snapshot(label, progress=lambda done, total: job.progress(done, total, f"{done} of {total} pages"))
+    return {"path": path, "name": os.path.basename(path), "bytes": os.path.getsize(path)}
+
+
+# --- INSTRUMENTATION (no-op unless DANCE_INSTRUMENT is set) ---
+instrument.instrument_module(globals())
@@ -0,0 +1,177 @@
+from datetime import date, datetime
+
+import db
+import instrument
+from cache import cached, invalidates
+
+# --- PAYMENTS LEDGER ---
+# Payments received against student_plans, plus a plan_balances summary row
+# per plan: charged (items), down payments, payments received, the balance,
+# and the due date of the first installment the payments do not yet cover.
+# Every write that changes a plan's items, schedule or payments refreshes
+# just that plan's row, so balance and overdue lookups are index reads on
+# plan_balances instead of re-summing plan_items. The tables are created by
+# migrations.py (run on import of payment_plan/studio).
+DOWN_PAYMENT = "Down Payment"
+
+_REFRESH_SQL = """
+INSERT OR REPLACE INTO plan_balances
+    (plan_id, student_id, charged_cents, down_cents, paid_cents, balance_cents, next_due_date)
+SELECT id, student_id, charged, down, paid, charged - down - paid, NULL FROM (
+    SELECT p.id, p.student_id,
+        (SELECT COALESCE(SUM(CAST(ROUND(i.price * 100) AS INTEGER)), 0) FROM plan_items i
+          WHERE i.plan_id = p.id AND i.item_type <> :down) AS charged,
+        (SELECT COALESCE(SUM(CAST(ROUND(i.price * 100) AS INTEGER)), 0) FROM plan_items i
+          WHERE i.plan_id = p.id AND i.item_type = :down) AS down,
+        (SELECT COALESCE(SUM(pm.amount_cents), 0) FROM payments pm
+          WHERE pm.plan_id = p.id) AS paid
+    FROM student_plans p {scope}
+)
+"""
+
+# First installment whose running total is more than what has been paid.
+_NEXT_DUE_SQL = """
+UPDATE plan_balances SET next_due_date = (
+    SELECT due_date FROM (
+        SELECT due_date, installment,
+               SUM(amount_cents) OVER (ORDER BY installment) AS running
+        FROM plan_schedule s WHERE s.plan_id = plan_balances.plan_id
+    ) WHERE running > plan_balances.paid_cents
+    ORDER BY installment LIMIT 1
+) {scope}
+"""
+
+
+def refresh_balances(conn, plan_ids=None):
+    """Rebuild plan_balances rows for ``plan_ids`` (every plan when None) on ``conn``."""
+    if plan_ids is None:
+        conn.execute("DELETE FROM plan_balances WHERE plan_id NOT IN (SELECT id FROM student_plans)")
+        conn.execute(_REFRESH_SQL.format(scope=""), {"down": DOWN_PAYMENT})
+        conn.execute(_NEXT_DUE_SQL.format(scope=""))
+        return
+    db.fill_temp_ids(conn, "balance_scope", plan_ids)
+    conn.execute(_REFRESH_SQL.format(scope="JOIN balance_scope sc ON sc.id = p.id"), {"down": DOWN_PAYMENT})
+    conn.execute(_NEXT_DUE_SQL.format(scope="WHERE plan_id IN (SELECT id FROM balance_scope)"))
+
+
+def to_cents(amount):
+    return int(round(float(amount) * 100))
+
+
+def _iso_date(value):
+    value = value or date.today()
+    return value if isinstance(value, str) else value.isoformat()
+
+
+_INSERT_PAYMENT = (
+    "INSERT INTO payments (plan_id, student_id, paid_on, amount_cents, method, note, recorded_at)"
+    " SELECT ?, student_id, ?, ?, ?, ?, ? FROM student_plans WHERE id = ?"
+)
+
+
+@invalidates("payments", "plan_balances")
+@db.group_commit
+def record_payment(plan_id, amount, paid_on=None, method=None, note=None):
+    """Record a payment (in dollars) against a plan; returns the payment id."""
+    return record_payments([(plan_id, amount, paid_on, method, note)])[0]
+
+
+@invalidates("payments", "plan_balances")
+def record_payments(payments):
+    """Record many ``(plan_id, amount, paid_on, method, note)`` payments in one transaction.
+
+    Returns the new payment ids in order. Raises ValueError for an unknown plan.
+    """
+    now = datetime.now().isoformat()
+    ids, plan_ids = [], set()
+    with db.transaction() as conn:
+        for plan_id, amount, paid_on, method, note in payments:
+            cur = conn.execute(_INSERT_PAYMENT, (plan_id, _iso_date(paid_on), to_cents(amount),
+                                                 method, note, now, plan_id))
+            if cur.rowcount != 1:
+                raise ValueError(f"No payment plan with id {plan_id}")
+            ids.append(cur.lastrowid)
+            plan_ids.add(plan_id)
+        refresh_balances(conn, plan_ids)
+    return ids
+
+
+@invalidates("payments", "plan_balances")
+@db.group_commit
+def delete_payment(payment_id):
+    with db.transaction() as conn:
+        row = conn.execute("SELECT plan_id FROM payments WHERE id = ?", (payment_id,)).fetchone()
+        if row is None:
+            return
+        conn.execute("DELETE FROM payments WHERE id = ?", (payment_id,))
+        refresh_balances(conn, [row[0]])
+
+
+@invalidates("plan_balances")
+def rebuild_balances():
+    """Recompute every plan's summary row from scratch (repair tool)."""
+    with db.transaction() as conn:
+        refresh_balances(conn)
+
+
+# --- LOOKUPS ---
+_BALANCE_COLUMNS = (
+    "b.plan_id, b.student_id, p.created_at, p.months, b.charged_cents, b.down_cents,"
+    " b.paid_cents, b.balance_cents, b.next_due_date"
+)
+
+
+@cached("payments")
+def get_payments(plan_id):
+    return db.read_sql(
+        "SELECT id, paid_on, amount_cents, method, note FROM payments"
+        " WHERE plan_id = ? ORDER BY paid_on, id", (plan_id,)
+    )
+
+
+@cached("plan_balances")
+def get_student_balances(student_id):
+    """Every plan of a student with its balance summary (an index read on plan_balances)."""
+    return db.read_sql(
+        f"SELECT {_BALANCE_COLUMNS} FROM plan_balances b"
+        " JOIN student_plans p ON p.id = b.plan_id"
+        " WHERE b.student_id = ? ORDER BY p.created_at", (student_id,)
+    )
+
+
+@cached("plan_balances")
+def get_outstanding_cents(student_id):
+    return db.query(
+        "SELECT COALESCE(SUM(balance_cents), 0) FROM plan_balances WHERE student_id = ?", (student_id,)
+    )[0][0]
+
+
+def get_overdue(as_of=None):
+    """Plans with an installment due before ``as_of`` (default today) that is not yet paid."""
+    return _get_overdue(_iso_date(as_of))
+
+
+@cached("plan_balances", "students")
+def _get_overdue(as_of):
+    return db.read_sql(
+        f"SELECT {_BALANCE_COLUMNS}, s.last_name || ', ' || s.first_name AS student"
+        " FROM plan_balances b"
+        " JOIN student_plans p ON p.id = b.plan_id"
+        " LEFT JOIN students s ON s.id = b.student_id"
+        " WHERE b.next_due_date < ? ORDER BY b.next_due_date", (as_of,)
+    )
+
+
+@cached("plan_balances")
+def get_due_in_month(month):
+    """Plans whose next unpaid installment falls in ``month`` ("YYYY-MM")."""
+    return db.read_sql(
+        f"SELECT {_BALANCE_COLUMNS} FROM plan_balances b"
+        " JOIN student_plans p ON p.id = b.plan_id"
+        " WHERE b.next_due_date >= ? AND b.next_due_date < ? ORDER BY b.next_due_date",
+        (f"{month}-01", f"{month}-32"),
+    )
+
+
+# --- INSTRUMENTATION (no-op unless DANCE_INSTRUMENT is set) ---
+instrument.instrument_module(globals())
@@ -0,0 +1,338 @@
+import threading
+
+import db
+
+# --- SCHEMA MIGRATIONS ---
+# Each migration is (version, description, steps). A step is either an SQL
+# statement or a function taking the connection. Migrations run in order,
+# each in its own transaction, and the applied version is recorded in
+# schema_version so a database is only ever upgraded once. Append new
+# migrations to the end; never edit one that has shipped.
+
+
+def _add_plan_months(conn):
+    # The baseline student_plans table has no months column (the plan form
+    # only used the month count for display); checked first so the step is
+    # harmless on a file that already has it.
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(student_plans)")]
+    if "months" not in cols:
+        conn.execute("ALTER TABLE student_plans ADD COLUMN months INTEGER")
+
+
+def _backfill_balances(conn):
+    import ledger
+    ledger.refresh_balances(conn)
+
+
+MIGRATIONS = [
+    (1, "baseline schema", [
+        """
+    CREATE TABLE IF NOT EXISTS students (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL,
+        dob TEXT NOT NULL
+    );
+    """,
+        """
+    CREATE TABLE IF NOT EXISTS dances (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        type TEXT NOT NULL
+    );
+    """,
+        """
+    CREATE TABLE IF NOT EXISTS dance_students (
+        dance_id INTEGER,
+        student_id INTEGER,
+        PRIMARY KEY (dance_id, student_id)
+    );
+    """,
+        """
+    CREATE TABLE IF NOT EXISTS competitions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        has_convention INTEGER NOT NULL CHECK (has_convention IN (0,1))
+    );
+    """,
+        """
+    CREATE TABLE IF NOT EXISTS competition_students (
+        competition_id INTEGER,
+        student_id INTEGER,
+        PRIMARY KEY (competition_id, student_id)
+    );
+    """,
+        """
+    CREATE TABLE IF NOT EXISTS payment_templates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE
+    );
+    """,
+        """
+    CREATE TABLE IF NOT EXISTS template_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        template_id INTEGER,
+        name TEXT NOT NULL,
+        price REAL NOT NULL,
+        item_type TEXT NOT NULL,
+        FOREIGN KEY(template_id) REFERENCES payment_templates(id)
+    );
+    """,
+        """
+    CREATE TABLE IF NOT EXISTS student_plans (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER,
+        template_id INTEGER,
+        created_at TEXT NOT NULL,
+        FOREIGN KEY(student_id) REFERENCES students(id),
+        FOREIGN KEY(template_id) REFERENCES payment_templates(id)
+    );
+    """,
+        """
+    CREATE TABLE IF NOT EXISTS plan_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        plan_id INTEGER,
+        name TEXT NOT NULL,
+        price REAL NOT NULL,
+        item_type TEXT NOT NULL,
+        FOREIGN KEY(plan_id) REFERENCES student_plans(id)
+    );
+    """,
+    ]),
+    (2, "catalog_items table", [
+        """
+    CREATE TABLE IF NOT EXISTS catalog_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        category TEXT NOT NULL,
+        name TEXT NOT NULL,
+        price REAL NOT NULL
+    );
+    """,
+    ]),
+    (3, "student_plans.months", [_add_plan_months]),
+    (4, "lookup indexes", [
+        "CREATE INDEX IF NOT EXISTS idx_students_name_dob"
+        " ON students (last_name COLLATE NOCASE, first_name COLLATE NOCASE, dob)",
+        "CREATE INDEX IF NOT EXISTS idx_dance_students_student ON dance_students (student_id)",
+        "CREATE INDEX IF NOT EXISTS idx_competition_students_student ON competition_students (student_id)",
+        "CREATE INDEX IF NOT EXISTS idx_template_items_template ON template_items (template_id)",
+        "CREATE INDEX IF NOT EXISTS idx_student_plans_student ON student_plans (student_id)",
+        "CREATE INDEX IF NOT EXISTS idx_plan_items_plan ON plan_items (plan_id)",
+        "CREATE INDEX IF NOT EXISTS idx_catalog_items_category ON catalog_items (category, name)",
+    ]),
+    (5, "student name search index", [
+        # External-content FTS5 table over students, kept in sync by triggers.
+        """
+    CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+        first_name, last_name,
+        content='students', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+    );
+    """,
+        """
+    CREATE TRIGGER IF NOT EXISTS students_fts_ai AFTER INSERT ON students BEGIN
+        INSERT INTO students_fts (rowid, first_name, last_name)
+        VALUES (new.id, new.first_name, new.last_name);
+    END;
+    """,
+        """
+    CREATE TRIGGER IF NOT EXISTS students_fts_ad AFTER DELETE ON students BEGIN
+        INSERT INTO students_fts (students_fts, rowid, first_name, last_name)
+        VALUES ('delete', old.id, old.first_name, old.last_name);
+    END;
+    """,
+        """
+    CREATE TRIGGER IF NOT EXISTS students_fts_au AFTER UPDATE ON students BEGIN
+        INSERT INTO students_fts (students_fts, rowid, first_name, last_name)
+        VALUES ('delete', old.id, old.first_name, old.last_name);
+        INSERT INTO students_fts (rowid, first_name, last_name)
+        VALUES (new.id, new.first_name, new.last_name);
+    END;
+    """,
+        "INSERT INTO students_fts (students_fts) VALUES ('rebuild')",
+    ]),
+    (6, "plan_schedule table", [
+        """
+    CREATE TABLE IF NOT EXISTS plan_schedule (
+        plan_id INTEGER NOT NULL,
+        installment INTEGER NOT NULL,
+        due_date TEXT NOT NULL,
+        amount_cents INTEGER NOT NULL,
+        PRIMARY KEY (plan_id, installment),
+        FOREIGN KEY(plan_id) REFERENCES student_plans(id)
+    );
+    """,
+        "CREATE INDEX IF NOT EXISTS idx_plan_schedule_due ON plan_schedule (due_date)",
+    ]),
+    (7, "payments ledger and plan balances", [
+        """
+    CREATE TABLE IF NOT EXISTS payments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        plan_id INTEGER NOT NULL,
+        student_id INTEGER,
+        paid_on TEXT NOT NULL,
+        amount_cents INTEGER NOT NULL,
+        method TEXT,
+        note TEXT,
+        recorded_at TEXT NOT NULL,
+        FOREIGN KEY(plan_id) REFERENCES student_plans(id)
+    );
+    """,
+        "CREATE INDEX IF NOT EXISTS idx_payments_plan ON payments (plan_id)",
+        "CREATE INDEX IF NOT EXISTS idx_payments_student ON payments (student_id, paid_on)",
+        """
+    CREATE TABLE IF NOT EXISTS plan_balances (
+        plan_id INTEGER PRIMARY KEY,
+        student_id INTEGER,
+        charged_cents INTEGER NOT NULL,
+        down_cents INTEGER NOT NULL,
+        paid_cents INTEGER NOT NULL,
+        balance_cents INTEGER NOT NULL,
+        next_due_date TEXT,
+        FOREIGN KEY(plan_id) REFERENCES student_plans(id)
+    );
+    """,
+        "CREATE INDEX IF NOT EXISTS idx_plan_balances_student ON plan_balances (student_id)",
+        "CREATE INDEX IF NOT EXISTS idx_plan_balances_due ON plan_balances (next_due_date)",
+        _backfill_balances,
+    ]),
+    (8, "background jobs", [
+        """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        params TEXT NOT NULL,
+        status TEXT NOT NULL,
+        progress REAL NOT NULL DEFAULT 0,
+        message TEXT,
+        result TEXT,
+        error TEXT,
+        cancel_requested INTEGER NOT NULL DEFAULT 0,
+        owner TEXT,
+        created_by TEXT,
+        created_at TEXT NOT NULL,
+        started_at TEXT,
+        finished_at TEXT
+    );
+    """,
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)",
+    ]),
+    (9, "seasons", [
+        """
+    CREATE TABLE IF NOT EXISTS seasons (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        starts_on TEXT NOT NULL,
+        ends_on TEXT,
+        status TEXT NOT NULL DEFAULT 'open' CHECK (status IN ('open', 'archived')),
+        archive_file TEXT,
+        archived_at TEXT
+    );
+    """,
+        "ALTER TABLE dances ADD COLUMN season_id INTEGER REFERENCES seasons(id)",
+        "ALTER TABLE competitions ADD COLUMN season_id INTEGER REFERENCES seasons(id)",
+        "ALTER TABLE student_plans ADD COLUMN season_id INTEGER REFERENCES seasons(id)",
+        "CREATE INDEX IF NOT EXISTS idx_dances_season ON dances (season_id)",
+        "CREATE INDEX IF NOT EXISTS idx_competitions_season ON competitions (season_id)",
+        "CREATE INDEX IF NOT EXISTS idx_student_plans_season ON student_plans (season_id)",
+        # New rows join the most recently started open season unless the
+        # insert names one, so every write path is covered without changes.
+        *[
+            f"""
+    CREATE TRIGGER IF NOT EXISTS {table}_default_season AFTER INSERT ON {table}
+    WHEN new.season_id IS NULL BEGIN
+        UPDATE {table} SET season_id = (
+            SELECT id FROM seasons WHERE status = 'open' ORDER BY starts_on DESC, id DESC LIMIT 1
+        ) WHERE id = new.id;
+    END;
+    """
+            for table in ("dances", "competitions", "student_plans")
+        ],
+    ]),
+    (10, "student_summary view", [
+        # One row per student: demographics, dances and competitions as JSON
+        # arrays, and plan totals from plan_balances. Every column is an
+        # index lookup on student_id, so reading one student is one query.
+        """
+    CREATE VIEW IF NOT EXISTS student_summary AS
+    SELECT s.id AS student_id, s.first_name, s.last_name, s.dob,
+        (SELECT json_group_array(json_array(id, name, type)) FROM (
+            SELECT d.id, d.name, d.type FROM dance_students ds JOIN dances d ON d.id = ds.dance_id
+            WHERE ds.student_id = s.id ORDER BY d.type, d.name)) AS dances,
+        (SELECT json_group_array(json_array(id, name, has_convention)) FROM (
+            SELECT c.id, c.name, c.has_convention FROM competition_students cs
+            JOIN competitions c ON c.id = cs.competition_id
+            WHERE cs.student_id = s.id ORDER BY c.name)) AS competitions,
+        (SELECT COUNT(*) FROM plan_balances b WHERE b.student_id = s.id) AS plans,
+        (SELECT COALESCE(SUM(charged_cents), 0) FROM plan_balances b WHERE b.student_id = s.id) AS charged_cents,
+        (SELECT COALESCE(SUM(down_cents + paid_cents), 0) FROM plan_balances b WHERE b.student_id = s.id)
+            AS received_cents,
+        (SELECT COALESCE(SUM(balance_cents), 0) FROM plan_balances b WHERE b.student_id = s.id) AS balance_cents,
+        (SELECT MIN(next_due_date) FROM plan_balances b WHERE b.student_id = s.id) AS next_due_date
+    FROM students s;
+    """,
+    ]),
+    (11, "fee_rules", [
+        # Catalog items charged for competition rosters: once per competition
+        # ('competition'), per competition with a convention ('convention'),
+        # or per dance entered at each competition ('entry'). A NULL
+        # competition_id or dance_type matches any.
+        """
+    CREATE TABLE IF NOT EXISTS fee_rules (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL CHECK (kind IN ('competition', 'convention', 'entry')),
+        competition_id INTEGER REFERENCES competitions(id),
+        dance_type TEXT,
+        catalog_item_id INTEGER NOT NULL REFERENCES catalog_items(id)
+    );
+    """,
+    ]),
+    (12, "job heartbeats", [
+        # Refreshed by the owning process while a job runs, so another
+        # process can tell a live job from one whose process has died.
+        "ALTER TABLE jobs ADD COLUMN heartbeat_at TEXT",
+    ]),
+]
+
+_lock = threading.Lock()
+_migrated = set()
+
+
+def current_version(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(force=False):
+    """Bring the configured database up to the latest schema, once per process.
+
+    ``force`` checks again, for when the file's contents have been replaced
+    (a backup restore).
+    """
+    path = db.DB_PATH
+    if path in _migrated and not force:
+        return
+    with _lock:
+        if path in _migrated and not force:
+            return
+        # An up-to-date database (every start but the first) needs only this read.
+        with db.connection() as conn:
+            start = current_version(conn)
+        for version, _description, steps in MIGRATIONS:
+            if version <= start:
+                continue
+            with db.transaction() as conn:
+                # Re-checked under the write lock in case another process
+                # migrated the same file in the meantime.
+                if current_version(conn) >= version:
+                    continue
+                for step in steps:
+                    if callable(step):
+                        step(conn)
+                    else:
+                        conn.execute(step)
+                conn.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+        with db.connection() as conn:
+            conn.execute("PRAGMA optimize")
+        _migrated.add(path)
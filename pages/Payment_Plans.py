@@ -1,47 +1,32 @@
-import streamlit as st
-import sqlite3
-import pandas as pd
 import os
-from datetime import datetime
+
+import streamlit as st
 
 # Simple login check on a secondary page
 if st.session_state.get("authentication_status"):
 
     # --- All application code must go INSIDE this block ---
 
-    # --- DATABASE CONNECTION ---
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    # Path is relative to the pages directory, so we go up one level to find the data dir
-    DATA_DIR = os.path.join(BASE_DIR, "..", "data")
-    DB_PATH = os.path.join(DATA_DIR, "dance.db")
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    c = conn.cursor()
-
-    # --- CATALOG FUNCTIONS ---
-    def get_catalog_categories():
-        df = pd.read_sql("SELECT DISTINCT category FROM catalog_items ORDER BY category", conn)
-        return df['category'].tolist()
-
-    def get_catalog_items(category):
-        return pd.read_sql(
-            "SELECT id, name, price FROM catalog_items WHERE category = ? ORDER BY name", conn, params=(category,)
-        )
-
-    def add_catalog_item(category, name, price):
-        c.execute(
-            "INSERT INTO catalog_items (category, name, price) VALUES (?, ?, ?)",
-            (category, name, price)
-        )
-        conn.commit()
+    import pandas as pd
+    import instrument
+    instrument.start_run("payment_plans")
 
     # --- PAYMENT PLAN MODULE ---
+    # Catalog and plan data access live in payment_plan, on the shared db pool.
+    import jobs
     import payment_plan
+    import ledger
+    import seasons
+    import statements
+    from payment_plan import get_catalog_categories, get_catalog_items, add_catalog_item
+    from studio import get_student_summary, get_all_dances, get_all_competitions
+    from widgets import student_select, student_multiselect, job_status
 
     # --- UI ---
     st.set_page_config(page_title="Payment Plans", layout="wide")
     st.title("Payment Plans")
 
-    # NOTE: PDF generation is currently disabled. After finalizing the plan, a confirmation will be shown.
+    # Statement PDFs come from statements.py (cached per plan content).
     with st.expander("Manage Item Catalog", expanded=False):
         fixed_categories = [
             "Tuition", "Solo/Duo/Trio", "Groups", "Competitions & Conventions",
@@ -64,46 +49,238 @@ if st.session_state.get("authentication_status"):
         # Edit or Delete existing item
         st.subheader("Edit / Delete Catalog Item")
         edit_cat = st.selectbox("Select Category to Edit", categories, key="edit_cat")
-        items_df = get_catalog_items(edit_cat)
-        item_map = {row['name']: row['id'] for _, row in items_df.iterrows()}
-        sel_item = st.selectbox("Select Item", ["--"] + list(item_map.keys()), key="edit_item")
-        if sel_item and sel_item != "--":
-            eid = item_map[sel_item]
-            cur = items_df[items_df.id == eid].iloc[0]
-            new_name = st.text_input("New Item Name", value=cur['name'], key="edit_name")
-            new_price = st.number_input("New Item Price", value=cur['price'], min_value=0.0, format="%.2f", key="edit_price")
+        edit_items = {item.id: item for item in get_catalog_items(edit_cat)}
+        eid = st.selectbox("Select Item", [None] + list(edit_items), key="edit_item",
+                           format_func=lambda i: "--" if i is None else edit_items[i].name)
+        if eid is not None:
+            cur = edit_items[eid]
+            sel_item = cur.name
+            new_name = st.text_input("New Item Name", value=cur.name, key="edit_name")
+            new_price = st.number_input("New Item Price", value=cur.price, min_value=0.0, format="%.2f", key="edit_price")
             if st.button("Update Item", key="btn_update_item"):
-                c.execute("UPDATE catalog_items SET name=?, price=? WHERE id=?", (new_name, new_price, eid))
-                conn.commit()
+                payment_plan.update_catalog_item(eid, new_name, new_price)
                 st.success(f"Updated '{sel_item}' -> '{new_name}'")
             if st.button("Delete Item", key="btn_delete_item"):
-                c.execute("DELETE FROM catalog_items WHERE id=?", (eid,))
-                conn.commit()
+                payment_plan.delete_catalog_item(eid)
                 st.success(f"Deleted '{sel_item}'")
         st.markdown("---")
 
             # Display catalog items by category
         for cat in categories:
-            df_cat = get_catalog_items(cat)
-            if not df_cat.empty:
+            cat_items = get_catalog_items(cat)
+            if cat_items:
                 st.write(f"**{cat}**")
-                st.table(df_cat[['name', 'price']])
+                st.table({"name": [item.name for item in cat_items], "price": [item.price for item in cat_items]})
+
+    with st.expander("Competition Fee Rules", expanded=False):
+        # Which catalog items competition rosters are charged; plan forms are
+        # pre-filled from these.
+        rules = payment_plan.get_fee_rules()
+        if rules.empty:
+            st.write("No fee rules yet.")
+        else:
+            shown = rules.assign(competition=rules.competition.fillna("Any"), dance_type=rules.dance_type.fillna("Any"))
+            st.dataframe(shown[['kind', 'competition', 'dance_type', 'item', 'price']], hide_index=True)
+            rule_labels = dict(zip(shown['id'], shown['kind'] + " / " + shown['competition'] + " / "
+                                   + shown['dance_type'] + " / " + shown['item']))
+            del_rule = st.selectbox("Delete Rule", [None] + list(rule_labels), key="fee_rule_del",
+                                    format_func=lambda r: "--" if r is None else rule_labels[r])
+            if del_rule is not None and st.button("Delete Fee Rule", key="btn_del_fee_rule"):
+                payment_plan.delete_fee_rule(del_rule)
+                st.success("Fee rule deleted.")
+        st.subheader("Add Fee Rule")
+        fee_kind = st.radio("Charge", payment_plan.FEE_KINDS, key="fee_kind", horizontal=True,
+                            format_func={"competition": "Per competition", "convention": "Per convention",
+                                         "entry": "Per dance entry"}.get)
+        comps = get_all_competitions()
+        fee_comp_labels = dict(zip(comps['id'], comps['name']))
+        fee_comp = st.selectbox("Competition", [None] + list(fee_comp_labels), key="fee_comp",
+                                format_func=lambda c: "Any" if c is None else fee_comp_labels[c])
+        fee_type = None
+        if fee_kind == "entry":
+            dance_types = sorted(get_all_dances()['type'].dropna().unique())
+            fee_type = st.selectbox("Dance Type", [None] + dance_types, key="fee_type",
+                                    format_func=lambda t: "Any" if t is None else t)
+        fee_cat = st.selectbox("Item Category", categories, key="fee_cat")
+        fee_item_labels = {item.id: f"{item.name} (${item.price:.2f})" for item in get_catalog_items(fee_cat)}
+        fee_item = st.selectbox("Item", [None] + list(fee_item_labels), key="fee_item",
+                                format_func=lambda i: "--" if i is None else fee_item_labels[i])
+        if st.button("Add Fee Rule", key="btn_add_fee_rule"):
+            if fee_item is not None:
+                payment_plan.add_fee_rule(fee_kind, int(fee_item),
+                                          None if fee_comp is None else int(fee_comp), fee_type)
+                st.success("Fee rule added.")
+            else:
+                st.error("Pick a catalog item.")
+
+    with st.expander("Overdue Plans", expanded=False):
+        overdue = ledger.get_overdue()
+        if overdue.empty:
+            st.write("Nothing overdue.")
+        else:
+            st.dataframe(overdue.assign(balance=overdue.balance_cents / 100)[
+                ['student', 'plan_id', 'next_due_date', 'balance']], hide_index=True)
+
+    with st.expander("Apply Template to Roster", expanded=False):
+        # Build a template from catalog items, then create one plan per
+        # student on a dance, a competition or a hand-picked list.
+        st.subheader("New Template")
+        tmpl_name = st.text_input("Template Name", key="tmpl_name")
+        tmpl_items = []
+        for cat in categories:
+            prices = {item.name: item.price for item in get_catalog_items(cat)}
+            picked = st.multiselect(f"{cat} items", list(prices), key=f"tmpl_{cat}")
+            tmpl_items += [(name, float(prices[name]), cat) for name in picked]
+        if st.button("Save Template", key="btn_save_template"):
+            if tmpl_name and tmpl_items:
+                payment_plan.save_template(tmpl_name, tmpl_items)
+                st.success(f"Saved template '{tmpl_name}' with {len(tmpl_items)} items.")
+            else:
+                st.error("Enter a template name and pick at least one item.")
+        st.markdown("---")
+
+        st.subheader("Create Plans")
+        tmpl_labels = {t.id: t.name for t in payment_plan.get_templates()}
+        tmpl_id = st.selectbox("Template", [None] + list(tmpl_labels), key="bulk_template",
+                               format_func=lambda t: "--" if t is None else tmpl_labels[t])
+        target = st.radio("Apply To", ["Dance", "Competition", "Students"], key="bulk_target", horizontal=True)
+        roster = {}
+        if target == "Dance":
+            dances = get_all_dances()
+            dance_labels = dict(zip(dances['id'], dances['name'] + " (" + dances['type'] + ")"))
+            dance_id = st.selectbox("Dance", [None] + list(dance_labels), key="bulk_dance",
+                                    format_func=lambda d: "--" if d is None else dance_labels[d])
+            if dance_id is not None:
+                roster = {"dance_id": int(dance_id)}
+        elif target == "Competition":
+            comps = get_all_competitions()
+            comp_labels = dict(zip(comps['id'], comps['name']))
+            comp_id = st.selectbox("Competition", [None] + list(comp_labels), key="bulk_comp",
+                                   format_func=lambda c: "--" if c is None else comp_labels[c])
+            if comp_id is not None:
+                roster = {"competition_id": int(comp_id)}
+        else:
+            picked_ids = student_multiselect("Students", key="bulk_students")
+            if picked_ids:
+                roster = {"student_ids": [int(s) for s in picked_ids]}
+        bulk_down = st.number_input("Down Payment", min_value=0.0, format="%.2f", key="bulk_down")
+        bulk_months = st.slider("Number of Months", min_value=6, max_value=10, value=6, key="bulk_months")
+        if tmpl_id is not None and roster:
+            preview = payment_plan.preview_template_plans(tmpl_id, bulk_months, [bulk_down], **roster)
+            creating = int((preview['action'] == "create").sum())
+            st.write(f"**{creating}** plans to create, **{len(preview) - creating}** students skipped.")
+            st.dataframe(preview[['student', 'existing_plans', 'total', 'down', 'installment', 'action']],
+                         hide_index=True)
+            if st.button("Create Plans", key="btn_bulk_create", disabled=creating == 0):
+                st.session_state["bulk_plans_job"] = jobs.submit(
+                    "apply_template_plans", created_by=st.session_state.get("username"),
+                    template_id=int(tmpl_id), months=bulk_months, down_payments=[bulk_down], **roster,
+                )
+        job = job_status("bulk_plans_job")
+        if job is not None and job['status'] == jobs.DONE:
+            st.success(f"Created {len(job['result']['plan_ids'])} payment plans.")
+
+    with st.expander("Export Data", expanded=False):
+        # Exports stream to a file on the job pool; download it once done.
+        exp_name = st.selectbox("Export", ["plans", "rosters", "catalog"], key="export_name",
+                                format_func={"plans": "Plans with items", "rosters": "Student rosters",
+                                             "catalog": "Catalog price list"}.get)
+        exp_fmt = st.radio("Format", ["csv", "parquet"], key="export_fmt", horizontal=True)
+        if st.button("Start Export", key="btn_export"):
+            st.session_state["export_job"] = jobs.submit(
+                "export", created_by=st.session_state.get("username"), name=exp_name, fmt=exp_fmt,
+            )
+        job = job_status("export_job")
+        if job is not None and job['status'] == jobs.DONE and os.path.exists(job['result']['path']):
+            result = job['result']
+            st.write(f"{result['rows']} rows, {result['bytes'] / 1024:.0f} KB")
+            with open(result['path'], "rb") as f:
+                st.download_button("Download", data=f, file_name=os.path.basename(result['path']),
+                                   key="btn_export_download")
+        st.markdown("---")
+        st.subheader("Plan Statements")
+        st.caption("Renders a PDF statement for every plan; unchanged plans reuse their cached file.")
+        if st.button("Render All Statements", key="btn_statements"):
+            st.session_state["statements_job"] = jobs.submit("statements", created_by=st.session_state.get("username"))
+        job = job_status("statements_job")
+        if job is not None and job['status'] == jobs.DONE and os.path.exists(job['result']['path']):
+            result = job['result']
+            st.write(f"{result['plans']} statements ({result['rendered']} re-rendered)")
+            with open(result['path'], "rb") as f:
+                st.download_button("Download Statements (zip)", data=f, file_name=os.path.basename(result['path']),
+                                   key="btn_statements_download")
 
     # --- Select Student ---
     st.subheader("Select Student")
-    students_df = pd.read_sql("SELECT id, first_name, last_name FROM students ORDER BY last_name, first_name", conn)
-    student_map = {f"{r.last_name}, {r.first_name}": r.id for r in students_df.itertuples()}
-    sel_student = st.selectbox("Student", ["--"] + list(student_map.keys()), key="select_student")
+    sid = student_select("Student", key="select_student")
+
+    if sid is not None:
+        stu = get_student_summary(sid)
+
+        # Existing plans, balances and payments; the summary already says
+        # whether there are any, so students without plans skip the ledger.
+        balances = ledger.get_student_balances(sid) if stu['plans'] else pd.DataFrame()
+        if not balances.empty:
+            with st.expander("Balances & Payments", expanded=False):
+                view = balances.assign(
+                    charged=balances.charged_cents / 100, down=balances.down_cents / 100,
+                    paid=balances.paid_cents / 100, balance=balances.balance_cents / 100,
+                )
+                st.dataframe(view[['plan_id', 'created_at', 'months', 'charged', 'down', 'paid', 'balance',
+                                   'next_due_date']], hide_index=True)
+                st.markdown(f"**Outstanding:** ${stu['balance_cents'] / 100:.2f}")
+                # Rendered only on request: the expander body runs on every rerun.
+                if st.toggle("Statement PDF", key="stmt_on"):
+                    stmt_plan = st.selectbox("Statement for Plan", balances['plan_id'].tolist(), key="stmt_plan")
+                    with open(statements.render_statement(stmt_plan), "rb") as f:
+                        st.download_button("Download Statement PDF", data=f,
+                                           file_name=f"statement-plan-{stmt_plan}.pdf", key="btn_stmt_download")
+                with st.form("payment_form"):
+                    pay_plan = st.selectbox("Plan", balances['plan_id'].tolist(), key="pay_plan")
+                    pay_amount = st.number_input("Amount", min_value=0.0, format="%.2f", key="pay_amount")
+                    pay_date = st.date_input("Paid On", key="pay_date")
+                    pay_method = st.text_input("Method", key="pay_method")
+                    if st.form_submit_button("Record Payment"):
+                        if pay_amount > 0:
+                            ledger.record_payment(pay_plan, pay_amount, pay_date, pay_method or None)
+                            st.success(f"Recorded ${pay_amount:.2f} against plan {pay_plan}.")
+                        else:
+                            st.error("Enter a payment amount.")
 
-    if sel_student and sel_student != "--":
-        sid = student_map[sel_student]
-        st.header(f"Build Payment Plan for {sel_student}")
+        # Plans from archived seasons, read from their archive files.
+        archived = seasons.get_seasons()
+        archived = archived[archived.status == seasons.ARCHIVED]
+        past = [(s['name'], int(s['id']), payment_plan.get_student_plans(sid, int(s['id'])))
+                for _, s in archived.iterrows()]
+        past = [(name, season_id, plans) for name, season_id, plans in past if not plans.empty]
+        if past:
+            with st.expander("Past Seasons", expanded=False):
+                for name, season_id, plans in past:
+                    st.write(f"**{name}**")
+                    for plan_id in plans['id']:
+                        items = payment_plan.get_plan_items(int(plan_id), season_id)
+                        charged = sum(item.price for item in items if item.item_type != ledger.DOWN_PAYMENT)
+                        st.write(f"Plan {plan_id}: {len(items)} items, ${charged:.2f} charged")
+
+        st.header(f"Build Payment Plan for {stu['last_name']}, {stu['first_name']}")
         with st.form("plan_form"):
             selections = {}
             subtotals = {}
+            # Competition, convention and entry fees from the fee rules,
+            # pre-selected; keyed by student so switching student re-fills.
+            fees = payment_plan.get_student_fees(sid)
+            if not fees.empty:
+                # Keyed by fee, not label: competitions or dances may share a name.
+                fee_lines = dict(zip(fees['key'], zip(fees['label'], fees['price'], fees['category'])))
+                sel_fees = st.multiselect("Competition Fees", list(fee_lines), default=list(fee_lines),
+                                          key=f"sel_fees_{sid}", format_func=lambda k: fee_lines[k][0])
+                fee_total = sum(fee_lines[k][1] for k in sel_fees)
+                st.write(f"Competition Fees Subtotal: ${fee_total:.2f}")
+                subtotals["Competition Fees"] = fee_total
+            else:
+                fee_lines, sel_fees = {}, []
             for cat in categories:
-                df_items = get_catalog_items(cat)
-                options = [f"{row['name']} (${row['price']:.2f})" for _, row in df_items.iterrows()]
+                options = [f"{item.name} (${item.price:.2f})" for item in get_catalog_items(cat)]
                 sel_opts = st.multiselect(f"Select {cat}", options, key=f"sel_{cat}")
                 total = sum(float(opt.split('$')[1].strip(')')) for opt in sel_opts)
                 st.write(f"{cat} Subtotal: ${total:.2f}")
@@ -117,21 +294,16 @@ if st.session_state.get("authentication_status"):
             grand_total = sum(subtotals.values())
             total_down = down1 + down2
             remaining = grand_total - total_down
-            installment = remaining / months if months else 0.0
             # Persist
-            plan_id = payment_plan.add_student_plan(sid, None)
-            for cat, opts in selections.items():
-                for opt in opts:
-                    name = opt.split(' ($')[0]
-                    price = float(opt.split('$')[1].strip(')'))
-                    payment_plan.add_plan_item(plan_id, name, price, cat)
-            payment_plan.add_plan_item(plan_id, "Down Payment 1", down1, "Down Payment")
-            payment_plan.add_plan_item(plan_id, "Down Payment 2", down2, "Down Payment")
+            items = [
+                (opt.split(' ($')[0], float(opt.split('$')[1].strip(')')), cat)
+                for cat, opts in selections.items() for opt in opts
+            ] + [(fee_lines[k][0], float(fee_lines[k][1]), fee_lines[k][2]) for k in sel_fees]
+            plan_id = payment_plan.save_plan(sid, items, [down1, down2], months)
             # Display summary
             st.success("Payment plan saved.")
             df_summary = pd.DataFrame([
-                {"Category": cat, "Item": opt.split(' ($')[0], "Price": float(opt.split('$')[1].strip(')'))}
-                for cat, opts in selections.items() for opt in opts
+                {"Category": cat, "Item": name, "Price": price} for name, price, cat in items
             ] + [
                 {"Category": "Down Payment", "Item": "Down Payment 1", "Price": down1},
                 {"Category": "Down Payment", "Item": "Down Payment 2", "Price": down2}
@@ -141,9 +313,19 @@ if st.session_state.get("authentication_status"):
             st.markdown(f"**Grand Total:** ${grand_total:.2f}")
             st.markdown(f"**Total Down Payments:** ${total_down:.2f}")
             st.markdown(f"**Remaining Balance:** ${remaining:.2f}")
+            schedule = payment_plan.get_schedule(plan_id)
+            installment = schedule['amount'].iloc[0] if not schedule.empty else 0.0
             st.markdown(f"**Installment ({months} mo):** ${installment:.2f}")
+            st.subheader("Installment Schedule")
+            st.dataframe(schedule[['installment', 'due_date', 'amount']], hide_index=True)
+            with open(statements.render_statement(plan_id), "rb") as f:
+                st.download_button("Download Statement PDF", data=f, file_name=f"statement-plan-{plan_id}.pdf",
+                                   key="btn_new_stmt_download")
     else:
         st.info("Select a student to begin.")
 
+    # Query timings for this rerun (only when DANCE_INSTRUMENT is set)
+    instrument.sidebar_panel(st, instrument.end_run())
+
 else:
     st.warning("You must be logged in to see this page. Please go to the Home page to log in.")
\ No newline at end of file
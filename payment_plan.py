@@ -1,98 +1,474 @@
-import sqlite3
-import pandas as pd
 from datetime import datetime
 
-# --- DATABASE CONNECTION ---
-DB_PATH = "data/dance.db"
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-c = conn.cursor()
-
-# --- SCHEMA FOR PAYMENT PLANS ---
-c.execute("""
-CREATE TABLE IF NOT EXISTS payment_templates (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL UNIQUE
-);
-""")
-c.execute("""
-CREATE TABLE IF NOT EXISTS template_items (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    template_id INTEGER,
-    name TEXT NOT NULL,
-    price REAL NOT NULL,
-    item_type TEXT NOT NULL,
-    FOREIGN KEY(template_id) REFERENCES payment_templates(id)
-);
-""")
-c.execute("""
-CREATE TABLE IF NOT EXISTS student_plans (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    student_id INTEGER,
-    template_id INTEGER,
-    created_at TEXT NOT NULL,
-    FOREIGN KEY(student_id) REFERENCES students(id),
-    FOREIGN KEY(template_id) REFERENCES payment_templates(id)
-);
-""")
-c.execute("""
-CREATE TABLE IF NOT EXISTS plan_items (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    plan_id INTEGER,
-    name TEXT NOT NULL,
-    price REAL NOT NULL,
-    item_type TEXT NOT NULL,
-    FOREIGN KEY(plan_id) REFERENCES student_plans(id)
-);
-""")
-conn.commit()
+import numpy as np
+import pandas as pd
+
+import db
+import instrument
+import ledger
+import migrations
+import seasons
+from cache import cached, invalidates
+
+# --- SCHEMA ---
+migrations.migrate()
+
+# --- CATALOG FUNCTIONS ---
+@cached("catalog_items")
+def get_catalog_categories():
+    return db.columns("SELECT DISTINCT category FROM catalog_items ORDER BY category")["category"]
+
+@cached("catalog_items")
+def get_catalog_items(category):
+    return db.rows(
+        "SELECT id, name, price FROM catalog_items WHERE category = ? ORDER BY name", (category,)
+    )
+
+@invalidates("catalog_items")
+@db.group_commit
+def add_catalog_item(category, name, price):
+    return db.execute(
+        "INSERT INTO catalog_items (category, name, price) VALUES (?, ?, ?)",
+        (category, name, price)
+    )
+
+@invalidates("catalog_items")
+@db.group_commit
+def update_catalog_item(item_id, name, price):
+    db.execute("UPDATE catalog_items SET name=?, price=? WHERE id=?", (name, price, item_id))
+
+@invalidates("catalog_items", "fee_rules")
+@db.group_commit
+def delete_catalog_item(item_id):
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM fee_rules WHERE catalog_item_id=?", (item_id,))
+        conn.execute("DELETE FROM catalog_items WHERE id=?", (item_id,))
+
+# --- COMPETITION FEES ---
+# fee_rules map competition rosters to catalog items: a 'competition' rule
+# charges once per competition a student is on, 'convention' once per such
+# competition that has a convention, and 'entry' once per dance the student
+# is in at each of their competitions (dances and competitions of the same
+# season). Where several rules could price the same charge, the most
+# specific wins: a named competition over any, then a named dance type over
+# any. Fee lines stay cached until rosters, rules or prices change; the plan
+# form pre-fills from one student's, read for that student alone.
+FEE_KINDS = ("competition", "convention", "entry")
+FEE_TABLES = ("fee_rules", "catalog_items", "competitions", "competition_students", "dances", "dance_students")
+FEE_LINE_COLUMNS = ["student_id", "kind", "competition_id", "competition", "dance_id", "dance",
+                    "catalog_item_id", "item", "category", "price"]
+
+@cached("fee_rules", "catalog_items", "competitions")
+def get_fee_rules():
+    return db.read_sql(
+        "SELECT r.id, r.kind, r.competition_id, c.name AS competition, r.dance_type,"
+        " r.catalog_item_id, i.name AS item, i.category, i.price"
+        " FROM fee_rules r JOIN catalog_items i ON i.id = r.catalog_item_id"
+        " LEFT JOIN competitions c ON c.id = r.competition_id"
+        " ORDER BY r.kind, c.name, r.dance_type, i.name"
+    )
+
+@invalidates("fee_rules")
+@db.group_commit
+def add_fee_rule(kind, catalog_item_id, competition_id=None, dance_type=None):
+    """Charge ``catalog_item_id`` for ``kind`` ('competition', 'convention' or 'entry'); None matches any."""
+    if kind not in FEE_KINDS:
+        raise ValueError(f"Unknown fee kind {kind!r}; expected one of {', '.join(FEE_KINDS)}")
+    if kind != "entry":
+        dance_type = None
+    with db.transaction() as conn:
+        conn.execute(
+            "INSERT INTO fee_rules (kind, competition_id, dance_type, catalog_item_id)"
+            " SELECT ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM fee_rules WHERE kind = ?"
+            " AND competition_id IS ? AND dance_type IS ? AND catalog_item_id = ?)",
+            (kind, competition_id, dance_type, catalog_item_id) * 2,
+        )
+
+@invalidates("fee_rules")
+@db.group_commit
+def delete_fee_rule(rule_id):
+    db.execute("DELETE FROM fee_rules WHERE id=?", (rule_id,))
+
+# Winning rule(s) per competition, kind and dance type; depends only on the
+# rules and competitions, so it is resolved before joining the rosters.
+_RESOLVED_FEES = (
+    "SELECT competition_id, kind, dance_type, catalog_item_id FROM ("
+    " SELECT c.id AS competition_id, r.kind, t.type AS dance_type, r.catalog_item_id,"
+    " RANK() OVER (PARTITION BY c.id, r.kind, t.type ORDER BY"
+    " (r.competition_id IS NOT NULL) * 2 + (r.dance_type IS NOT NULL) DESC) AS preference"
+    " FROM competitions c"
+    " JOIN fee_rules r ON (r.competition_id IS NULL OR r.competition_id = c.id)"
+    " AND (r.kind != 'convention' OR c.has_convention)"
+    " LEFT JOIN (SELECT DISTINCT type FROM dances) t"
+    " ON r.kind = 'entry' AND (r.dance_type IS NULL OR r.dance_type = t.type)"
+    " WHERE r.kind != 'entry' OR t.type IS NOT NULL"
+    ") WHERE preference = 1"
+)
+
+def _read_fee_lines(student_ids=None):
+    # With student_ids the rosters are joined through a temp table, so the
+    # rules are only expanded for those students.
+    scope = " AND m.student_id IN (SELECT id FROM fee_students)" if student_ids is not None else ""
+    with db.connection() as conn:
+        if student_ids is not None:
+            db.fill_temp_ids(conn, "fee_students", student_ids)
+        return db.read_sql(
+            f"WITH resolved AS ({_RESOLVED_FEES}), lines AS ("
+            " SELECT m.student_id, f.kind, c.id AS competition_id, c.name AS competition,"
+            " NULL AS dance_id, NULL AS dance, f.catalog_item_id"
+            " FROM resolved f JOIN competitions c ON c.id = f.competition_id"
+            " JOIN competition_students m ON m.competition_id = c.id"
+            f" WHERE f.kind != 'entry'{scope}"
+            " UNION ALL"
+            " SELECT m.student_id, f.kind, c.id, c.name, d.id, d.name, f.catalog_item_id"
+            " FROM competition_students m JOIN competitions c ON c.id = m.competition_id"
+            " JOIN dance_students ds ON ds.student_id = m.student_id"
+            " JOIN dances d ON d.id = ds.dance_id AND d.season_id IS c.season_id"
+            " JOIN resolved f ON f.competition_id = c.id AND f.kind = 'entry' AND f.dance_type = d.type"
+            f" WHERE 1{scope}"
+            ")"
+            " SELECT l.student_id, l.kind, l.competition_id, l.competition, l.dance_id, l.dance,"
+            " l.catalog_item_id, i.name AS item, i.category, i.price"
+            " FROM lines l JOIN catalog_items i ON i.id = l.catalog_item_id"
+            " ORDER BY l.student_id, l.competition, l.kind, l.dance, i.name"
+        )
+
+@cached(*FEE_TABLES)
+def get_fee_lines():
+    """One row per fee every student owes under fee_rules (columns FEE_LINE_COLUMNS), by student."""
+    return _read_fee_lines()
+
+@cached(*FEE_TABLES)
+def get_fee_totals():
+    """Per-student competition, convention and entry fee totals (and their sum), indexed by student_id."""
+    totals = get_fee_lines().pivot_table(index="student_id", columns="kind", values="price",
+                                         aggfunc="sum", fill_value=0.0)
+    totals = totals.reindex(columns=list(FEE_KINDS), fill_value=0.0)
+    totals["total"] = totals.sum(axis=1)
+    return totals
+
+@cached(*FEE_TABLES)
+def get_student_fees(student_id):
+    """The student's fee lines (as get_fee_lines()), each with a ``label`` naming the charge.
+
+    Only this student's rosters are read. Labels repeat when competitions or
+    dances share a name, so each row also has a ``key``, ``(kind,
+    competition_id, dance_id, catalog_item_id)`` with dance_id None for
+    per-competition fees, that identifies it.
+    """
+    lines = _read_fee_lines([student_id])
+    lines["key"] = list(zip(lines["kind"], lines["competition_id"].astype(int),
+                            [None if pd.isna(d) else int(d) for d in lines["dance_id"]],
+                            lines["catalog_item_id"].astype(int)))
+    lines["label"] = (lines["item"] + " - " + lines["competition"]
+                      + lines["dance"].map(lambda d: f" ({d})" if isinstance(d, str) else ""))
+    return lines
 
 # --- PAYMENT TEMPLATE FUNCTIONS ---
+@cached("payment_templates")
 def get_templates():
-    return pd.read_sql("SELECT * FROM payment_templates ORDER BY name", conn)
+    return db.rows("SELECT * FROM payment_templates ORDER BY name")
 
+@invalidates("payment_templates")
+@db.group_commit
 def add_template(name):
-    c.execute("INSERT OR IGNORE INTO payment_templates(name) VALUES(?)", (name,))
-    conn.commit()
+    db.execute("INSERT OR IGNORE INTO payment_templates(name) VALUES(?)", (name,))
 
+@cached("template_items")
 def get_template_items(template_id):
-    return pd.read_sql(
-        "SELECT name, price, item_type FROM template_items WHERE template_id = ?", 
-        conn, params=(template_id,)
+    return db.rows(
+        "SELECT name, price, item_type FROM template_items WHERE template_id = ?",
+        (template_id,)
     )
 
+@invalidates("template_items")
+@db.group_commit
 def add_template_item(template_id, name, price, item_type):
-    c.execute(
-        "INSERT INTO template_items(template_id, name, price, item_type) VALUES(?,?,?,?)", 
+    db.execute(
+        "INSERT INTO template_items(template_id, name, price, item_type) VALUES(?,?,?,?)",
         (template_id, name, price, item_type)
     )
-    conn.commit()
+
+@invalidates("payment_templates", "template_items")
+@db.group_commit
+def save_template(name, items):
+    """Create (or replace the items of) a template from ``(name, price, item_type)`` items; returns its id."""
+    with db.transaction() as conn:
+        conn.execute("INSERT OR IGNORE INTO payment_templates(name) VALUES(?)", (name,))
+        template_id = conn.execute("SELECT id FROM payment_templates WHERE name = ?", (name,)).fetchone()[0]
+        conn.execute("DELETE FROM template_items WHERE template_id = ?", (template_id,))
+        conn.executemany(
+            "INSERT INTO template_items(template_id, name, price, item_type) VALUES(?,?,?,?)",
+            [(template_id, n, p, t) for n, p, t in items]
+        )
+    return template_id
 
 # --- STUDENT PLAN FUNCTIONS ---
-def get_student_plans(student_id):
-    return pd.read_sql(
-        "SELECT * FROM student_plans WHERE student_id = ?", 
-        conn, params=(student_id,)
-    )
+@cached("student_plans", "seasons")
+def get_student_plans(student_id, season_id=None):
+    with db.connection() as conn:
+        schema, cond, params = seasons.source(conn, season_id)
+        return db.read_sql(
+            f"SELECT * FROM {schema}.student_plans WHERE student_id = ? AND {cond}",
+            (student_id,) + params
+        )
 
+@invalidates("student_plans", "plan_balances")
+@db.group_commit
 def add_student_plan(student_id, template_id):
     now = datetime.now().isoformat()
-    c.execute(
-        "INSERT INTO student_plans(student_id, template_id, created_at) VALUES(?,?,?)",
-        (student_id, template_id, now)
+    with db.transaction() as conn:
+        plan_id = conn.execute(
+            "INSERT INTO student_plans(student_id, template_id, created_at) VALUES(?,?,?)",
+            (student_id, template_id, now)
+        ).lastrowid
+        ledger.refresh_balances(conn, [plan_id])
+    return plan_id
+
+@cached("plan_items", "seasons")
+def get_plan_items(plan_id, season_id=None):
+    # Plan ids are unique across seasons; season_id only says which file holds the plan.
+    with db.connection() as conn:
+        schema, _cond, _params = seasons.source(conn, season_id)
+        return db.rows(
+            f"SELECT name, price, item_type FROM {schema}.plan_items WHERE plan_id = ?",
+            (plan_id,)
+        )
+
+@invalidates("plan_items", "plan_schedule", "plan_balances")
+@db.group_commit
+def add_plan_item(plan_id, name, price, item_type):
+    with db.transaction() as conn:
+        conn.execute(
+            "INSERT INTO plan_items(plan_id, name, price, item_type) VALUES(?,?,?,?)",
+            (plan_id, name, price, item_type)
+        )
+        _recompute_schedules(conn, [plan_id])
+
+def _insert_plan(conn, student_id, items, down_payments, months, template_id, created_at):
+    plan_id = conn.execute(
+        "INSERT INTO student_plans(student_id, template_id, created_at, months) VALUES(?,?,?,?)",
+        (student_id, template_id, created_at, months)
+    ).lastrowid
+    rows = [(plan_id, name, price, item_type) for name, price, item_type in items]
+    rows += [(plan_id, f"Down Payment {i}", amount, "Down Payment")
+             for i, amount in enumerate(down_payments, start=1)]
+    conn.executemany(
+        "INSERT INTO plan_items(plan_id, name, price, item_type) VALUES(?,?,?,?)", rows
     )
-    plan_id = c.lastrowid
-    conn.commit()
     return plan_id
 
-def get_plan_items(plan_id):
-    return pd.read_sql(
-        "SELECT name, price, item_type FROM plan_items WHERE plan_id = ?", 
-        conn, params=(plan_id,)
+@invalidates("student_plans", "plan_items", "plan_schedule", "plan_balances")
+@db.group_commit
+def save_plan(student_id, items, down_payments, months, template_id=None):
+    """Save a plan header, all of its items and its schedule in one transaction.
+
+    ``items`` is an iterable of ``(name, price, item_type)``; each down payment
+    amount is stored as a "Down Payment N" item. Returns the new plan id.
+    """
+    now = datetime.now().isoformat()
+    with db.transaction() as conn:
+        plan_id = _insert_plan(conn, student_id, items, down_payments, months, template_id, now)
+        _recompute_schedules(conn, [plan_id])
+    return plan_id
+
+@invalidates("student_plans", "plan_items", "plan_schedule", "plan_balances")
+def save_plans(plans):
+    """Save many plans at once; all of them are written or none are.
+
+    ``plans`` is an iterable of dicts with the keyword arguments of
+    ``save_plan``. Returns the new plan ids in the same order.
+    """
+    now = datetime.now().isoformat()
+    with db.transaction() as conn:
+        plan_ids = [
+            _insert_plan(conn, p["student_id"], p["items"], p.get("down_payments", ()),
+                         p["months"], p.get("template_id"), now)
+            for p in plans
+        ]
+        _recompute_schedules(conn, plan_ids)
+    return plan_ids
+
+# --- INSTALLMENT SCHEDULES ---
+# Amounts are integer cents. A plan's balance is its items minus its down
+# payments, split evenly over ``months`` installments with any leftover cents
+# added one each to the earliest installments, so the schedule always sums to
+# the balance exactly. Installments fall on the 1st of each month, starting
+# the month after the plan was created.
+DOWN_PAYMENT = ledger.DOWN_PAYMENT
+
+def split_installments(balance_cents, months):
+    base, extra = divmod(max(int(balance_cents), 0), months)
+    return [base + (1 if k < extra else 0) for k in range(months)]
+
+def _recompute_schedules(conn, plan_ids=None):
+    """Rebuild plan_schedule and plan_balances for ``plan_ids`` (all plans when None)."""
+    scheduled = _write_schedules(conn, plan_ids)
+    ledger.refresh_balances(conn, plan_ids)
+    return scheduled
+
+def _write_schedules(conn, plan_ids=None):
+    # One vectorized pass over every plan in scope.
+    if plan_ids is not None:
+        db.fill_temp_ids(conn, "plan_scope", plan_ids)
+        scope_join = " JOIN plan_scope sc ON sc.id = p.id"
+    else:
+        scope_join = ""
+    plans = pd.read_sql(
+        "SELECT p.id AS plan_id, p.months, p.created_at,"
+        " COALESCE(SUM(CASE WHEN i.item_type = ? THEN -CAST(ROUND(i.price * 100) AS INTEGER)"
+        " ELSE CAST(ROUND(i.price * 100) AS INTEGER) END), 0) AS balance_cents"
+        " FROM student_plans p" + scope_join +
+        " LEFT JOIN plan_items i ON i.plan_id = p.id"
+        " GROUP BY p.id", conn, params=(DOWN_PAYMENT,)
     )
+    if plan_ids is not None:
+        conn.execute("DELETE FROM plan_schedule WHERE plan_id IN (SELECT id FROM plan_scope)")
+    else:
+        conn.execute("DELETE FROM plan_schedule")
 
-def add_plan_item(plan_id, name, price, item_type):
-    c.execute(
-        "INSERT INTO plan_items(plan_id, name, price, item_type) VALUES(?,?,?,?)", 
-        (plan_id, name, price, item_type)
+    # Plans saved before month counts were stored have no schedule.
+    plans = plans[plans["months"].notna() & (plans["months"] > 0)]
+    if plans.empty:
+        return 0
+    months = plans["months"].to_numpy(dtype=np.int64)
+    balance = np.maximum(plans["balance_cents"].to_numpy(dtype=np.int64), 0)
+    base, extra = np.divmod(balance, months)
+
+    # One output row per installment: repeat each plan `months` times and
+    # number the copies 0..months-1 within each plan.
+    plan_col = np.repeat(plans["plan_id"].to_numpy(dtype=np.int64), months)
+    starts = np.repeat(np.cumsum(months) - months, months)
+    k = np.arange(months.sum()) - starts
+    amount = np.repeat(base, months) + (k < np.repeat(extra, months))
+
+    created = pd.to_datetime(plans["created_at"], format="ISO8601")
+    first_month = (created.dt.year * 12 + created.dt.month).to_numpy(dtype=np.int64)  # month after creation, 0-based
+    month_index = np.repeat(first_month, months) + k
+    due = pd.to_datetime(pd.DataFrame({
+        "year": month_index // 12, "month": month_index % 12 + 1, "day": 1,
+    })).dt.strftime("%Y-%m-%d")
+
+    rows = zip(plan_col.tolist(), (k + 1).tolist(), due.tolist(), amount.tolist())
+    conn.executemany(
+        "INSERT INTO plan_schedule (plan_id, installment, due_date, amount_cents) VALUES (?, ?, ?, ?)", rows
     )
-    conn.commit()
+    return len(plans)
+
+@invalidates("plan_schedule", "plan_balances")
+def recompute_schedules(plan_ids=None):
+    """Recompute the schedules of ``plan_ids``, or of every plan; returns the number of plans scheduled."""
+    with db.transaction() as conn:
+        return _recompute_schedules(conn, plan_ids)
+
+@invalidates("student_plans", "plan_schedule", "plan_balances")
+def update_plan_months(plan_ids, months):
+    """Change the month count of the given plans and recompute their schedules."""
+    plan_ids = list(plan_ids)
+    with db.transaction() as conn:
+        db.fill_temp_ids(conn, "plan_scope", plan_ids)
+        conn.execute("UPDATE student_plans SET months = ? WHERE id IN (SELECT id FROM plan_scope)", (months,))
+        return _recompute_schedules(conn, plan_ids)
+
+@invalidates("plan_items", "plan_schedule", "plan_balances")
+def requote_plans(plan_ids=None):
+    """Re-price plan items from the current catalog and recompute schedules.
+
+    Items are matched to catalog entries by category (``item_type``) and name;
+    down payments and items no longer in the catalog keep their price.
+    Returns the number of plans scheduled.
+    """
+    with db.transaction() as conn:
+        scope = ""
+        if plan_ids is not None:
+            plan_ids = list(plan_ids)
+            db.fill_temp_ids(conn, "plan_scope", plan_ids)
+            scope = " AND plan_items.plan_id IN (SELECT id FROM plan_scope)"
+        conn.execute(
+            "UPDATE plan_items SET price = c.price FROM catalog_items c"
+            " WHERE c.category = plan_items.item_type AND c.name = plan_items.name"
+            " AND c.price <> plan_items.price" + scope
+        )
+        return _recompute_schedules(conn, plan_ids)
+
+@cached("plan_schedule", "seasons")
+def get_schedule(plan_id, season_id=None):
+    with db.connection() as conn:
+        schema, _cond, _params = seasons.source(conn, season_id)
+        df = db.read_sql(
+            f"SELECT installment, due_date, amount_cents FROM {schema}.plan_schedule"
+            " WHERE plan_id = ? ORDER BY installment", (plan_id,)
+        )
+    df["amount"] = df["amount_cents"] / 100
+    return df
+
+# --- BULK TEMPLATE PLANS ---
+def _roster_scope(conn, dance_id=None, competition_id=None, student_ids=None):
+    # SQL that yields the student_id column of exactly one roster source.
+    if dance_id is not None:
+        return "SELECT student_id FROM dance_students WHERE dance_id = ?", (dance_id,)
+    if competition_id is not None:
+        return "SELECT student_id FROM competition_students WHERE competition_id = ?", (competition_id,)
+    if student_ids is not None:
+        db.fill_temp_ids(conn, "roster_scope", student_ids)
+        return "SELECT id AS student_id FROM roster_scope", ()
+    raise ValueError("Pass a dance_id, competition_id or student_ids")
+
+def _template_preview(conn, template_id, months, down_payments, roster):
+    sql, params = _roster_scope(conn, **roster)
+    students = pd.read_sql(
+        "SELECT s.id AS student_id, s.last_name || ', ' || s.first_name AS student,"
+        " COUNT(p.id) AS existing_plans"
+        f" FROM ({sql}) r JOIN students s ON s.id = r.student_id"
+        " LEFT JOIN student_plans p ON p.student_id = s.id AND p.template_id = ?"
+        " GROUP BY s.id ORDER BY s.last_name, s.first_name", conn, params=params + (template_id,)
+    )
+    items = [tuple(r) for r in conn.execute(
+        "SELECT name, price, item_type FROM template_items WHERE template_id = ?", (template_id,)
+    )]
+    total = sum(ledger.to_cents(price) for _, price, _ in items)
+    down = sum(ledger.to_cents(d) for d in down_payments)
+    installments = split_installments(total - down, months)
+    students["items"] = len(items)
+    students["total"] = total / 100
+    students["down"] = down / 100
+    students["installment"] = installments[0] / 100
+    students["action"] = np.where(students["existing_plans"] > 0, "skip (already on this template)", "create")
+    return students, items
+
+def preview_template_plans(template_id, months, down_payments=(), dance_id=None, competition_id=None,
+                           student_ids=None):
+    """What apply_template_plans() would do, one row per roster student, without writing anything.
+
+    The roster comes from a dance, a competition or an explicit list of
+    student ids. Students who already have a plan on this template are
+    marked to be skipped.
+    """
+    roster = dict(dance_id=dance_id, competition_id=competition_id, student_ids=student_ids)
+    with db.connection() as conn:
+        return _template_preview(conn, template_id, months, down_payments, roster)[0]
+
+@invalidates("student_plans", "plan_items", "plan_schedule", "plan_balances")
+def apply_template_plans(template_id, months, down_payments=(), dance_id=None, competition_id=None,
+                         student_ids=None, skip_existing=True):
+    """Create a plan from a template for every student on a roster, in one transaction.
+
+    Returns the new plan ids. With ``skip_existing`` students who already
+    have a plan on this template are left alone.
+    """
+    roster = dict(dance_id=dance_id, competition_id=competition_id, student_ids=student_ids)
+    now = datetime.now().isoformat()
+    with db.transaction() as conn:
+        preview, items = _template_preview(conn, template_id, months, down_payments, roster)
+        if skip_existing:
+            preview = preview[preview["action"] == "create"]
+        plan_ids = [
+            _insert_plan(conn, int(sid), items, down_payments, months, template_id, now)
+            for sid in preview["student_id"]
+        ]
+        _recompute_schedules(conn, plan_ids)
+    return plan_ids
+
+
+# --- INSTRUMENTATION (no-op unless DANCE_INSTRUMENT is set) ---
+instrument.instrument_module(globals())
@@ -0,0 +1,70 @@
+import zlib
+
+# --- MINIMAL PDF WRITER ---
+# Just enough PDF for plain text statements: US Letter pages of positioned
+# text in the standard Helvetica fonts (which every viewer has built in), so
+# no font files or third-party libraries are needed. Text is Latin-1; other
+# characters print as "?". Output is deterministic for the same input.
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792  # points
+FONTS = {"regular": "Helvetica", "bold": "Helvetica-Bold"}
+
+
+def _escape(text):
+    text = str(text).encode("latin-1", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _content(items):
+    ops = []
+    font_ids = {name: f"F{i}" for i, name in enumerate(FONTS, 1)}
+    for x, y, text, size, font in items:
+        ops.append(f"BT /{font_ids[font]} {size} Tf {x:.2f} {y:.2f} Td ({_escape(text)}) Tj ET")
+    return zlib.compress("\n".join(ops).encode("latin-1"))
+
+
+def document(pages):
+    """Build a PDF from ``pages``, each a list of ``(x, y, text, size, font)``; returns bytes.
+
+    ``font`` is a key of FONTS; ``x``/``y`` are points from the bottom left.
+    """
+    pages = pages or [[]]
+    objects = []  # body of object n is objects[n - 1]
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(None)
+    page_tree = add(None)
+    fonts = " ".join(
+        f"/F{i} {add(f'<< /Type /Font /Subtype /Type1 /BaseFont /{base} /Encoding /WinAnsiEncoding >>'.encode())} 0 R"
+        for i, base in enumerate(FONTS.values(), 1)
+    )
+    kids = []
+    for items in pages:
+        stream = _content(items)
+        content = add(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            f"<< /Type /Page /Parent {page_tree} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}]"
+            f" /Resources << /Font << {fonts} >> >> /Contents {content} 0 R >>".encode()
+        ))
+    objects[catalog - 1] = f"<< /Type /Catalog /Pages {page_tree} 0 R >>".encode()
+    objects[page_tree - 1] = (
+        f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>".encode()
+    )
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for n, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % n + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(out)
+
+
+def text_width(text, size):
+    # Rough Helvetica advance (about half an em per character), for right alignment.
+    return len(str(text)) * size * 0.5
@@ -0,0 +1,236 @@
+import os
+import sqlite3
+from datetime import date, datetime
+
+import cache
+import db
+import instrument
+import migrations
+from cache import cached, invalidates
+
+# --- SEASONS ---
+# Dances, competitions and plans belong to a season (new rows join the most
+# recently started open season; see migration 9). Archiving a closed season
+# moves its rows, with their memberships, fee rules, items, schedules,
+# payments, balances and a snapshot of the students they mention, into a SQLite file
+# of its own under archive/ beside the database, so the hot tables only hold
+# open seasons. Read functions that take a ``season_id`` call source() to
+# find the rows: main filtered to the season while it is open, or the
+# season's file ATTACHed to the pooled connection on first use once it is
+# archived. Season ids and plan/dance ids are never reused (AUTOINCREMENT),
+# so archived rows keep their ids.
+migrations.migrate()
+
+OPEN, ARCHIVED = "open", "archived"
+MAX_ATTACHED = 8  # SQLite allows 10 attached databases per connection by default
+
+# (table, rows of the season being archived); children before parents so
+# the deletes can run in the same order.
+_PLAN_SCOPE = "plan_id IN (SELECT id FROM main.student_plans WHERE season_id = :sid)"
+ARCHIVE_TABLES = [
+    ("dance_students", "dance_id IN (SELECT id FROM main.dances WHERE season_id = :sid)"),
+    ("dances", "season_id = :sid"),
+    ("competition_students", "competition_id IN (SELECT id FROM main.competitions WHERE season_id = :sid)"),
+    ("fee_rules", "competition_id IN (SELECT id FROM main.competitions WHERE season_id = :sid)"),
+    ("competitions", "season_id = :sid"),
+    ("payments", _PLAN_SCOPE),
+    ("plan_balances", _PLAN_SCOPE),
+    ("plan_schedule", _PLAN_SCOPE),
+    ("plan_items", _PLAN_SCOPE),
+    ("student_plans", "season_id = :sid"),
+]
+# Students are copied but stay in the hot database.
+_STUDENT_SCOPE = (
+    "id IN (SELECT student_id FROM main.dance_students WHERE dance_id IN"
+    " (SELECT id FROM main.dances WHERE season_id = :sid)"
+    " UNION SELECT student_id FROM main.competition_students WHERE competition_id IN"
+    " (SELECT id FROM main.competitions WHERE season_id = :sid)"
+    " UNION SELECT student_id FROM main.student_plans WHERE season_id = :sid)"
+)
+ARCHIVED_TABLES = ("dances", "dance_students", "competitions", "competition_students", "fee_rules",
+                   "student_plans", "plan_items", "plan_schedule", "plan_balances", "payments")
+
+
+def archive_dir():
+    return os.path.join(os.path.dirname(os.path.abspath(db.DB_PATH)), "archive")
+
+
+@cached("seasons")
+def get_seasons():
+    return db.read_sql("SELECT * FROM seasons ORDER BY starts_on DESC, id DESC")
+
+
+@cached("seasons")
+def get_season(season_id):
+    rows = db.query("SELECT id, name, starts_on, ends_on, status, archive_file FROM seasons WHERE id = ?",
+                    (season_id,))
+    return dict(zip(["id", "name", "starts_on", "ends_on", "status", "archive_file"], rows[0])) if rows else None
+
+
+@invalidates("seasons", "dances", "competitions", "student_plans")
+@db.group_commit
+def add_season(name, starts_on, ends_on=None, claim_unassigned=False):
+    """Open a new season; with ``claim_unassigned`` rows that have no season yet join it. Returns the id."""
+    with db.transaction() as conn:
+        season_id = conn.execute("INSERT INTO seasons (name, starts_on, ends_on) VALUES (?, ?, ?)",
+                                 (name, str(starts_on), None if ends_on is None else str(ends_on))).lastrowid
+        if claim_unassigned:
+            for table in ("dances", "competitions", "student_plans"):
+                conn.execute(f"UPDATE {table} SET season_id = ? WHERE season_id IS NULL", (season_id,))
+    return season_id
+
+
+# --- ATTACHED ARCHIVES ---
+# Schema names carry a generation so that after reload_archives() (a backup
+# restore replacing the files) each pooled connection attaches the new file
+# instead of reading the one it attached before.
+_archive_generation = 0
+
+
+def reload_archives():
+    """Make pooled connections re-attach archive files on next use (after they were replaced)."""
+    global _archive_generation
+    _archive_generation += 1
+
+
+def _attach(conn, season):
+    prefix = f"season_{season['id']}_"
+    schema = f"{prefix}{_archive_generation}"
+    attached = [row[1] for row in conn.execute("PRAGMA database_list")]
+    if schema in attached:
+        return schema
+    seasons_attached = [name for name in attached if name.startswith("season_")]
+    stale = [name for name in seasons_attached if name.startswith(prefix)]
+    if len(seasons_attached) >= MAX_ATTACHED:
+        stale = seasons_attached
+    for name in stale:
+        conn.execute(f"DETACH DATABASE {name}")
+    path = os.path.join(archive_dir(), season["archive_file"])
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Archive for season {season['name']!r} is missing: {path}")
+    conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+    return schema
+
+
+def source(conn, season_id, alias=None):
+    """Where ``season_id``'s rows live on ``conn``: ``(schema, condition, params)``.
+
+    ``None`` reads everything in the hot database. An open season is the
+    hot database filtered on season_id (qualified by ``alias``); an archived
+    season is its attached file, unfiltered. Use as
+    ``f"SELECT ... FROM {schema}.dances WHERE {condition}"``.
+    """
+    if season_id is None:
+        return "main", "1", ()
+    season = get_season(season_id)
+    if season is None:
+        raise ValueError(f"No season with id {season_id}")
+    if season["status"] == ARCHIVED:
+        return _attach(conn, season), "1", ()
+    return "main", f"{alias + '.' if alias else ''}season_id = ?", (season_id,)
+
+
+# --- ARCHIVING ---
+def _create_archive(path):
+    # Same tables and indexes as the hot database, minus triggers (FTS and
+    # season defaults do not apply to a frozen season).
+    names = ("students",) + ARCHIVED_TABLES
+    marks = ",".join("?" * len(names))
+    ddl = db.query(
+        f"SELECT sql FROM sqlite_master WHERE type IN ('table', 'index') AND tbl_name IN ({marks})"
+        " AND sql IS NOT NULL ORDER BY type DESC", names
+    )
+    archive = sqlite3.connect(path)
+    try:
+        for (sql,) in ddl:
+            archive.execute(sql)
+        archive.commit()
+    finally:
+        archive.close()
+
+
+def _blockers(conn, season):
+    reasons = []
+    if not season["ends_on"] or season["ends_on"] >= date.today().isoformat():
+        reasons.append(f"it has not ended yet (ends on {season['ends_on'] or 'no date set'})")
+    plans, owed = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(balance_cents), 0) FROM plan_balances WHERE balance_cents > 0"
+        " AND plan_id IN (SELECT id FROM student_plans WHERE season_id = ?)", (season["id"],)
+    ).fetchone()
+    if plans:
+        reasons.append(f"${owed / 100:,.2f} is still owed on {plans} plan(s)")
+    return reasons
+
+
+def archive_blockers(season_id):
+    """Why ``season_id`` cannot be archived yet, as a list of reasons (empty when it can).
+
+    A season can be archived once its end date has passed and nothing is
+    owed on its plans: archived plans leave plan_balances, so balances,
+    overdue lists and record_payment() would no longer see the debt.
+    """
+    season = get_season(season_id)
+    if season is None:
+        raise ValueError(f"No season with id {season_id}")
+    if season["status"] == ARCHIVED:
+        return [f"season {season['name']!r} is already archived"]
+    with db.connection() as conn:
+        return _blockers(conn, season)
+
+
+def archive_season(season_id, vacuum=False):
+    """Move a season's rows into archive/season-<id>.db and mark it archived; returns row counts by table.
+
+    Runs in one transaction, so the season is either wholly in the hot
+    database or wholly in its archive. ``vacuum`` rebuilds the hot database
+    afterwards to return the freed pages to the filesystem. Raises
+    ValueError if the season cannot be archived yet (see archive_blockers).
+    """
+    reasons = archive_blockers(season_id)
+    if reasons:
+        raise ValueError(f"Season {season_id} cannot be archived: {'; '.join(reasons)}")
+    season = get_season(season_id)
+    os.makedirs(archive_dir(), exist_ok=True)
+    filename = f"season-{season_id}.db"
+    path = os.path.join(archive_dir(), filename)
+    if os.path.exists(path):
+        os.remove(path)  # left over from an archive that did not commit
+    _create_archive(path)
+
+    counts = {}
+    params = {"sid": season_id}
+    with db.connection() as conn:
+        # ATTACH is not allowed inside a transaction, so attach first; the
+        # transaction below then runs on this same pooled connection.
+        conn.execute("ATTACH DATABASE ? AS archive_new", (path,))
+        try:
+            with db.transaction():
+                # Re-checked under the write lock: a plan may have been added since.
+                reasons = _blockers(conn, season)
+                if reasons:
+                    raise ValueError(f"Season {season_id} cannot be archived: {'; '.join(reasons)}")
+                conn.execute(f"INSERT INTO archive_new.students SELECT * FROM main.students WHERE {_STUDENT_SCOPE}",
+                             params)
+                for table, scope in ARCHIVE_TABLES:
+                    counts[table] = conn.execute(
+                        f"INSERT INTO archive_new.{table} SELECT * FROM main.{table} WHERE {scope}", params
+                    ).rowcount
+                for table, scope in ARCHIVE_TABLES:
+                    conn.execute(f"DELETE FROM main.{table} WHERE {scope}", params)
+                conn.execute(
+                    "UPDATE seasons SET status = ?, archive_file = ?, archived_at = ? WHERE id = ?",
+                    (ARCHIVED, filename, datetime.now().isoformat(timespec="seconds"), season_id),
+                )
+                db.on_commit(lambda: cache.bump("seasons", "students", *ARCHIVED_TABLES))
+        except BaseException:
+            conn.execute("DETACH DATABASE archive_new")
+            os.remove(path)
+            raise
+        conn.execute("DETACH DATABASE archive_new")
+        if vacuum:
+            conn.execute("VACUUM")
+    return counts
+
+
+# --- INSTRUMENTATION (no-op unless DANCE_INSTRUMENT is set) ---
+instrument.instrument_module(globals())
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import db
+import instrument
+import pdf
+
+# --- PLAN STATEMENTS ---
+# One PDF per saved plan: the student, the plan's items and down payments,
+# the installment schedule with what has been paid, and the balance. Files
+# are cached beside the database under a name that includes a hash of
+# everything printed on the statement, so a studio-wide batch only renders
+# plans whose items, schedule or payments changed. Rendering is pure
+# Python (see pdf.py) and needs no database access, so batches fan out to a
+# process pool with the data already loaded.
+LAYOUT_VERSION = 1  # bump when the layout changes to invalidate cached files
+BATCH_INLINE_MAX = 8  # up to this many plans are rendered without a pool
+RENDER_CHUNK = 50  # plans per pool task
+MARGIN = 54
+LINE = 14
+TITLE = "EDOT Company Manager"
+
+
+def _cache_dir():
+    folder = os.path.join(os.path.dirname(os.path.abspath(db.DB_PATH)), "statements")
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _load(plan_ids=None):
+    """{plan_id: statement data} for ``plan_ids`` (every plan when None), in four queries."""
+    with db.connection() as conn:
+        if plan_ids is None:
+            scope = "SELECT id FROM student_plans"
+        else:
+            db.fill_temp_ids(conn, "statement_scope", plan_ids)
+            scope = "SELECT id FROM statement_scope"
+        plans = {}
+        for row in conn.execute(
+            "SELECT p.id, p.student_id, s.first_name, s.last_name, p.created_at, p.months,"
+            " b.charged_cents, b.down_cents, b.paid_cents, b.balance_cents"
+            " FROM student_plans p"
+            " LEFT JOIN students s ON s.id = p.student_id"
+            " LEFT JOIN plan_balances b ON b.plan_id = p.id"
+            f" WHERE p.id IN ({scope}) ORDER BY p.id"
+        ):
+            plan_id, student_id, first, last, created_at, months, charged, down, paid, balance = row
+            plans[plan_id] = {
+                "plan_id": plan_id, "student_id": student_id, "student": f"{first or ''} {last or ''}".strip(),
+                "created_at": created_at, "months": months, "charged_cents": charged or 0,
+                "down_cents": down or 0, "paid_cents": paid or 0, "balance_cents": balance or 0,
+                "items": [], "schedule": [], "payments": [],
+            }
+        for plan_id, name, price, item_type in conn.execute(
+            f"SELECT plan_id, name, price, item_type FROM plan_items WHERE plan_id IN ({scope})"
+            " ORDER BY plan_id, id"
+        ):
+            plans[plan_id]["items"].append([name, item_type, round(price * 100)])
+        for plan_id, installment, due_date, amount in conn.execute(
+            f"SELECT plan_id, installment, due_date, amount_cents FROM plan_schedule WHERE plan_id IN ({scope})"
+            " ORDER BY plan_id, installment"
+        ):
+            plans[plan_id]["schedule"].append([installment, due_date, amount])
+        for plan_id, paid_on, amount, method in conn.execute(
+            f"SELECT plan_id, paid_on, amount_cents, method FROM payments WHERE plan_id IN ({scope})"
+            " ORDER BY plan_id, paid_on, id"
+        ):
+            plans[plan_id]["payments"].append([paid_on, amount, method])
+    return plans
+
+
+def content_hash(statement):
+    payload = json.dumps([LAYOUT_VERSION, statement], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _path(statement):
+    return os.path.join(_cache_dir(), f"plan-{statement['plan_id']}-{content_hash(statement)[:16]}.pdf")
+
+
+# --- LAYOUT ---
+def _money(cents):
+    return f"${cents / 100:,.2f}"
+
+
+def render_pdf(statement):
+    """Lay out one statement; returns the PDF bytes."""
+    pages = [[]]
+    y = pdf.PAGE_HEIGHT - MARGIN
+
+    def text(x, value, size=10, font="regular", right=False):
+        if right:
+            x -= pdf.text_width(value, size)
+        pages[-1].append((x, y, value, size, font))
+
+    def advance(lines=1):
+        nonlocal y
+        y -= LINE * lines
+        if y < MARGIN:
+            pages.append([])
+            y = pdf.PAGE_HEIGHT - MARGIN
+
+    right_edge = pdf.PAGE_WIDTH - MARGIN
+    text(MARGIN, TITLE, 16, "bold")
+    advance(1.6)
+    text(MARGIN, "Payment Plan Statement", 12, "bold")
+    text(right_edge, f"Plan #{statement['plan_id']}", 12, "bold", right=True)
+    advance(1.5)
+    text(MARGIN, f"Student: {statement['student']}")
+    advance()
+    text(MARGIN, f"Created: {(statement['created_at'] or '')[:10]}")
+    text(MARGIN + 200, f"Months: {statement['months'] or '-'}")
+    advance(2)
+
+    text(MARGIN, "Items", 11, "bold")
+    advance()
+    for name, item_type, cents in statement["items"]:
+        text(MARGIN, item_type)
+        text(MARGIN + 160, name)
+        text(right_edge, _money(cents), right=True)
+        advance()
+    advance(0.5)
+    for label, cents in [("Total charged", statement["charged_cents"]), ("Down payments", statement["down_cents"]),
+                         ("Payments received", statement["paid_cents"]), ("Balance due", statement["balance_cents"])]:
+        text(MARGIN + 160, label, font="bold" if label == "Balance due" else "regular")
+        text(right_edge, _money(cents), font="bold" if label == "Balance due" else "regular", right=True)
+        advance()
+    advance()
+
+    if statement["schedule"]:
+        text(MARGIN, "Installments", 11, "bold")
+        advance()
+        covered = statement["paid_cents"]
+        for installment, due_date, cents in statement["schedule"]:
+            covered -= cents
+            text(MARGIN, f"{installment}.")
+            text(MARGIN + 30, due_date)
+            text(MARGIN + 160, "paid" if covered >= 0 else "")
+            text(right_edge, _money(cents), right=True)
+            advance()
+        advance()
+
+    if statement["payments"]:
+        text(MARGIN, "Payments", 11, "bold")
+        advance()
+        for paid_on, cents, method in statement["payments"]:
+            text(MARGIN, paid_on)
+            text(MARGIN + 160, method or "")
+            text(right_edge, _money(cents), right=True)
+            advance()
+    return pdf.document(pages)
+
+
+def _render_file(statement, path):
+    # Runs in pool workers: write to a temp name and rename, so a cache hit
+    # never sees a half-written file.
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(render_pdf(statement))
+    os.replace(tmp, path)
+    return path
+
+
+def _render_files(jobs):
+    for statement, path in jobs:
+        _render_file(statement, path)
+    return len(jobs)
+
+
+def _prune(paths):
+    # Drop older renderings of the plans just rendered.
+    keep = {os.path.basename(p) for p in paths.values()}
+    prefixes = tuple(f"plan-{plan_id}-" for plan_id in paths)
+    folder = _cache_dir()
+    for name in os.listdir(folder):
+        if name.startswith(prefixes) and name.endswith(".pdf") and name not in keep:
+            os.remove(os.path.join(folder, name))
+
+
+# --- RENDERING ---
+def render_statement(plan_id):
+    """Path to the plan's statement PDF, rendering it only if its content changed. None if no such plan."""
+    statement = _load([plan_id]).get(plan_id)
+    if statement is None:
+        return None
+    path = _path(statement)
+    if not os.path.exists(path):
+        _render_file(statement, path)
+        _prune({plan_id: path})
+    return path
+
+
+def render_statements(plan_ids=None, workers=None, progress=None):
+    """Statement PDFs for ``plan_ids`` (every plan when None); returns ``({plan_id: path}, rendered)``.
+
+    Only plans whose cached file is missing or out of date are rendered,
+    across a process pool when there are more than BATCH_INLINE_MAX of them.
+    ``progress(done, total)`` is called as renders finish.
+    """
+    statements = _load(plan_ids)
+    paths = {plan_id: _path(s) for plan_id, s in statements.items()}
+    todo = [plan_id for plan_id, path in paths.items() if not os.path.exists(path)]
+    if len(todo) <= BATCH_INLINE_MAX:
+        for done, plan_id in enumerate(todo, 1):
+            _render_file(statements[plan_id], paths[plan_id])
+            if progress is not None:
+                progress(done, len(todo))
+    else:
+        # spawn, not fork: the parent runs Streamlit and pool threads.
+        context = multiprocessing.get_context("spawn")
+        work = [(statements[plan_id], paths[plan_id]) for plan_id in todo]
+        done = 0
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [pool.submit(_render_files, work[i:i + RENDER_CHUNK])
+                       for i in range(0, len(work), RENDER_CHUNK)]
+            for future in as_completed(futures):
+                done += future.result()
+                if progress is not None:
+                    progress(done, len(todo))
+    _prune({plan_id: paths[plan_id] for plan_id in todo})
+    return paths, todo
+
+
+def bundle(paths, out=None):
+    """Zip statement files into ``out`` (a fresh name beside the database by default); returns the path."""
+    import zipfile
+
+    # Unique per bundle, so two jobs on the same day never write one file.
+    out = out or os.path.join(_cache_dir(), f"statements-{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}.zip")
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as zf:
+        for plan_id, path in sorted(paths.items()):
+            zf.write(path, f"plan-{plan_id}.pdf")
+    return out
+
+
+# --- INSTRUMENTATION (no-op unless DANCE_INSTRUMENT is set) ---
+instrument.instrument_module(globals())
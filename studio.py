@@ -0,0 +1,508 @@
+import json
+import threading
+from array import array
+
+import pandas as pd
+
+import cache
+import db
+import instrument
+import migrations
+import seasons
+from cache import cached, invalidates
+
+# --- SCHEMA ---
+migrations.migrate()
+
+
+# --- STUDENT FUNCTIONS ---
+@invalidates("students")
+@db.group_commit
+def add_student(first, last, dob):
+    return db.execute("INSERT INTO students (first_name, last_name, dob) VALUES (?, ?, ?)",
+                      (first, last, dob))
+
+@invalidates("students")
+@db.group_commit
+def update_student(sid, first, last, dob):
+    db.execute("UPDATE students SET first_name=?, last_name=?, dob=? WHERE id=?",
+               (first, last, dob, sid))
+
+@invalidates("students", "dance_students", "competition_students")
+@db.group_commit
+def delete_student(sid):
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM dance_students WHERE student_id=?", (sid,))
+        conn.execute("DELETE FROM competition_students WHERE student_id=?", (sid,))
+        conn.execute("DELETE FROM students WHERE id=?", (sid,))
+
+@cached("students")
+def get_all_students():
+    return db.rows("SELECT * FROM students ORDER BY last_name, first_name")
+
+@cached("students")
+def get_student(sid):
+    rows = db.query("SELECT id, first_name, last_name, dob FROM students WHERE id=?", (sid,))
+    return dict(zip(["id", "first_name", "last_name", "dob"], rows[0])) if rows else None
+
+@cached("students")
+def count_students():
+    return db.query("SELECT COUNT(*) FROM students")[0][0]
+
+def get_student_labels(ids=None):
+    """id -> "Last, First", ordered by name; all students, or only ``ids``."""
+    return student_directory().label_map(ids)
+
+
+# --- STUDENT SUMMARY ---
+_SUMMARY_TABLES = ("students", "dances", "dance_students", "competitions", "competition_students", "plan_balances")
+
+def _summary_record(row):
+    (sid, first, last, dob, dances, comps, plans, charged, received, balance, next_due) = row
+    return {
+        "id": sid, "first_name": first, "last_name": last, "dob": dob,
+        "dances": [{"id": i, "name": n, "type": t} for i, n, t in json.loads(dances)],
+        "competitions": [{"id": i, "name": n, "has_convention": bool(c)} for i, n, c in json.loads(comps)],
+        "plans": plans, "charged_cents": charged, "received_cents": received,
+        "balance_cents": balance, "next_due_date": next_due,
+    }
+
+@cached(*_SUMMARY_TABLES)
+def get_student_summary(sid):
+    """Everything the profile shows about a student, from one read of the student_summary view.
+
+    A dict with the student's fields, ``dances`` (id, name, type) and
+    ``competitions`` (id, name, has_convention) lists, and plan totals in
+    cents; None if there is no such student.
+    """
+    rows = db.query("SELECT * FROM student_summary WHERE student_id = ?", (sid,))
+    return _summary_record(rows[0]) if rows else None
+
+@cached(*_SUMMARY_TABLES)
+def get_student_summaries():
+    """The student_summary view for every student, by name, as a roster report DataFrame."""
+    rows = db.query("SELECT * FROM student_summary ORDER BY last_name, first_name")
+    return pd.DataFrame([_summary_record(row) for row in rows],
+                        columns=["id", "first_name", "last_name", "dob", "dances", "competitions", "plans",
+                                 "charged_cents", "received_cents", "balance_cents", "next_due_date"])
+
+@cached(*_SUMMARY_TABLES)
+def get_roster_report():
+    """get_student_summaries() flattened for display: names joined, balance in dollars."""
+    summaries = get_student_summaries()
+    return pd.DataFrame({
+        "last_name": summaries.last_name, "first_name": summaries.first_name, "dob": summaries.dob,
+        "dances": summaries.dances.map(lambda ds: ", ".join(d['name'] for d in ds)),
+        "competitions": summaries.competitions.map(lambda cs: ", ".join(c['name'] for c in cs)),
+        "plans": summaries.plans, "balance": summaries.balance_cents / 100,
+        "next_due": summaries.next_due_date,
+    })
+
+@cached(*_SUMMARY_TABLES)
+def get_roster_report_csv():
+    return get_roster_report().to_csv(index=False)
+
+
+# --- STUDENT DIRECTORY ---
+# One process-wide snapshot of every student's id and "Last, First" label in
+# name order, with dict indexes both ways. Label lookups and pickers read it
+# instead of querying; it is rebuilt with a single query the first time it
+# is asked for after the students generation changes (see cache.py).
+class StudentDirectory:
+    __slots__ = ("generation", "ids", "labels", "position", "by_label")
+
+    def __init__(self, generation, rows):
+        self.generation = generation
+        self.ids = array("q", [sid for sid, _ in rows])
+        self.labels = [label for _, label in rows]
+        self.position = {sid: i for i, sid in enumerate(self.ids)}
+        self.by_label = dict(zip(self.labels, self.ids))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def label(self, sid):
+        i = self.position.get(sid)
+        return None if i is None else self.labels[i]
+
+    def label_map(self, ids=None):
+        """id -> label in name order, for every student or just the known ones among ``ids``."""
+        if ids is None:
+            return dict(zip(self.ids, self.labels))
+        found = sorted({self.position[sid] for sid in ids if sid in self.position})
+        return {self.ids[i]: self.labels[i] for i in found}
+
+
+_directory = None
+_directory_lock = threading.Lock()
+
+def student_directory():
+    """The current StudentDirectory; shared between sessions, so treat it as read-only."""
+    global _directory
+    # Read the generation before querying, as cached() does, so a write that
+    # commits mid-build triggers another rebuild on the next call.
+    gen = cache.generation("students")
+    directory = _directory
+    if directory is None or directory.generation != gen:
+        with _directory_lock:
+            if _directory is None or _directory.generation != gen:
+                rows = db.query("SELECT id, last_name || ', ' || first_name FROM students"
+                                " ORDER BY last_name, first_name")
+                _directory = StudentDirectory(gen, rows)
+            directory = _directory
+    return directory
+
+
+# --- STUDENT SEARCH ---
+def _fts_query(text):
+    # Every word must prefix-match a first or last name: "an smi" -> "an"* AND "smi"*
+    words = text.replace('"', " ").split()
+    return " AND ".join(f'"{w}"*' for w in words)
+
+@cached("students")
+def search_students(text, limit=25, offset=0):
+    """Typeahead search over student names using the students_fts index.
+
+    Returns ``(matches, total)`` where matches is a list of
+    ``(id, "Last, First")`` for one page of results, best match first. An
+    empty search pages through the whole roster alphabetically.
+    """
+    match = _fts_query(text or "")
+    if not match:
+        rows = db.query(
+            "SELECT id, last_name || ', ' || first_name FROM students"
+            " ORDER BY last_name, first_name LIMIT ? OFFSET ?", (limit, offset)
+        )
+        return rows, count_students()
+    rows = db.query(
+        "SELECT s.id, s.last_name || ', ' || s.first_name FROM students_fts f"
+        " JOIN students s ON s.id = f.rowid"
+        " WHERE students_fts MATCH ?"
+        " ORDER BY f.rank, s.last_name, s.first_name LIMIT ? OFFSET ?", (match, limit, offset)
+    )
+    total = db.query("SELECT COUNT(*) FROM students_fts WHERE students_fts MATCH ?", (match,))[0][0]
+    return rows, total
+
+
+# --- BULK STUDENT IMPORT ---
+IMPORT_CHUNK_SIZE = 1000
+STUDENT_CSV_COLUMNS = ["first", "last", "dob"]
+
+def _student_key(first, last, dob):
+    return (first.strip().lower(), last.strip().lower(), dob)
+
+def _existing_students(conn, last_names):
+    # One query per chunk instead of one per row. The names go through a temp
+    # table (no parameter limit, unlike an IN list), and CROSS JOIN keeps it
+    # as the outer loop so each name is a lookup in idx_students_name_dob.
+    if not last_names:
+        return {}
+    db.fill_temp_names(conn, "import_names", last_names)
+    rows = conn.execute(
+        "SELECT s.id, s.first_name, s.last_name, s.dob FROM import_names n"
+        " CROSS JOIN students s ON s.last_name COLLATE NOCASE = n.name"
+    ).fetchall()
+    return {_student_key(f, l, d): sid for sid, f, l, d in rows}
+
+@invalidates("students")
+def import_students(csv_file, on_duplicate="skip", chunksize=IMPORT_CHUNK_SIZE, progress=None):
+    """Import a students CSV (first, last, dob columns) in chunks.
+
+    Each chunk is written with executemany in a single transaction. Rows
+    matching an existing student on name (case-insensitive) and date of birth
+    are skipped, or with ``on_duplicate="update"`` overwrite that student's
+    spelling. ``progress(rows_done)`` is called after each chunk commits; an
+    exception it raises stops the import there. Returns a per-row report
+    DataFrame with a ``status`` of added, updated, duplicate or rejected.
+    """
+    if on_duplicate not in ("skip", "update"):
+        raise ValueError(f"on_duplicate must be 'skip' or 'update', not {on_duplicate!r}")
+    report = []
+    for chunk in pd.read_csv(csv_file, chunksize=chunksize, dtype=str, keep_default_na=False):
+        missing = [col for col in STUDENT_CSV_COLUMNS if col not in chunk.columns]
+        if missing:
+            raise ValueError(f"CSV is missing column(s): {', '.join(missing)}")
+        first = chunk["first"].str.strip()
+        last = chunk["last"].str.strip()
+        dob = pd.to_datetime(chunk["dob"].str.strip(), errors="coerce", format="mixed").dt.strftime("%Y-%m-%d")
+        # Line numbers as they appear in the file (header is line 1).
+        lines = chunk.index + 2
+
+        inserts, updates = [], []
+        with db.transaction() as conn:
+            existing = _existing_students(conn, set(last[last != ""]))
+            for line, f, l, d in zip(lines, first, last, dob):
+                entry = {"line": line, "first": f, "last": l, "dob": d if isinstance(d, str) else None}
+                if not f or not l:
+                    entry.update(status="rejected", message="first and last name are required")
+                elif not isinstance(d, str):
+                    entry.update(status="rejected", message="dob is missing or not a date")
+                else:
+                    key = _student_key(f, l, d)
+                    if key in existing:
+                        if on_duplicate == "update" and existing[key] is not None:
+                            updates.append((f, l, d, existing[key]))
+                            entry.update(status="updated", message=f"student id {existing[key]}")
+                            existing[key] = None
+                        else:
+                            entry.update(status="duplicate", message="already on the roster")
+                    else:
+                        # None marks a student already written by this chunk.
+                        existing[key] = None
+                        inserts.append((f, l, d))
+                        entry.update(status="added", message="")
+                report.append(entry)
+            conn.executemany("INSERT INTO students (first_name, last_name, dob) VALUES (?, ?, ?)", inserts)
+            conn.executemany("UPDATE students SET first_name=?, last_name=?, dob=? WHERE id=?", updates)
+        if progress is not None:
+            progress(len(report))
+    return pd.DataFrame(report, columns=["line", "first", "last", "dob", "status", "message"])
+
+
+# --- MEMBERSHIP DIFFS ---
+# Roster edits write only the difference against current membership: one
+# read of the existing rows, then executemany deletes and inserts for the
+# students that actually left or joined. An unchanged roster writes nothing.
+def _sync_members(conn, table, owner_col, rosters):
+    """Make each ``rosters[owner_id]`` the exact membership in ``table``; returns {owner_id: (added, removed)}."""
+    db.fill_temp_ids(conn, "member_scope", list(rosters))
+    current = {owner_id: set() for owner_id in rosters}
+    for owner_id, sid in conn.execute(
+        f"SELECT {owner_col}, student_id FROM {table} WHERE {owner_col} IN (SELECT id FROM member_scope)"
+    ):
+        current[owner_id].add(sid)
+    additions, removals, changes = [], [], {}
+    for owner_id, student_ids in rosters.items():
+        wanted = {int(sid) for sid in student_ids}
+        added, removed = wanted - current[owner_id], current[owner_id] - wanted
+        additions += [(owner_id, sid) for sid in sorted(added)]
+        removals += [(owner_id, sid) for sid in sorted(removed)]
+        changes[owner_id] = (len(added), len(removed))
+    conn.executemany(f"DELETE FROM {table} WHERE {owner_col}=? AND student_id=?", removals)
+    conn.executemany(f"INSERT INTO {table} ({owner_col}, student_id) VALUES (?, ?)", additions)
+    return changes
+
+
+# --- DANCE FUNCTIONS ---
+@invalidates("dances", "dance_students")
+@db.group_commit
+def add_dance(name, dtype, student_ids):
+    with db.transaction() as conn:
+        did = conn.execute("INSERT INTO dances (name, type) VALUES (?, ?)", (name, dtype)).lastrowid
+        conn.executemany("INSERT OR IGNORE INTO dance_students (dance_id, student_id) VALUES (?, ?)",
+                         [(did, sid) for sid in student_ids])
+    return did
+
+@invalidates("dances", "dance_students")
+@db.group_commit
+def update_dance(did, name, student_ids):
+    """Rename a dance and set its members; returns (added, removed) member counts."""
+    return update_dances([(did, name, student_ids)])[did]
+
+@invalidates("dances", "dance_students")
+def update_dances(dances):
+    """Update many ``(dance_id, name, student_ids)`` in one transaction.
+
+    A ``name`` of None keeps the current name. Only membership changes are
+    written. Returns {dance_id: (added, removed)}.
+    """
+    dances = [(int(did), name, student_ids) for did, name, student_ids in dances]
+    with db.transaction() as conn:
+        conn.executemany("UPDATE dances SET name=? WHERE id=?",
+                         [(name, did) for did, name, _ in dances if name is not None])
+        return _sync_members(conn, "dance_students", "dance_id",
+                             {did: student_ids for did, _, student_ids in dances})
+
+@invalidates("dances", "dance_students")
+@db.group_commit
+def delete_dance(did):
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM dance_students WHERE dance_id=?", (did,))
+        conn.execute("DELETE FROM dances WHERE id=?", (did,))
+
+@cached("dances", "seasons")
+def get_all_dances(season_id=None):
+    with db.connection() as conn:
+        schema, cond, params = seasons.source(conn, season_id)
+        return db.read_sql(f"SELECT * FROM {schema}.dances WHERE {cond} ORDER BY type, name", params)
+
+@cached("students", "dance_students")
+def get_students_for_dance(did):
+    return db.rows(
+        "SELECT s.first_name || ' ' || s.last_name AS name FROM students s"
+        " JOIN dance_students ds ON s.id=ds.student_id"
+        " WHERE ds.dance_id=?", (did,)
+    )
+
+@cached("dances", "dance_students")
+def get_dances_for_student(sid):
+    return db.rows(
+        "SELECT d.name AS name, d.type AS type FROM dances d"
+        " JOIN dance_students ds ON d.id=ds.dance_id"
+        " WHERE ds.student_id=?", (sid,)
+    )
+
+# Unit separator: cannot appear in names typed into the app or a CSV.
+_SEP = "\x1f"
+
+@cached("dances", "dance_students", "students", "seasons")
+def get_dance_rosters(season_id=None):
+    """Every dance with its members, in one aggregated query.
+
+    Returns a DataFrame ordered by type and name with columns id, name, type,
+    member_ids, member_names ("First Last") and member_labels ("Last, First");
+    the member columns hold lists sorted by last then first name. With a
+    ``season_id`` only that season's dances, archived or not.
+    """
+    with db.connection() as conn:
+        schema, cond, params = seasons.source(conn, season_id, "d")
+        rows = db.query(
+            "SELECT d.id, d.name, d.type,"
+            " GROUP_CONCAT(s.id, char(31)),"
+            " GROUP_CONCAT(s.first_name, char(31)),"
+            " GROUP_CONCAT(s.last_name, char(31))"
+            f" FROM {schema}.dances d"
+            f" LEFT JOIN {schema}.dance_students ds ON ds.dance_id = d.id"
+            f" LEFT JOIN {schema}.students s ON s.id = ds.student_id"
+            f" WHERE {cond}"
+            " GROUP BY d.id ORDER BY d.type, d.name", params
+        )
+    records = []
+    for did, name, dtype, sids, firsts, lasts in rows:
+        if sids is None:
+            members = []
+        else:
+            members = sorted(
+                zip(lasts.split(_SEP), firsts.split(_SEP), map(int, str(sids).split(_SEP)))
+            )
+        records.append((
+            did, name, dtype,
+            [sid for _, _, sid in members],
+            [f"{first} {last}" for last, first, _ in members],
+            [f"{last}, {first}" for last, first, _ in members],
+        ))
+    return pd.DataFrame(records, columns=["id", "name", "type", "member_ids", "member_names", "member_labels"])
+
+
+# --- BULK DANCE IMPORT ---
+DANCE_CSV_META_COLUMNS = ["dancetype", "dancename", "type", "name"]
+
+def get_student_label_index():
+    # "Last, First" -> id, the label format used by the CSVs and the pickers.
+    return student_directory().by_label
+
+def _coalesce_columns(df, columns):
+    # First non-empty value across the given columns, like row.get(a) or row.get(b).
+    values = pd.Series("", index=df.index)
+    for col in reversed(columns):
+        if col in df.columns:
+            values = df[col].where(df[col] != "", values)
+    return values
+
+@invalidates("dances", "dance_students")
+def import_dances(csv_file):
+    """Import a dances CSV in one transaction.
+
+    The CSV has a dancetype/type column, a dancename/name column, and any
+    number of member columns holding "Last, First" student labels. All labels
+    are resolved in one vectorized pass against a single label index, then
+    ``dances`` and ``dance_students`` are bulk inserted with executemany.
+    Returns ``(report, unknown_labels)``: a per-dance report DataFrame and the
+    sorted list of labels that matched no student.
+    """
+    df = pd.read_csv(csv_file, dtype=str, keep_default_na=False)
+    df = df.apply(lambda col: col.str.strip())
+    dances = pd.DataFrame({
+        "line": df.index + 2,
+        "name": _coalesce_columns(df, ["dancename", "name"]),
+        "type": _coalesce_columns(df, ["dancetype", "type"]),
+    })
+    valid = (dances["name"] != "") & (dances["type"] != "")
+
+    member_cols = [col for col in df.columns if col not in DANCE_CSV_META_COLUMNS]
+    members = (
+        df.loc[valid, member_cols]
+        .melt(ignore_index=False, value_name="label")["label"]
+    )
+    members = members[members != ""]
+    student_ids = members.map(get_student_label_index())
+    unknown = sorted(members[student_ids.isna()].unique())
+    members = student_ids.dropna().astype(int)
+
+    to_insert = dances[valid]
+    with db.transaction() as conn:
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM dances").fetchone()[0]
+        conn.executemany("INSERT INTO dances (name, type) VALUES (?, ?)",
+                         to_insert[["name", "type"]].itertuples(index=False, name=None))
+        # The write lock is held for the whole transaction, so the new ids are
+        # exactly the ones above last_id, in insertion order.
+        new_ids = [r[0] for r in conn.execute("SELECT id FROM dances WHERE id > ? ORDER BY id", (last_id,))]
+        dance_ids = pd.Series(new_ids, index=to_insert.index, dtype="int64")
+        pairs = pd.DataFrame({"dance_id": dance_ids.reindex(members.index).values, "student_id": members.values})
+        conn.executemany("INSERT OR IGNORE INTO dance_students (dance_id, student_id) VALUES (?, ?)",
+                         pairs.drop_duplicates().itertuples(index=False, name=None))
+
+    dances["members"] = members.groupby(level=0).nunique().reindex(dances.index, fill_value=0)
+    dances["status"] = "added"
+    dances["message"] = ""
+    dances.loc[~valid, "status"] = "rejected"
+    dances.loc[~valid, "message"] = "dance name and type are required"
+    return dances, unknown
+
+
+# --- COMPETITION FUNCTIONS ---
+@invalidates("competitions", "competition_students")
+@db.group_commit
+def add_competition(name, has_conv, student_ids):
+    with db.transaction() as conn:
+        cid = conn.execute("INSERT INTO competitions (name, has_convention) VALUES (?, ?)",
+                           (name, has_conv)).lastrowid
+        conn.executemany("INSERT OR IGNORE INTO competition_students (competition_id, student_id) VALUES (?, ?)",
+                         [(cid, sid) for sid in student_ids])
+    return cid
+
+@invalidates("competitions", "competition_students")
+@db.group_commit
+def update_competition(cid, name, has_conv, student_ids):
+    """Update a competition and set its members; returns (added, removed) member counts."""
+    with db.transaction() as conn:
+        conn.execute(
+            "UPDATE competitions SET name=?, has_convention=? WHERE id=?",
+            (name, has_conv, cid),
+        )
+        return _sync_members(conn, "competition_students", "competition_id", {cid: student_ids})[cid]
+
+@invalidates("competitions", "competition_students", "fee_rules")
+@db.group_commit
+def delete_competition(cid):
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM fee_rules WHERE competition_id=?", (cid,))
+        conn.execute("DELETE FROM competition_students WHERE competition_id=?", (cid,))
+        conn.execute("DELETE FROM competitions WHERE id=?", (cid,))
+
+@cached("competitions", "seasons")
+def get_all_competitions(season_id=None):
+    with db.connection() as conn:
+        schema, cond, params = seasons.source(conn, season_id)
+        return db.read_sql(f"SELECT * FROM {schema}.competitions WHERE {cond} ORDER BY name", params)
+
+# Fetch students for a competition
+@cached("students", "competition_students")
+def get_students_for_competition(comp_id):
+    return db.rows(
+        "SELECT s.id, s.first_name || ' ' || s.last_name AS name FROM students s"
+        " JOIN competition_students cs ON s.id = cs.student_id"
+        " WHERE cs.competition_id = ?", (comp_id,)
+    )
+
+@cached("competitions", "competition_students")
+def get_competitions_for_student(sid):
+    return db.rows(
+        "SELECT c.name AS name FROM competitions c"
+        " JOIN competition_students cs ON c.id = cs.competition_id"
+        " WHERE cs.student_id = ?", (sid,)
+    )
+
+
+# --- INSTRUMENTATION (no-op unless DANCE_INSTRUMENT is set) ---
+instrument.instrument_module(globals())
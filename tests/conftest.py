@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Set before any app module is imported: several migrate the configured
+# database at import time.
+os.environ.setdefault("DANCE_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="dance-tests-"), "dance.db"))
+
+
+@pytest.fixture(scope="session")
+def studio_db(tmp_path_factory):
+    """A small synthetic studio database (see bench/datagen.py); returns its path."""
+    from bench import datagen
+
+    path = str(tmp_path_factory.mktemp("studio") / "dance.db")
+    datagen.generate(path, **datagen.SCALES["small"])
+    return path
+
+
+def _use_database(path):
+    # Point the pool at ``path`` and drop every cached read (generations are
+    # per process, not per file, so bump them all).
+    import cache
+    import db
+    import migrations
+
+    db.configure(path)
+    migrations.migrate()
+    tables = [r[0] for r in db.query("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    cache.bump(*tables)
+    cache.clear()
+
+
+@pytest.fixture
+def empty_db(tmp_path):
+    """A freshly migrated, empty database for the duration of one test; returns its path."""
+    import db
+
+    previous = db.DB_PATH
+    path = str(tmp_path / "dance.db")
+    _use_database(path)
+    yield path
+    _use_database(previous)
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+import backup
+import db
+
+
+def test_restore_keeps_the_snapshot_it_restores(studio_db, monkeypatch):
+    monkeypatch.setattr(backup, "BACKUP_KEEP", 2)
+    for old in backup.list_snapshots():
+        os.remove(old["path"])
+    oldest = os.path.basename(backup.snapshot(label="oldest"))
+    backup.snapshot(label="newer")
+
+    before = backup.restore(oldest)
+
+    names = [s["name"] for s in backup.list_snapshots()]
+    assert oldest in names
+    assert os.path.basename(before) in names
+    assert db.query("PRAGMA quick_check")[0][0] == "ok"
+
+
+def test_snapshots_with_the_same_label_do_not_overwrite_each_other(studio_db):
+    first = backup.snapshot(label="twin")
+    second = backup.snapshot(label="twin")
+
+    assert first != second
+    assert os.path.exists(first) and os.path.exists(second)
+
+
+def test_restore_brings_back_season_archives(empty_db):
+    import payment_plan
+    import seasons
+    import studio
+
+    season_id = seasons.add_season("2023-24", "2023-09-01", "2024-06-30")
+    sid = studio.add_student("Archived", "Dancer", "2011-01-01")
+    plan_id = payment_plan.save_plan(sid, [("Annual Tuition", 500.0, "Tuition")], [500.0], 6)
+    seasons.archive_season(season_id)
+    name = os.path.basename(backup.snapshot(label="archived"))
+    assert backup.list_snapshots()[0]["archives"] == [f"season-{season_id}.db"]
+
+    live_archive = os.path.join(seasons.archive_dir(), f"season-{season_id}.db")
+    os.remove(live_archive)
+    with pytest.warns(UserWarning, match="missing"):  # from the pre-restore snapshot
+        backup.restore(name)
+
+    assert os.path.exists(live_archive)
+
+    plans = payment_plan.get_student_plans(sid, season_id)
+    assert list(plans["id"]) == [plan_id]
@@ -0,0 +1,34 @@
+import db
+from bench import datagen, run
+
+TINY = {"students": 40, "dance_memberships": 120, "competitions": 2, "plan_items": 200}
+
+
+def test_generated_database_has_the_requested_scale(empty_db, tmp_path):
+    counts = datagen.generate(str(tmp_path / "tiny.db"), **TINY)
+
+    assert counts["students"] == db.query("SELECT COUNT(*) FROM students")[0][0] == 40
+    assert counts["competitions"] == 2
+    assert counts["dance_students"] >= 120 and counts["plan_items"] >= 200
+    assert counts["plan_schedule"] == db.query("SELECT SUM(months) FROM student_plans")[0][0]
+
+
+def test_generation_is_repeatable_for_a_seed(empty_db, tmp_path):
+    first = datagen.generate(str(tmp_path / "a.db"), **TINY)
+    names = db.query("SELECT first_name, last_name, dob FROM students ORDER BY id")
+    second = datagen.generate(str(tmp_path / "b.db"), **TINY)
+
+    assert second == first
+    assert db.query("SELECT first_name, last_name, dob FROM students ORDER BY id") == names
+
+
+def test_compare_flags_regressions_past_the_threshold():
+    baseline = {"timings": {"a": {"median_ms": 10.0}, "b": {"median_ms": 10.0}, "c": {"median_ms": 10.0}},
+                "allocations": {"a": {"peak_kib": 100.0}}}
+    current = {"timings": {"a": {"median_ms": 13.0}, "b": {"median_ms": 7.0}, "c": {"median_ms": 11.0},
+                           "new": {"median_ms": 1.0}},
+               "allocations": {"a": {"peak_kib": 100.0}}}
+
+    flags = {name: flag for name, _, _, _, flag in run.compare(baseline, current)}
+
+    assert flags == {"a": "slower", "b": "faster", "c": "", "a [KiB]": ""}
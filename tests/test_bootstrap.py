@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+
+import bootstrap
+import migrations
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _Section(dict):
+    def to_dict(self):
+        return dict(self)
+
+
+SECRETS = {
+    "credentials": _Section(usernames={"owner": {"name": "Owner", "password": "x"}}),
+    "cookie": _Section(name="dance", key="k", expiry_days=1),
+}
+
+
+def test_init_runs_once_per_process(empty_db, monkeypatch):
+    calls = []
+    migrate = migrations.migrate
+    monkeypatch.setattr(migrations, "migrate", lambda: calls.append(1) or migrate())
+    monkeypatch.setattr(bootstrap, "_config", None)
+
+    config = bootstrap.init(SECRETS)
+
+    assert config["cookie"]["name"] == "dance"
+    assert bootstrap.init(SECRETS) is config
+    assert calls == [1]
+    assert set(bootstrap.timings) >= {"secrets", "migrate", "connect", "recover jobs"}
+
+
+def test_bootstrap_does_not_load_pandas_or_the_data_modules(tmp_path):
+    env = dict(os.environ, DANCE_DB_PATH=str(tmp_path / "dance.db"))
+    loaded = subprocess.run(
+        [sys.executable, "-c", "import sys, bootstrap;"
+         " print(sorted(m for m in ('pandas', 'studio', 'payment_plan') if m in sys.modules))"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout.strip()
+    assert loaded == "[]"
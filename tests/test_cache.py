@@ -0,0 +1,38 @@
+import cache
+import db
+import payment_plan
+import studio
+
+
+def test_reads_are_served_until_a_table_they_read_is_written(empty_db):
+    studio.add_student("Cached", "Student", "2012-01-01")
+    first = studio.get_all_students()
+    misses = cache.stats["misses"]
+
+    # A write to another table leaves the cached read alone...
+    payment_plan.add_catalog_item("Tuition", "Cache Tuition", 100.0)
+    assert studio.get_all_students() == first
+    assert cache.stats["misses"] == misses
+
+    # ...and a write to one it reads is seen on the next call.
+    studio.add_student("Second", "Student", "2012-01-02")
+    assert len(studio.get_all_students()) == 2
+    assert cache.stats["misses"] == misses + 1
+
+
+def test_callers_get_a_copy_of_the_cached_result(empty_db):
+    sid = studio.add_student("Copy", "Student", "2012-01-01")
+    studio.get_all_students().clear()
+    assert [s.id for s in studio.get_all_students()] == [sid]
+    studio.add_dance("Copy Dance", "Solo", [sid])
+    rosters = studio.get_dance_rosters()
+    rosters["name"] = "Changed"
+    assert studio.get_dance_rosters()["name"].tolist() == ["Copy Dance"]
+
+
+def test_generation_is_bumped_only_after_the_transaction_commits(empty_db):
+    before = cache.generation("students")
+    with db.transaction():
+        studio.add_student("Late", "Bump", "2012-01-01")
+        assert cache.generation("students") == before
+    assert cache.generation("students") == before + 1
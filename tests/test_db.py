@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+
+import db
+
+
+# --- CONNECTION POOL ---
+def test_nested_blocks_on_one_thread_share_a_connection(empty_db):
+    with db.connection() as outer:
+        with db.connection() as inner:
+            assert inner is outer
+        assert outer.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_pool_never_opens_more_than_its_size(tmp_path):
+    pool = db.ConnectionPool(str(tmp_path / "pool.db"), size=2)
+    held, release = threading.Barrier(3), threading.Event()
+
+    def hold():
+        with pool.connection():
+            held.wait()
+            release.wait()
+
+    holders = [threading.Thread(target=hold) for _ in range(2)]
+    for t in holders:
+        t.start()
+    held.wait()
+
+    def wait():
+        with pool.connection():
+            pass
+
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive() and len(pool._all) == 2
+    release.set()
+    for t in holders + [waiter]:
+        t.join(5)
+    assert len(pool._all) == 2
+    pool.close()
+
+
+def test_transaction_rolls_back_on_error(empty_db):
+    with pytest.raises(RuntimeError):
+        with db.transaction() as conn:
+            conn.execute("INSERT INTO students (first_name, last_name, dob) VALUES ('Roll', 'Back', '2012-01-01')")
+            raise RuntimeError("boom")
+    assert db.query("SELECT COUNT(*) FROM students")[0][0] == 0
+
+
+# --- GROUP COMMIT ---
+def _insert_student(last, fail=False):
+    with db.transaction() as conn:
+        conn.execute("INSERT INTO students (first_name, last_name, dob) VALUES ('Group', ?, '2012-01-01')", (last,))
+        if fail:
+            raise ValueError(last)
+    return last
+
+
+def test_a_failing_write_rolls_back_alone_within_its_batch(empty_db):
+    writer = db.GroupWriter(window_ms=200)
+    futures = [writer.submit(_insert_student, "Kept1"),
+               writer.submit(_insert_student, "Dropped", fail=True),
+               writer.submit(_insert_student, "Kept2")]
+
+    assert futures[0].result(5) == "Kept1" and futures[2].result(5) == "Kept2"
+    with pytest.raises(ValueError, match="Dropped"):
+        futures[1].result(5)
+    assert writer.batches == 1
+    assert db.query("SELECT last_name FROM students ORDER BY id") == [("Kept1",), ("Kept2",)]
+
+
+def test_group_commit_runs_inline_inside_a_transaction(empty_db, monkeypatch):
+    monkeypatch.setattr(db, "GROUP_COMMIT", True)
+    write = db.group_commit(lambda: threading.current_thread())
+    with db.transaction():
+        assert write() is threading.current_thread()
+    assert write() is not threading.current_thread()
+
+
+# --- ROW QUERIES ---
+def test_rows_are_named_tuples_sharing_one_class_per_column_list(empty_db):
+    db.execute("INSERT INTO catalog_items (category, name, price) VALUES ('Tuition', 'Row Tuition', 120.0)")
+    db.execute("INSERT INTO catalog_items (category, name, price) VALUES ('Tuition', 'Row Shoes', 40.0)")
+
+    rows = db.rows("SELECT id, name, price FROM catalog_items ORDER BY price")
+
+    assert [(r.name, r.price) for r in rows] == [("Row Shoes", 40.0), ("Row Tuition", 120.0)]
+    assert type(rows[0]) is type(db.rows("SELECT 1 AS id, 'x' AS name, 2.0 AS price")[0])
+    assert db.rows("SELECT id FROM catalog_items WHERE price < 0") == []
+
+
+def test_columns_return_one_list_per_column_even_when_empty(empty_db):
+    db.execute("INSERT INTO catalog_items (category, name, price) VALUES ('Tuition', 'Col Tuition', 120.0)")
+
+    assert db.columns("SELECT name, price FROM catalog_items") == {"name": ["Col Tuition"], "price": [120.0]}
+    assert db.columns("SELECT name, price FROM catalog_items WHERE price < 0") == {"name": [], "price": []}
@@ -0,0 +1,45 @@
+import json
+import logging
+import sqlite3
+
+import instrument
+
+
+def test_rerun_summary_counts_statements_rows_and_function_time(tmp_path, monkeypatch):
+    log_path = tmp_path / "instrument.log"
+    monkeypatch.setattr(instrument, "ENABLED", True)
+    monkeypatch.setattr(instrument, "LOG_PATH", str(log_path))
+    monkeypatch.setattr(instrument, "_logger", None)
+    conn = sqlite3.connect(":memory:")
+    instrument.attach(conn)
+
+    def load_numbers():
+        rows = conn.execute("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 50)"
+                            " SELECT i FROM n").fetchall()
+        instrument.add_rows(len(rows))
+        return rows
+
+    timed = instrument.timed("test.load_numbers", load_numbers)
+    try:
+        instrument.start_run("test page")
+        timed()
+        timed()
+        summary = instrument.end_run()
+    finally:
+        logger = logging.getLogger("dance.instrument")
+        for handler in logger.handlers[:]:
+            handler.close()
+            logger.removeHandler(handler)
+        conn.close()
+
+    assert summary["page"] == "test page"
+    assert (summary["queries"], summary["rows"]) == (2, 100)
+    assert summary["functions"]["test.load_numbers"]["calls"] == 2
+    assert json.loads(log_path.read_text().splitlines()[-1])["rows"] == 100
+    assert instrument.current() is None
+
+
+def test_nothing_is_recorded_when_disabled(monkeypatch):
+    monkeypatch.setattr(instrument, "ENABLED", False)
+    assert instrument.start_run("off") is None
+    assert instrument.end_run() is None
@@ -0,0 +1,55 @@
+import threading
+import time
+
+import jobs
+
+
+def _wait(job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get_job(job_id)
+        if job["status"] in jobs.FINISHED:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} still {job['status']} after {timeout}s: {job}")
+
+
+def _writing(stop):
+    # Another session committing small writes while a job runs.
+    import studio
+
+    i = 0
+    while not stop.is_set():
+        studio.add_student("Concurrent", f"Writer {i}", "2012-05-06")
+        i += 1
+        time.sleep(0.002)
+
+
+def _run_with_writer(job_id):
+    stop = threading.Event()
+    writer = threading.Thread(target=_writing, args=(stop,))
+    writer.start()
+    try:
+        return _wait(job_id)
+    finally:
+        stop.set()
+        writer.join()
+
+
+def test_backup_job_finishes(studio_db, monkeypatch):
+    import backup
+
+    monkeypatch.setattr(backup, "BACKUP_STEP_PAGES", 16)  # many progress reports per copy
+    job = _run_with_writer(jobs.submit("backup", label="test"))
+    assert job["status"] == jobs.DONE, job
+    assert job["progress"] == 1.0
+    assert job["result"]["name"].endswith("-test.db")
+
+
+def test_export_job_with_concurrent_writer(studio_db, monkeypatch):
+    import export
+
+    monkeypatch.setattr(export.stream_rows, "__defaults__", ((), 500))  # many chunks
+    job = _run_with_writer(jobs.submit("export", name="plans"))
+    assert job["status"] == jobs.DONE, job
+    assert job["result"]["rows"] == export.count_rows("plans")
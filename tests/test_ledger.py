@@ -0,0 +1,56 @@
+import pytest
+
+import db
+import ledger
+import payment_plan
+import studio
+
+
+def _plan(items, down=(), months=6, created_at=None):
+    sid = studio.add_student("Ledger", "Test", "2012-01-01")
+    plan_id = payment_plan.save_plan(sid, items, list(down), months)
+    if created_at is not None:
+        db.execute("UPDATE student_plans SET created_at = ? WHERE id = ?", (created_at, plan_id))
+        payment_plan.recompute_schedules([plan_id])
+    return sid, plan_id
+
+
+def _balance(sid):
+    row = ledger.get_student_balances(sid).iloc[0]
+    return row["charged_cents"], row["down_cents"], row["paid_cents"], row["balance_cents"], row["next_due_date"]
+
+
+def test_balance_after_partial_payment_and_over_payment(empty_db):
+    sid, plan_id = _plan([("Annual Tuition", 600.0, "Tuition")], [100.0], months=5,
+                         created_at="2025-01-15T10:00:00")
+    assert _balance(sid) == (60000, 10000, 0, 50000, "2025-02-01")
+
+    ledger.record_payment(plan_id, 150.0)  # one full installment of $100 and half the next
+    assert _balance(sid) == (60000, 10000, 15000, 35000, "2025-03-01")
+    assert ledger.get_outstanding_cents(sid) == 35000
+
+    ledger.record_payment(plan_id, 400.0)
+    assert _balance(sid) == (60000, 10000, 55000, -5000, None)
+    assert ledger.get_overdue("2030-01-01").query("plan_id == @plan_id").empty
+
+
+def test_balance_follows_a_requoted_plan(empty_db):
+    item_id = payment_plan.add_catalog_item("Tuition", "Annual Tuition", 600.0)
+    sid, plan_id = _plan([("Annual Tuition", 600.0, "Tuition")], months=6)
+    ledger.record_payment(plan_id, 60.0)
+
+    payment_plan.update_catalog_item(item_id, "Annual Tuition", 660.0)
+    payment_plan.requote_plans([plan_id])
+
+    assert _balance(sid)[:4] == (66000, 0, 6000, 60000)
+    assert payment_plan.get_schedule(plan_id)["amount_cents"].sum() == 66000
+
+
+def test_deleting_a_payment_restores_the_balance(empty_db):
+    sid, plan_id = _plan([("Annual Tuition", 300.0, "Tuition")], months=3)
+    payment_id = ledger.record_payment(plan_id, 120.0)
+    ledger.delete_payment(payment_id)
+
+    assert _balance(sid)[2:4] == (0, 30000)
+    with pytest.raises(ValueError, match="No payment plan"):
+        ledger.record_payment(plan_id + 1000, 1.0)
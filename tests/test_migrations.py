@@ -0,0 +1,31 @@
+import sqlite3
+
+import db
+import migrations
+
+
+def _baseline(path):
+    # The schema as the baseline app created it: migration 1's tables, with
+    # no schema_version table and a plan saved before months were stored.
+    conn = sqlite3.connect(path)
+    for step in migrations.MIGRATIONS[0][2]:
+        conn.execute(step)
+    conn.execute("INSERT INTO students (first_name, last_name, dob) VALUES ('Base', 'Line', '2012-01-01')")
+    conn.execute("INSERT INTO student_plans (student_id, template_id, created_at) VALUES (1, NULL, '2024-01-05')")
+    conn.execute("INSERT INTO plan_items (plan_id, name, price, item_type) VALUES (1, 'Tuition', 120.0, 'Tuition')")
+    conn.commit()
+    conn.close()
+
+
+def test_baseline_database_migrates_once_to_the_latest_version(empty_db, tmp_path):
+    path = str(tmp_path / "baseline.db")
+    _baseline(path)
+    db.configure(path)
+
+    migrations.migrate()
+    migrations.migrate(force=True)
+
+    assert db.query("SELECT version FROM schema_version ORDER BY version") == [(v,) for v, *_ in migrations.MIGRATIONS]
+    assert "months" in [r[1] for r in db.query("PRAGMA table_info(student_plans)")]
+    assert db.query("SELECT first_name, last_name FROM students") == [("Base", "Line")]
+    assert db.query("SELECT plan_id, charged_cents, balance_cents FROM plan_balances") == [(1, 12000, 12000)]
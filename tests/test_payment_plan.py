@@ -0,0 +1,145 @@
+import sqlite3
+
+import pytest
+
+import db
+import payment_plan
+import studio
+
+
+def test_student_fees_keep_same_named_competitions_apart(studio_db):
+    sid = studio.add_student("Fee", "Twin", "2013-02-03")
+    comp_ids = [studio.add_competition("Twin Comp", False, [sid]) for _ in range(2)]
+    item_id = payment_plan.add_catalog_item("Competition", "Twin Comp Entry", 40.0)
+    for cid in comp_ids:
+        payment_plan.add_fee_rule("competition", item_id, competition_id=cid)
+
+    fees = payment_plan.get_student_fees(sid)
+    twins = fees[fees["catalog_item_id"] == item_id]
+
+    assert len(twins) == 2
+    assert twins["label"].nunique() == 1
+    assert sorted(key[1] for key in twins["key"]) == sorted(comp_ids)
+
+
+def test_editing_a_competition_roster_keeps_its_convention_fees(studio_db):
+    from bench.run import render_page
+
+    sids = [studio.add_student("Fee", f"Convention {i}", "2013-02-03") for i in range(2)]
+    cid = studio.add_competition("Convention Comp", True, sids[:1])
+    item_id = payment_plan.add_catalog_item("Competition", "Convention Comp Pass", 75.0)
+    payment_plan.add_fee_rule("convention", item_id, competition_id=cid)
+
+    render_page("app.py", {"Navigate": "🏆 Competitions", "edit_comp_sel": cid,
+                           "edit_comp_members": sids, "btn_edit_comp": True})
+
+    assert {m.id for m in studio.get_students_for_competition(cid)} == set(sids)
+    for sid in sids:
+        fees = payment_plan.get_student_fees(sid)
+        assert list(fees.loc[fees["catalog_item_id"] == item_id, "kind"]) == ["convention"]
+
+
+
+def test_student_fees_match_the_studio_wide_lines_and_read_one_student(studio_db):
+    lines = payment_plan.get_fee_lines()
+    assert not lines.empty
+    for sid in lines["student_id"].unique()[:5].tolist():
+        fees = payment_plan.get_student_fees(sid)
+        expected = lines[lines["student_id"] == sid].reset_index(drop=True)
+        assert fees[payment_plan.FEE_LINE_COLUMNS].equals(expected)
+        with db.connection() as conn:
+            assert conn.execute("SELECT id FROM fee_students").fetchall() == [(sid,)]
+    assert payment_plan.get_student_fees(-1).empty
+
+# --- SAVING PLANS ---
+def test_save_plan_writes_items_and_numbered_down_payments(empty_db):
+    sid = studio.add_student("Saved", "Plan", "2012-01-01")
+    plan_id = payment_plan.save_plan(sid, [("Tuition", 500.0, "Tuition"), ("Shoes", 60.0, "Costume")], [100.0, 50.0], 6)
+
+    items = payment_plan.get_plan_items(plan_id)
+    assert [(i.name, i.price, i.item_type) for i in items] == [
+        ("Tuition", 500.0, "Tuition"), ("Shoes", 60.0, "Costume"),
+        ("Down Payment 1", 100.0, "Down Payment"), ("Down Payment 2", 50.0, "Down Payment"),
+    ]
+
+
+def test_save_plans_writes_every_plan_or_none(empty_db):
+    sid = studio.add_student("Batch", "Plan", "2012-01-01")
+    good = {"student_id": sid, "items": [("Tuition", 500.0, "Tuition")], "months": 6}
+    bad = {"student_id": sid, "items": [("No Price", None, "Tuition")], "months": 6}
+
+    with pytest.raises(sqlite3.IntegrityError):
+        payment_plan.save_plans([good, bad])
+    assert db.query("SELECT COUNT(*) FROM student_plans")[0][0] == 0
+
+    plan_ids = payment_plan.save_plans([good, dict(good, months=8)])
+    assert db.query("SELECT id, months FROM student_plans ORDER BY id") == [(plan_ids[0], 6), (plan_ids[1], 8)]
+
+
+# --- INSTALLMENT SCHEDULES ---
+@pytest.mark.parametrize("balance, months", [(0, 6), (1, 6), (100000, 6), (123457, 7), (99999, 10)])
+def test_installments_sum_to_the_balance(balance, months):
+    parts = payment_plan.split_installments(balance, months)
+    assert len(parts) == months
+    assert sum(parts) == balance
+
+
+def test_leftover_cents_go_one_each_to_the_earliest_installments():
+    assert payment_plan.split_installments(1003, 4) == [251, 251, 251, 250]
+    assert payment_plan.split_installments(1000, 3) == [334, 333, 333]
+
+
+def _schedule(items, down=(), months=6, created_at=None):
+    sid = studio.add_student("Schedule", "Test", "2012-01-01")
+    plan_id = payment_plan.save_plan(sid, items, list(down), months)
+    if created_at is not None:
+        db.execute("UPDATE student_plans SET created_at = ? WHERE id = ?", (created_at, plan_id))
+        payment_plan.recompute_schedules([plan_id])
+    return payment_plan.get_schedule(plan_id)
+
+
+def test_saved_schedule_sums_to_items_minus_down_payments(empty_db):
+    schedule = _schedule([("Annual Tuition", 1234.56, "Tuition"), ("Solo Fee", 0.07, "Solo")], [100.0], months=7)
+
+    assert schedule["amount_cents"].sum() == 123456 + 7 - 10000
+    assert list(schedule["installment"]) == list(range(1, 8))
+
+
+def test_installments_fall_on_the_first_of_each_following_month(empty_db):
+    # Created on the last day of a month: the schedule still lands on the
+    # 1st, across the leap-year February and the year end.
+    schedule = _schedule([("Annual Tuition", 600.0, "Tuition")], months=12, created_at="2024-01-31T18:00:00")
+
+    due = list(schedule["due_date"])
+    assert due[:2] == ["2024-02-01", "2024-03-01"]
+    assert due[-2:] == ["2024-12-01", "2025-01-01"]
+
+
+# --- TEMPLATE PLANS ---
+def _template(name, items):
+    payment_plan.add_template(name)
+    template_id = next(t.id for t in payment_plan.get_templates() if t.name == name)
+    for item in items:
+        payment_plan.add_template_item(template_id, *item)
+    return template_id
+
+
+def test_template_applies_to_a_roster_once_per_student(empty_db):
+    sids = [studio.add_student("Roster", f"Member {i}", "2012-01-01") for i in range(3)]
+    did = studio.add_dance("Roster Dance", "Small Group", sids[:2])
+    template_id = _template("Team", [("Tuition", 600.0, "Tuition"), ("Costume", 90.0, "Costume")])
+
+    preview = payment_plan.preview_template_plans(template_id, 6, [100.0], dance_id=did)
+    assert preview["student_id"].tolist() == sids[:2]
+    assert db.query("SELECT COUNT(*) FROM student_plans")[0][0] == 0
+
+    plan_ids = payment_plan.apply_template_plans(template_id, 6, [100.0], dance_id=did)
+    assert len(plan_ids) == 2
+    for plan_id in plan_ids:
+        assert sum(payment_plan.get_schedule(plan_id)["amount"]) == pytest.approx(590.0)
+
+    preview = payment_plan.preview_template_plans(template_id, 6, student_ids=sids)
+    assert preview["action"].tolist() == ["skip (already on this template)"] * 2 + ["create"]
+    again = payment_plan.apply_template_plans(template_id, 6, student_ids=sids)
+    assert len(again) == 1
+    assert db.query("SELECT student_id FROM student_plans WHERE id = ?", (again[0],)) == [(sids[2],)]
@@ -0,0 +1,59 @@
+import os
+from datetime import date, timedelta
+
+import pytest
+
+import ledger
+import payment_plan
+import seasons
+import studio
+
+
+def _season_with_plan(name, ends_on):
+    season_id = seasons.add_season(name, "2024-09-01", ends_on)
+    sid = studio.add_student("Season", "Owes", "2012-01-01")
+    plan_id = payment_plan.save_plan(sid, [("Annual Tuition", 1200.0, "Tuition")], [200.0], 10)
+    return season_id, sid, plan_id
+
+
+def test_season_with_money_owed_is_not_archived(empty_db):
+    season_id, sid, plan_id = _season_with_plan("2024-25", "2025-06-30")
+
+    assert seasons.archive_blockers(season_id) == ["$1,000.00 is still owed on 1 plan(s)"]
+    with pytest.raises(ValueError, match="still owed"):
+        seasons.archive_season(season_id)
+    assert ledger.get_outstanding_cents(sid) == 100000
+    ledger.record_payment(plan_id, 50.0)
+    assert seasons.archive_blockers(season_id) == ["$950.00 is still owed on 1 plan(s)"]
+
+    ledger.record_payment(plan_id, 950.0)
+    assert seasons.archive_blockers(season_id) == []
+    counts = seasons.archive_season(season_id)
+    assert counts["student_plans"] == 1
+    assert seasons.get_season(season_id)["status"] == seasons.ARCHIVED
+
+
+def test_season_that_has_not_ended_is_not_archived(empty_db):
+    ends = (date.today() + timedelta(days=30)).isoformat()
+    season_id = seasons.add_season("Current", "2024-09-01", ends)
+
+    assert seasons.archive_blockers(season_id) == [f"it has not ended yet (ends on {ends})"]
+    with pytest.raises(ValueError, match="has not ended"):
+        seasons.archive_season(season_id)
+    assert seasons.get_season(season_id)["status"] == seasons.OPEN
+
+
+def test_archived_season_is_read_from_its_own_file(empty_db):
+    season_id, sid, plan_id = _season_with_plan("2023-24", "2024-06-30")
+    ledger.record_payment(plan_id, 1000.0)
+    did = studio.add_dance("Archived Duet", "Duet", [sid])
+
+    counts = seasons.archive_season(season_id)
+
+    assert (counts["dances"], counts["dance_students"], counts["plan_items"]) == (1, 1, 2)
+    assert studio.get_all_dances().empty
+    assert os.path.exists(os.path.join(seasons.archive_dir(), f"season-{season_id}.db"))
+    assert studio.get_all_dances(season_id)["id"].tolist() == [did]
+    assert studio.get_dance_rosters(season_id)["member_ids"].tolist() == [[sid]]
+    assert [i.name for i in payment_plan.get_plan_items(plan_id, season_id)] == ["Annual Tuition", "Down Payment 1"]
+    assert studio.get_student(sid) is not None
@@ -0,0 +1,43 @@
+import os
+
+import db
+import ledger
+import statements
+
+
+def _plan_ids(count):
+    return [r[0] for r in db.query("SELECT id FROM student_plans ORDER BY id LIMIT ?", (count,))]
+
+
+def test_statement_is_rerendered_only_when_its_content_changes(studio_db):
+    plan_id = _plan_ids(1)[0]
+    path = statements.render_statement(plan_id)
+    assert statements.render_statement(plan_id) == path
+
+    ledger.record_payment(plan_id, 1.0, "2024-01-15", "cash")
+    updated = statements.render_statement(plan_id)
+    assert updated != path
+    assert os.path.exists(updated) and not os.path.exists(path)
+    assert statements.render_statement(-1) is None
+
+
+def test_same_day_bundles_do_not_overwrite_each_other(studio_db):
+    paths, _ = statements.render_statements(_plan_ids(3))
+    first, second = statements.bundle(paths), statements.bundle(paths)
+    assert first != second
+    assert os.path.exists(first) and os.path.exists(second)
+
+
+def test_balances_expander_renders_a_statement_only_on_request(studio_db, monkeypatch):
+    from bench.run import render_page
+
+    sid = db.query("SELECT student_id FROM student_plans ORDER BY id LIMIT 1")[0][0]
+    page = os.path.join("pages", "Payment_Plans.py")
+    calls = []
+    render = statements.render_statement
+    monkeypatch.setattr(statements, "render_statement", lambda plan_id: calls.append(plan_id) or render(plan_id))
+
+    render_page(page, {"select_student": sid})
+    assert calls == []
+    render_page(page, {"select_student": sid, "stmt_on": True})
+    assert len(calls) == 1
@@ -0,0 +1,188 @@
+import io
+
+import pytest
+
+import db
+import jobs
+import studio
+
+
+def _students_csv(prefix, rows):
+    return io.StringIO("first,last,dob\n" + "".join(f"Row{i},{prefix}{i},2012-03-04\n" for i in range(rows)))
+
+
+def test_cancelled_import_leaves_committed_chunks_visible(studio_db):
+    before = studio.count_students()
+    directory_before = len(studio.student_directory())
+
+    def cancel_after_first_chunk(done):
+        raise jobs.JobCancelled()
+
+    with pytest.raises(jobs.JobCancelled):
+        studio.import_students(_students_csv("Cancelled", 30), chunksize=10, progress=cancel_after_first_chunk)
+
+    assert studio.count_students() == before + 10
+    assert len(studio.student_directory()) == directory_before + 10
+
+
+def test_student_summary_collects_dances_competitions_and_balances(empty_db):
+    import payment_plan
+
+    sid = studio.add_student("Summary", "Dancer", "2012-01-01")
+    did = studio.add_dance("Summary Solo", "Solo", [sid])
+    cid = studio.add_competition("Summary Comp", True, [sid])
+    payment_plan.save_plan(sid, [("Annual Tuition", 300.0, "Tuition")], [50.0], 5)
+
+    summary = studio.get_student_summary(sid)
+    assert summary["dances"] == [{"id": did, "name": "Summary Solo", "type": "Solo"}]
+    assert summary["competitions"] == [{"id": cid, "name": "Summary Comp", "has_convention": True}]
+    assert (summary["plans"], summary["charged_cents"], summary["received_cents"], summary["balance_cents"]) \
+        == (1, 30000, 5000, 25000)
+    report = studio.get_roster_report()
+    assert report.loc[0, ["dances", "competitions", "balance"]].tolist() == ["Summary Solo", "Summary Comp", 250.0]
+
+
+def test_roster_report_is_built_only_on_request(studio_db, monkeypatch):
+    from bench.run import render_page
+
+    calls = []
+    monkeypatch.setattr(studio, "get_roster_report", lambda: calls.append(1) or studio.get_student_summaries())
+    render_page("app.py", {"Navigate": "📋 Students"})
+    assert calls == []
+    render_page("app.py", {"Navigate": "📋 Students", "roster_report_on": True})
+    assert calls
+
+
+# --- BULK STUDENT IMPORT ---
+def test_import_reports_added_duplicate_and_rejected_rows(empty_db):
+    studio.add_student("Ada", "Import", "2012-03-04")
+    csv = io.StringIO("first,last,dob\n"
+                      "ada,IMPORT,2012-03-04\n"
+                      "Bea,Import,03/05/2012\n"
+                      "Bea,Import,2012-03-05\n"
+                      ",Import,2012-03-06\n"
+                      "Cy,Import,not a date\n")
+
+    report = studio.import_students(csv, chunksize=2)
+
+    assert report["status"].tolist() == ["duplicate", "added", "duplicate", "rejected", "rejected"]
+    assert report["line"].tolist() == [2, 3, 4, 5, 6]
+    assert studio.count_students() == 2
+
+
+def test_import_can_update_the_spelling_of_existing_students(empty_db):
+    sid = studio.add_student("ada", "import", "2012-03-04")
+
+    report = studio.import_students(io.StringIO("first,last,dob\nAda,Import,2012-03-04\n"), on_duplicate="update")
+
+    assert report["status"].tolist() == ["updated"]
+    assert studio.get_student(sid)["first_name"] == "Ada"
+
+
+# --- BULK DANCE IMPORT ---
+def test_dance_import_resolves_labels_and_reports_unknown_ones(empty_db):
+    ada = studio.add_student("Ada", "Lovelace", "2012-01-01")
+    bea = studio.add_student("Bea", "Arthur", "2012-01-02")
+    csv = io.StringIO("dancetype,dancename,member1,member2\n"
+                      "Duet,Pair,\"Lovelace, Ada\",\"Arthur, Bea\"\n"
+                      "Solo,Alone,\"Lovelace, Ada\",\"Nobody, Known\"\n"
+                      ",Untyped,\"Arthur, Bea\",\n")
+
+    report, unknown = studio.import_dances(csv)
+
+    assert report["status"].tolist() == ["added", "added", "rejected"]
+    assert report["members"].tolist() == [2, 1, 0]
+    assert unknown == ["Nobody, Known"]
+    rosters = studio.get_dance_rosters().set_index("name")["member_ids"]
+    assert sorted(rosters["Pair"]) == sorted([ada, bea])
+    assert rosters["Alone"] == [ada]
+    assert "Untyped" not in rosters
+
+
+# --- DANCE ROSTERS ---
+def test_dance_rosters_list_members_by_last_then_first_name(empty_db):
+    zed = studio.add_student("Ann", "Zed", "2012-01-01")
+    amy = studio.add_student("Amy", "Able", "2012-01-02")
+    bob = studio.add_student("Bob", "Able", "2012-01-03")
+    studio.add_dance("Trio", "Small Group", [zed, bob, amy])
+    studio.add_dance("Empty", "Solo", [])
+
+    rosters = studio.get_dance_rosters()
+
+    assert rosters["name"].tolist() == ["Trio", "Empty"]
+    trio = rosters.iloc[0]
+    assert trio["member_ids"] == [amy, bob, zed]
+    assert trio["member_names"] == ["Amy Able", "Bob Able", "Ann Zed"]
+    assert trio["member_labels"] == ["Able, Amy", "Able, Bob", "Zed, Ann"]
+    assert rosters.iloc[1]["member_ids"] == []
+
+
+# --- STUDENT SEARCH ---
+def test_search_matches_name_prefixes_and_follows_edits(empty_db):
+    ana = studio.add_student("Ana", "Smith", "2012-01-01")
+    studio.add_student("Anders", "Jones", "2012-01-02")
+    bob = studio.add_student("Bob", "Smithers", "2012-01-03")
+
+    assert sorted(label for _, label in studio.search_students("an")[0]) == ["Jones, Anders", "Smith, Ana"]
+    assert studio.search_students("an smi") == ([(ana, "Smith, Ana")], 1)
+    assert studio.search_students('"zz')[1] == 0
+
+    studio.update_student(ana, "Ana", "Zed", "2012-01-01")
+    assert studio.search_students("smi")[0] == [(bob, "Smithers, Bob")]
+    assert studio.search_students("zed")[0] == [(ana, "Zed, Ana")]
+
+
+def test_empty_search_pages_through_the_roster(empty_db):
+    for i in range(5):
+        studio.add_student("Page", f"Student{i}", "2012-01-01")
+
+    first, total = studio.search_students("", limit=2)
+    second, _ = studio.search_students("", limit=2, offset=2)
+
+    assert total == 5
+    assert [label for _, label in first + second] == [f"Student{i}, Page" for i in range(4)]
+
+
+# --- MEMBERSHIP DIFFS ---
+def test_roster_updates_write_and_report_only_the_difference(empty_db):
+    sids = [studio.add_student("Diff", f"Member {i}", "2012-01-01") for i in range(4)]
+    did = studio.add_dance("Diff Dance", "Trio", sids[:3])
+    cid = studio.add_competition("Diff Comp", False, sids[:2])
+
+    assert studio.update_dance(did, "Diff Dance", sids[1:]) == (1, 1)
+    assert studio.update_dance(did, "Renamed", sids[1:]) == (0, 0)
+    assert sorted(studio.get_dance_rosters()["member_ids"][0]) == sids[1:]
+    assert studio.get_dance_rosters()["name"][0] == "Renamed"
+
+    assert studio.update_competition(cid, "Diff Comp", False, sids[2:]) == (2, 2)
+    assert studio.update_competition(cid, "Diff Comp", True, []) == (0, 2)
+    assert studio.get_students_for_competition(cid) == []
+
+
+def test_unchanged_roster_writes_nothing(empty_db):
+    sids = [studio.add_student("Same", f"Member {i}", "2012-01-01") for i in range(3)]
+    did = studio.add_dance("Same Dance", "Trio", sids)
+
+    # A delete and re-insert would give the rows new rowids.
+    rows = "SELECT rowid, dance_id, student_id FROM dance_students ORDER BY rowid"
+    before = db.query(rows)
+    assert studio.update_dances([(did, None, list(reversed(sids)))]) == {did: (0, 0)}
+    assert db.query(rows) == before
+
+
+# --- STUDENT DIRECTORY ---
+def test_directory_is_shared_until_students_change(empty_db):
+    bea = studio.add_student("Bea", "Young", "2012-01-01")
+    ada = studio.add_student("Ada", "Young", "2012-01-02")
+    directory = studio.student_directory()
+
+    assert studio.student_directory() is directory
+    assert list(directory.ids) == [ada, bea]
+    assert directory.label(bea) == "Young, Bea" and directory.label(-1) is None
+    assert directory.by_label["Young, Ada"] == ada
+    assert directory.label_map([bea, -1, ada]) == {ada: "Young, Ada", bea: "Young, Bea"}
+
+    studio.update_student(bea, "Bea", "Adams", "2012-01-01")
+    rebuilt = studio.student_directory()
+    assert rebuilt is not directory
+    assert list(rebuilt.ids) == [bea, ada]
@@ -0,0 +1,108 @@
+import math
+import os
+
+import streamlit as st
+
+import jobs
+import studio
+
+# --- STUDENT PICKERS ---
+# Small rosters get a plain selectbox/multiselect over every student. Above
+# SEARCH_THRESHOLD students the pickers switch to a typeahead: a search box
+# backed by the students_fts index, showing one page of matches at a time, so
+# the full roster is never sent to the browser. Both modes use student ids as
+# the option values and take labels from the shared studio.student_directory().
+SEARCH_THRESHOLD = int(os.environ.get("DANCE_SEARCH_THRESHOLD", "500"))
+SEARCH_PAGE_SIZE = 25
+
+
+def search_mode():
+    return len(studio.student_directory()) > SEARCH_THRESHOLD
+
+
+def _search_page(label, key):
+    """Search box plus pager; returns {id: label} for the current page of matches."""
+    text = st.text_input(f"Search {label.lower()}", key=f"{key}_search",
+                         placeholder="Type part of a first or last name")
+    page = st.session_state.get(f"{key}_page", 1)
+    matches, total = studio.search_students(text, limit=SEARCH_PAGE_SIZE,
+                                            offset=(page - 1) * SEARCH_PAGE_SIZE)
+    pages = max(1, math.ceil(total / SEARCH_PAGE_SIZE))
+    if page > pages:
+        # A narrower search has fewer pages than the one we were on.
+        page = st.session_state[f"{key}_page"] = 1
+        matches, total = studio.search_students(text, limit=SEARCH_PAGE_SIZE, offset=0)
+    if pages > 1:
+        st.number_input(f"Page (of {pages}, {total} matches)", min_value=1, max_value=pages,
+                        step=1, key=f"{key}_page")
+    elif total == 0:
+        st.caption("No matching students.")
+    return dict(matches)
+
+
+def student_select(label, key):
+    """Pick one student; returns the id, or None while nothing is chosen."""
+    directory = studio.student_directory()
+    options = list(_search_page(label, key)) if search_mode() else directory.ids.tolist()
+    return st.selectbox(label, [None] + options, key=key,
+                        format_func=lambda s: "--" if s is None else directory.label(s))
+
+
+def student_multiselect(label, key, default_ids=()):
+    """Pick any number of students; returns the list of ids."""
+    directory = studio.student_directory()
+    default_ids = [sid for sid in default_ids if sid in directory.position]
+    if search_mode():
+        # Keep the current selection among the options so searching for the
+        # next student does not drop the ones already picked.
+        selected = list(st.session_state.get(key, default_ids))
+        options = list(dict.fromkeys(selected + default_ids + list(_search_page(label, key))))
+    else:
+        options = directory.ids.tolist()
+    return st.multiselect(label, options, default=default_ids, key=key,
+                          format_func=lambda s: directory.label(s) or str(s))
+
+
+# --- BACKGROUND JOB STATUS ---
+# A submitted job is tracked by id in session_state. While it runs, a
+# fragment re-polls the jobs table every JOB_POLL_SECONDS (Streamlit builds
+# without st.fragment get a Refresh button instead) and triggers a full
+# rerun once it finishes so the page can show the result.
+JOB_POLL_SECONDS = 1.0
+
+
+def _job_poll(job_id, key):
+    job = jobs.get_job(job_id)
+    if job["status"] in jobs.FINISHED:
+        st.rerun()
+    st.progress(job["progress"], text=f"{job['kind']}: {job['message'] or job['status']}")
+    cols = st.columns(2)
+    if cols[0].button("Cancel", key=f"{key}_cancel"):
+        jobs.cancel(job_id)
+    if not hasattr(st, "fragment"):
+        cols[1].button("Refresh", key=f"{key}_refresh")
+
+
+_job_poller = st.fragment(run_every=JOB_POLL_SECONDS)(_job_poll) if hasattr(st, "fragment") else _job_poll
+
+
+def job_status(key):
+    """Poll the job stored under ``session_state[key]``; returns it once finished, else None.
+
+    A failed or cancelled job is reported here; the caller renders a done
+    job's result.
+    """
+    job_id = st.session_state.get(key)
+    if job_id is None:
+        return None
+    job = jobs.get_job(job_id)
+    if job is None:
+        return None
+    if job["status"] not in jobs.FINISHED:
+        _job_poller(job_id, key)
+        return None
+    if job["status"] == jobs.FAILED:
+        st.error(f"Job {job_id} failed: {job['error']}")
+    elif job["status"] == jobs.CANCELLED:
+        st.warning(f"Job {job_id} was cancelled ({job['message']}).")
+    return job